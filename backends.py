@@ -0,0 +1,73 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackendConfigError(ValueError):
+    """Raised when the backends file is missing fields or malformed"""
+
+
+class Backend:
+    """One ChatGPT account: its own browser profile, page count and routing weight"""
+
+    def __init__(self, name: str, profile_dir: str, concurrency: int = 2, weight: float = 1.0,
+                 storage_state_path: str = None, browser_endpoint: str = None, connect_mode: str = "cdp"):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.concurrency = concurrency
+        self.weight = weight
+        self.storage_state_path = storage_state_path
+        self.browser_endpoint = browser_endpoint  # Attach to this long-lived browser instead of launching one
+        self.connect_mode = connect_mode
+
+    @classmethod
+    def from_dict(cls, index: int, data: dict) -> "Backend":
+        if not isinstance(data, dict):
+            raise BackendConfigError(f"Backend {index} must be an object")
+        if not data.get("profile_dir") and not data.get("storage_state_path") and not data.get("browser_endpoint"):
+            raise BackendConfigError(f"Backend {index} needs a profile_dir, storage_state_path or browser_endpoint")
+        if data.get("connect_mode", "cdp") not in ("cdp", "server"):
+            raise BackendConfigError(f"Backend {index}: connect_mode must be cdp or server")
+        try:
+            backend = cls(
+                name=str(data.get("name") or f"backend-{index}"),
+                profile_dir=data.get("profile_dir"),
+                concurrency=int(data.get("concurrency", 2)),
+                weight=float(data.get("weight", 1.0)),
+                storage_state_path=data.get("storage_state_path"),
+                browser_endpoint=data.get("browser_endpoint"),
+                connect_mode=data.get("connect_mode", "cdp")
+            )
+        except (TypeError, ValueError) as e:
+            raise BackendConfigError(f"Backend {index}: {e}")
+        if backend.concurrency < 1 or backend.weight <= 0:
+            raise BackendConfigError(f"Backend {index}: concurrency must be >= 1 and weight > 0")
+        return backend
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "profile_dir": self.profile_dir,
+            "browser_endpoint": self.browser_endpoint,
+            "concurrency": self.concurrency,
+            "weight": self.weight
+        }
+
+
+def load_backends(path: str) -> list:
+    """Read the backend registry: a JSON list, or an object with a "backends" list"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BackendConfigError(f"Could not read backends file {path}: {e}")
+    if isinstance(data, dict):
+        data = data.get("backends")
+    if not isinstance(data, list) or not data:
+        raise BackendConfigError(f"{path} must list at least one backend")
+    backends = [Backend.from_dict(index, item) for index, item in enumerate(data)]
+    names = [backend.name for backend in backends]
+    if len(set(names)) != len(names):
+        raise BackendConfigError(f"Backend names in {path} must be unique")
+    return backends
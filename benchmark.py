@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark the automation and the API against the local mock ChatGPT page.
+
+Runs a fixed number of prompts at each concurrency level and prints throughput and
+p50/p95/p99 latency as JSON, so results can be diffed between versions:
+
+    python benchmark.py --concurrency 1,2,4 --requests 20 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+
+import uvicorn
+
+from chatgpt_client import percentile
+from config import Config
+import mock_chatgpt
+
+logger = logging.getLogger(__name__)
+
+
+def summarize(target: str, concurrency: int, latencies: list, failures: int, duration: float) -> dict:
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": len(latencies) + failures,
+        "succeeded": len(latencies),
+        "failed": failures,
+        "duration_seconds": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration > 0 else None,
+        "latency_seconds": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": round(percentile(latencies, 50), 3) if latencies else None,
+            "p95": round(percentile(latencies, 95), 3) if latencies else None,
+            "p99": round(percentile(latencies, 99), 3) if latencies else None,
+            "max": round(max(latencies), 3) if latencies else None
+        }
+    }
+
+
+def make_prompt(index: int, words: int) -> str:
+    """Distinct prompts so the cache and single-flight never merge requests"""
+    filler = " ".join(mock_chatgpt.FILLER_WORDS[i % len(mock_chatgpt.FILLER_WORDS)] for i in range(max(0, words - 3)))
+    return f"Benchmark prompt {index} {filler}".strip()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def start_server(app, port: int):
+    """Run a uvicorn server on the current event loop, returning once it accepts connections"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    task = asyncio.ensure_future(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+            raise RuntimeError(f"Server failed to start on port {port}")
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+async def stop_server(server, task):
+    server.should_exit = True
+    await task
+
+
+async def run_level(send, target: str, concurrency: int, count: int, prompt_words: int, offset: int) -> dict:
+    """Send ``count`` prompts with at most ``concurrency`` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(index: int):
+        nonlocal failures
+        prompt = make_prompt(offset + index, prompt_words)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await send(prompt)
+            except Exception as e:
+                logger.warning(f"{target} request {index} failed: {e}")
+                response = None
+            elapsed = time.perf_counter() - started
+        if response and mock_chatgpt.is_mock_reply(prompt, response):
+            latencies.append(elapsed)
+        else:
+            failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return summarize(target, concurrency, latencies, failures, time.perf_counter() - started)
+
+
+async def benchmark(args) -> dict:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    targets = ["automation", "api"] if args.target == "both" else [args.target]
+
+    mock_chatgpt.mock.configure(
+        token_rate=args.token_rate,
+        jitter=args.jitter,
+        first_token_ms=args.first_token_ms,
+        reply_tokens=args.reply_tokens,
+        seed_html=args.seed
+    )
+    mock_server = await start_server(mock_chatgpt.app, args.mock_port)
+
+    # Must be set before the app modules are imported: the queue and pool size themselves from Config
+    Config.CHATGPT_URL = f"http://127.0.0.1:{args.mock_port}/"
+    Config.HEADLESS_MODE = not args.headed
+    Config.BROWSER_PROFILE_DIR = None
+    Config.STORAGE_STATE_PATH = None
+    Config.PAGE_POOL_SIZE = args.pool_size or max(levels)
+    Config.QUEUE_MAX_DEPTH = max(levels) * 2
+    Config.CACHE_ENABLED = False
+    from chatgpt_automation import chatgpt_automation
+
+    results = []
+    try:
+        if not await chatgpt_automation.startup_initialization():
+            raise RuntimeError("Could not start the browser against the mock page")
+
+        offset = 0
+        for target in targets:
+            api_server = None
+            if target == "api":
+                import httpx
+                from main import app
+                api_server = await start_server(app, args.api_port)
+                client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", timeout=None)
+
+                async def send(prompt):
+                    response = await client.post("/chat", json={"prompt": prompt, "cache": "bypass"})
+                    body = response.json()
+                    return body.get("response") if response.status_code == 200 and body.get("success") else None
+            else:
+                async def send(prompt):
+                    response, complete = await chatgpt_automation.get_chat_response(prompt)
+                    return response if complete else None
+
+            try:
+                # Warm every page once so the first level does not pay for it
+                await run_level(send, target, Config.PAGE_POOL_SIZE, Config.PAGE_POOL_SIZE, args.prompt_words, offset)
+                offset += Config.PAGE_POOL_SIZE
+                for concurrency in levels:
+                    result = await run_level(send, target, concurrency, args.requests, args.prompt_words, offset)
+                    offset += args.requests
+                    logger.info(
+                        f"{target} x{concurrency}: {result['throughput_rps']} req/s, "
+                        f"p50 {result['latency_seconds']['p50']}s, p95 {result['latency_seconds']['p95']}s"
+                    )
+                    results.append(result)
+            finally:
+                if api_server:
+                    await client.aclose()
+                    await stop_server(*api_server)
+    finally:
+        await chatgpt_automation.close()
+        await stop_server(*mock_server)
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mock": mock_chatgpt.mock.settings(),
+        "config": {
+            "page_pool_size": Config.PAGE_POOL_SIZE,
+            "input_mode": Config.INPUT_MODE,
+            "response_detection": Config.RESPONSE_DETECTION,
+            "response_stability_ms": Config.RESPONSE_STABILITY_MS,
+            "block_resources": Config.BLOCK_RESOURCES
+        },
+        "prompt_words": args.prompt_words,
+        "startup_timings": chatgpt_automation.startup_timings,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ChatGPT automation against a local mock page")
+    parser.add_argument("--target", choices=["automation", "api", "both"], default="both")
+    parser.add_argument("--concurrency", default="1,2,4", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="Prompts sent at each concurrency level")
+    parser.add_argument("--pool-size", type=int, help="Browser pages (defaults to the highest concurrency level)")
+    parser.add_argument("--prompt-words", type=int, default=20)
+    parser.add_argument("--token-rate", type=float, default=mock_chatgpt.mock.token_rate)
+    parser.add_argument("--jitter", type=float, default=mock_chatgpt.mock.jitter)
+    parser.add_argument("--first-token-ms", type=int, default=mock_chatgpt.mock.first_token_ms)
+    parser.add_argument("--reply-tokens", type=int, default=mock_chatgpt.mock.reply_tokens)
+    parser.add_argument("--seed", help="Saved ChatGPT page to use as the mock markup, e.g. chgpt.html")
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--api-port", type=int, default=8766)
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logger.setLevel(logging.INFO)
+
+    report = asyncio.run(benchmark(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        logger.info(f"Wrote benchmark report to {args.output}")
+    else:
+        print(output)
+    return 0 if all(result["failed"] == 0 for result in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
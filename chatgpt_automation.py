@@ -1,43 +1,113 @@
 import asyncio
 import logging
+import os
+from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright
 import time
 import random
 from config import Config
+from page_pool import PagePool
+from prompt_pipeline import plan_prompt, prompt_digest
+from metrics import time_phase, PHASE_SECONDS, RETRIES, SEND_BUTTON_FALLBACKS, LOGIN_WALLS, RATE_LIMITS, TIMEOUTS
+from resource_filter import ResourceFilter
+from response_extractor import extract_response
+from selector_registry import format_controls, is_rate_limit_message
+from tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Set user agent to avoid detection
+EXTRA_HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
 class ChatGPTAutomation:
     def __init__(self):
         self.browser = None
-        self.page = None
+        self.context = None
         self.playwright = None
+        self.shared_context = False  # True when attached to a browser's default context that other clients use too
+        self.pool = PagePool()
+        self.resource_filter = ResourceFilter()
         self.is_logged_in = False
         self.is_initialized = False
+        self.startup_timings = {}
+        self.last_block = None  # Last login wall / rate limit, reported on /health for the router
+        self.last_diagnostics = {}  # Diagnostic dump kind -> time it was last logged
+        self.playwright_tracing = False
         
+    @asynccontextmanager
+    async def startup_phase(self, name: str):
+        """Time a startup phase and log how long it took"""
+        started = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - started
+            self.startup_timings[name] = round(elapsed, 3)
+            logger.info(f"Startup phase '{name}' took {elapsed:.2f}s")
+
     async def initialize(self):
         """Initialize the browser and navigate to ChatGPT"""
         try:
-            self.playwright = await async_playwright().start()
+            self.startup_timings = {}
+            async with self.startup_phase("playwright"):
+                self.playwright = await async_playwright().start()
             
-            # Launch browser with configuration settings
-            self.browser = await self.playwright.chromium.launch(
-                headless=Config.HEADLESS_MODE,
-                args=Config.get_browser_args()
-            )
+            # Launch browser with configuration settings. A persistent profile keeps
+            # the login (cookies, local storage) between restarts.
+            async with self.startup_phase("launch"):
+                if Config.BROWSER_CONNECT_MODE != "launch":
+                    await self.attach_browser()
+                elif Config.BROWSER_PROFILE_DIR:
+                    logger.info(f"Using persistent browser profile at {Config.BROWSER_PROFILE_DIR}")
+                    self.context = await self.playwright.chromium.launch_persistent_context(
+                        Config.BROWSER_PROFILE_DIR,
+                        headless=Config.HEADLESS_MODE,
+                        args=Config.get_browser_args()
+                    )
+                else:
+                    self.browser = await self.playwright.chromium.launch(
+                        headless=Config.HEADLESS_MODE,
+                        args=Config.get_browser_args()
+                    )
+                    
+                    # Share one context so every page sees the same login session
+                    self.context = await self.browser.new_context(storage_state=self.saved_storage_state())
+                self.context.set_default_timeout(Config.BROWSER_TIMEOUT)
             
-            # Create new page
-            self.page = await self.browser.new_page()
+            # A shared default context also serves other clients' tabs: headers and
+            # the resource filter are then set on our own pages (see open_page)
+            if not self.shared_context:
+                await self.context.set_extra_http_headers(EXTRA_HTTP_HEADERS)
+                
+                # Skip images, fonts, media and trackers the automation never looks at
+                if Config.BLOCK_RESOURCES:
+                    await self.resource_filter.install(self.context)
             
-            # Set user agent to avoid detection
-            await self.page.set_extra_http_headers({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            })
+            if Config.PLAYWRIGHT_TRACING and self.shared_context:
+                logger.warning("Playwright tracing records the whole context, not enabled on a shared browser")
+            elif Config.PLAYWRIGHT_TRACING:
+                await self.context.tracing.start(screenshots=True, snapshots=True)
+                self.playwright_tracing = True
+                logger.info("Playwright tracing started")
             
-            # Navigate to ChatGPT
-            await self.page.goto('https://chat.openai.com/', wait_until='networkidle')
+            # Open the page pool and navigate every page to ChatGPT, reusing the
+            # blank tab a persistent context starts with (tabs of a shared browser
+            # belong to other clients and are left alone)
+            async with self.startup_phase("pages"):
+                self.pool.clear()
+                pool_size = max(1, Config.PAGE_POOL_SIZE)
+                initial_pages = [] if self.shared_context else list(self.context.pages)[:pool_size]
+                pages = await asyncio.gather(*(
+                    self.open_page(initial_pages[i] if i < len(initial_pages) else None)
+                    for i in range(pool_size)
+                ))
+                for page in pages:
+                    worker = self.pool.add(page)
+                    await self.install_page_hooks(worker)
             
-            logger.info("Browser initialized and navigated to ChatGPT")
+            logger.info(f"Browser initialized with {pool_size} page(s) navigated to ChatGPT")
             self.is_initialized = True
             return True
             
@@ -45,6 +115,118 @@ class ChatGPTAutomation:
             logger.error(f"Failed to initialize browser: {str(e)}")
             return False
     
+    def saved_storage_state(self):
+        if Config.STORAGE_STATE_PATH and os.path.exists(Config.STORAGE_STATE_PATH):
+            logger.info(f"Restoring saved session from {Config.STORAGE_STATE_PATH}")
+            return Config.STORAGE_STATE_PATH
+        return None
+
+    async def attach_browser(self):
+        """Connect to an externally managed browser instead of launching one.
+
+        "cdp" attaches to a Chromium started with ``--remote-debugging-port`` and
+        uses its default context, so every replica shares the profile's login.
+        "server" connects to a Playwright browser server (``launchServer``) and
+        opens a context from STORAGE_STATE_PATH.
+        """
+        mode = Config.BROWSER_CONNECT_MODE
+        if mode not in ("cdp", "server"):
+            raise ValueError(f"Unknown BROWSER_CONNECT_MODE '{mode}' (expected launch, cdp or server)")
+        if not Config.BROWSER_ENDPOINT:
+            raise ValueError(f"BROWSER_CONNECT_MODE '{mode}' needs BROWSER_ENDPOINT")
+        logger.info(f"Attaching to browser at {Config.BROWSER_ENDPOINT} ({mode})")
+        if mode == "cdp":
+            self.browser = await self.playwright.chromium.connect_over_cdp(
+                Config.BROWSER_ENDPOINT, timeout=Config.BROWSER_TIMEOUT
+            )
+            if self.browser.contexts:
+                self.context = self.browser.contexts[0]
+                self.shared_context = True
+                return
+        else:
+            self.browser = await self.playwright.chromium.connect(Config.BROWSER_ENDPOINT, timeout=Config.BROWSER_TIMEOUT)
+        self.context = await self.browser.new_context(storage_state=self.saved_storage_state())
+
+    def playwright_trace_path(self) -> str:
+        os.makedirs(Config.TRACE_DIR, exist_ok=True)
+        prefix = f"{Config.SESSION_ID_PREFIX.rstrip('-')}-" if Config.SESSION_ID_PREFIX else ""
+        return os.path.join(Config.TRACE_DIR, f"playwright-{prefix}{time.strftime('%Y%m%d-%H%M%S')}.zip")
+
+    async def save_playwright_trace(self):
+        """Write what Playwright recorded so far (open with ``playwright show-trace``) and keep recording"""
+        if not self.playwright_tracing:
+            return None
+        path = self.playwright_trace_path()
+        await self.context.tracing.stop_chunk(path=path)
+        await self.context.tracing.start_chunk()
+        logger.info(f"Saved Playwright trace to {path}")
+        return path
+
+    async def install_page_hooks(self, worker):
+        if Config.RESPONSE_DETECTION == "observer":
+            await worker.watcher.install()
+
+    async def recycle_page(self, worker, timeout: float = None) -> bool:
+        """Replace a worker's page with a fresh one once its current request finishes"""
+        try:
+            async with self.pool.lease(timeout=timeout, preferred=worker):
+                logger.warning(f"Recycling page worker {worker.index}")
+                try:
+                    await worker.page.close()
+                except Exception as e:
+                    logger.debug(f"Closing old page failed: {e}")
+                worker.attach(await self.open_page())
+                await self.install_page_hooks(worker)
+                return True
+        except asyncio.TimeoutError:
+            logger.warning(f"Page worker {worker.index} stayed busy, recycling postponed")
+        except Exception as e:
+            logger.error(f"Failed to recycle page worker {worker.index}: {str(e)}")
+        return False
+
+    async def restart_browser(self, drain_timeout: float = None) -> bool:
+        """Restart the whole browser without dropping requests waiting for a page.
+
+        Every current page is leased first (waiting up to ``drain_timeout`` for
+        in-flight prompts), so waiters stay queued and are handed the new pages.
+        """
+        logger.warning("Restarting browser")
+        drained = []
+        for worker in list(self.pool.workers):
+            try:
+                drained.append(await self.pool.acquire(timeout=drain_timeout, preferred=worker))
+            except asyncio.TimeoutError:
+                logger.warning(f"Page worker {worker.index} still busy, restarting anyway")
+        await self.close()
+        success = await self.initialize()
+        for worker in drained:
+            self.pool.release(worker, served=False)
+        if not success:
+            logger.error("Browser restart failed")
+        return success
+
+    async def open_page(self, page=None):
+        """Open a page in the shared context and navigate it to ChatGPT"""
+        if page is None:
+            page = await self.context.new_page()
+            if self.shared_context:
+                # Scoped to this page, so they go away with it when we close it
+                await page.set_extra_http_headers(EXTRA_HTTP_HEADERS)
+                if Config.BLOCK_RESOURCES:
+                    await self.resource_filter.install(page)
+        await page.goto(Config.CHATGPT_URL, wait_until=Config.NAVIGATION_WAIT_UNTIL)
+        await self.wait_for_composer(page)
+        return page
+
+    async def wait_for_composer(self, page) -> bool:
+        """Wait until the composer is on screen instead of waiting for network idle"""
+        try:
+            await page.wait_for_selector(Config.COMPOSER_READY_SELECTOR, state='visible', timeout=Config.BROWSER_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.warning(f"Composer did not appear after navigation (login may be required): {e}")
+            return False
+    
     async def login_if_needed(self):
         """Skip login detection for testing - just mark as logged in"""
         try:
@@ -72,7 +254,8 @@ class ChatGPTAutomation:
                     logger.error(f"Failed to initialize browser during startup (attempt {attempt + 1})")
                     if attempt < max_retries - 1:
                         logger.info("Retrying browser initialization...")
-                        await asyncio.sleep(5)
+                        await self.close()  # Release the profile lock before retrying
+                        await asyncio.sleep(Config.STARTUP_RETRY_DELAY)
                         continue
                     return False
                 
@@ -83,11 +266,11 @@ class ChatGPTAutomation:
                     if attempt < max_retries - 1:
                         logger.info("Retrying automation setup...")
                         await self.close()  # Clean up before retry
-                        await asyncio.sleep(5)
+                        await asyncio.sleep(Config.STARTUP_RETRY_DELAY)
                         continue
                     return False
                 
-                logger.info("ChatGPT automation ready! Server can now accept requests.")
+                logger.info(f"ChatGPT automation ready! Server can now accept requests. Startup timings: {self.startup_timings}")
                 return True
                 
             except Exception as e:
@@ -95,7 +278,7 @@ class ChatGPTAutomation:
                 if attempt < max_retries - 1:
                     logger.info("Retrying initialization...")
                     await self.close()  # Clean up before retry
-                    await asyncio.sleep(5)
+                    await asyncio.sleep(Config.STARTUP_RETRY_DELAY)
                     continue
                 return False
         
@@ -105,172 +288,480 @@ class ChatGPTAutomation:
 
 
 
-    async def get_chat_response(self, prompt: str, max_retries: int = 3):
-        """Get response from ChatGPT for the given prompt"""
-        try:
-            if not self.is_initialized or not self.is_logged_in:
-                logger.error("ChatGPT automation not ready. Please ensure server started successfully.")
-                return None
+    async def get_chat_response(self, prompt: str, max_retries: int = 3, session=None, output_format: str = "text"):
+        """Get response from ChatGPT for the given prompt using a leased page.
 
-            page_title = await self.page.title()
-            page_url = self.page.url
-            logger.info(f"Current page: {page_title} at {page_url}")
+        With a ``session`` the prompt continues that session's conversation;
+        without one it goes to the page's scratch chat. ``output_format`` is
+        "text", "markdown" or "html".
 
-            login_prompt = await self.page.query_selector(
-                'button[data-testid="login-button"], button[data-testid="mobile-login-button"], a[href="/auth/login"]'
-            )
-            login_prompt_present = login_prompt is not None
-
-            await self.dismiss_page_overlays()
-
-            existing_messages = await self.page.query_selector_all('[data-message-author-role="assistant"]')
-            previous_response_count = len(existing_messages)
-
-            chat_input = None
-            selectors_to_try = [
-                'div[contenteditable="true"].ProseMirror',
-                'div#prompt-textarea[contenteditable="true"]',
-                'div[contenteditable="true"]',
-                'textarea[name="prompt-textarea"]',
-                'textarea[placeholder*="Ask anything"]',
-                'textarea[placeholder*="Message"]',
-                'textarea[placeholder="Message ChatGPT"]',
-                'textarea[data-id="root"]',
-                'textarea[role="textbox"]',
-                'textarea[aria-label*="Message"]',
-                'textarea'
-            ]
-
-            for selector in selectors_to_try:
-                logger.info(f"Trying selector: {selector}")
-                chat_input = await self.page.query_selector(selector)
-                if chat_input:
-                    logger.info(f"Found chat input with selector: {selector}")
-                    break
+        Returns ``(response, complete)``: ``complete`` is False when the answer
+        was still being generated at the timeout and ``response`` is partial.
+        """
+        if not self.is_initialized or not self.is_logged_in:
+            logger.error("ChatGPT automation not ready. Please ensure server started successfully.")
+            return None, False
 
-            if not chat_input:
-                if login_prompt_present:
-                    logger.error("ChatGPT login screen detected. Please log in or open a temporary chat manually.")
-                    return None
-                all_textareas = await self.page.query_selector_all('textarea')
-                all_contenteditable = await self.page.query_selector_all('div[contenteditable="true"]')
-
-                logger.error(
-                    f"Could not find chat input field. Found {len(all_textareas)} textareas and {len(all_contenteditable)} contenteditable divs:"
+        async with self.lease_page(session) as worker:
+            logger.info(f"Handling prompt on page worker {worker.index}")
+            if not await self.prepare_conversation(worker, session):
+                return None, False
+            response, complete = await self.run_prompt(worker, prompt, max_retries, output_format)
+            if response:
+                self.record_turn(worker, session)
+            return response, complete
+
+    @asynccontextmanager
+    async def lease_page(self, session=None):
+        """Lease any page, or the session's own page for session requests"""
+        if session is None:
+            async with self.pool.lease() as worker:
+                yield worker
+            return
+        # Turns of one conversation must not overlap
+        async with session.lock:
+            async with self.pool.lease(preferred=session.worker) as worker:
+                session.worker = worker
+                yield worker
+
+    @traced()
+    async def prepare_conversation(self, worker, session=None) -> bool:
+        """Make sure the page shows the right conversation before a prompt is entered"""
+        if session is None:
+            if worker.session_id is not None:
+                logger.info(f"Page worker {worker.index} shows a session conversation, starting a new chat")
+                return await self.start_new_chat(worker)
+            if worker.turns >= Config.MAX_TURNS_PER_CHAT or worker.dom_nodes >= Config.MAX_DOM_NODES:
+                logger.info(
+                    f"Recycling chat on page worker {worker.index} ({worker.turns} turns, {worker.dom_nodes} DOM nodes)"
                 )
+                return await self.start_new_chat(worker)
+            return True
 
-                for i, textarea in enumerate(all_textareas):
-                    try:
-                        placeholder = await textarea.get_attribute('placeholder')
-                        role = await textarea.get_attribute('role')
-                        data_id = await textarea.get_attribute('data-id')
-                        name = await textarea.get_attribute('name')
-                        logger.error(
-                            f"  Textarea {i + 1}: placeholder='{placeholder}', role='{role}', data-id='{data_id}', name='{name}'"
-                        )
-                    except Exception:
-                        logger.error(f"  Textarea {i + 1}: Could not get attributes")
-
-                for i, div in enumerate(all_contenteditable):
-                    try:
-                        class_name = await div.get_attribute('class')
-                        id_attr = await div.get_attribute('id')
-                        logger.error(f"  Contenteditable div {i + 1}: class='{class_name}', id='{id_attr}'")
-                    except Exception:
-                        logger.error(f"  Contenteditable div {i + 1}: Could not get attributes")
-
-                return None
-
-            await chat_input.click()
-            await asyncio.sleep(0.2)
+        if worker.session_id == session.session_id and worker.page.url == session.conversation_url:
+            return True
+        if session.conversation_url is None:
+            if not await self.start_new_chat(worker):
+                return False
+        else:
+            logger.info(f"Opening conversation of session {session.session_id} on page worker {worker.index}")
             try:
-                await chat_input.evaluate('el => el.focus()')
-            except Exception:
-                pass
-            await asyncio.sleep(0.1)
-
-            tag_name = await chat_input.evaluate('el => el.tagName.toLowerCase()')
-            logger.info(f"Input element type: {tag_name}")
-
-            current_text = ''
-            if tag_name == 'div':
-                logger.info("Handling contenteditable div input via keyboard")
-                cleared = False
-                for shortcut in ("Control+A", "Meta+A"):
-                    try:
-                        await self.page.keyboard.press(shortcut)
-                        await asyncio.sleep(0.1)
-                        await self.page.keyboard.press('Backspace')
-                        cleared = True
-                        break
-                    except Exception:
-                        continue
-                if not cleared:
-                    try:
-                        await chat_input.evaluate('el => el.innerHTML = ""')
-                    except Exception:
-                        pass
-                    await asyncio.sleep(0.1)
-                await self.page.keyboard.type(prompt, delay=50)
-                await asyncio.sleep(0.5)
-                current_text = await chat_input.inner_text()
-            else:
-                logger.info("Handling textarea input")
-                await chat_input.fill('')
-                await asyncio.sleep(0.2)
-                await chat_input.type(prompt, delay=50)
-                await asyncio.sleep(0.5)
-                current_text = await chat_input.input_value()
+                await worker.page.goto(session.conversation_url, wait_until=Config.NAVIGATION_WAIT_UNTIL)
+            except Exception as e:
+                logger.error(f"Failed to open session conversation: {str(e)}")
+                return False
+            await self.wait_for_composer(worker.page)
+            worker.turns = session.turns
+        worker.session_id = session.session_id
+        return True
+
+    @traced()
+    async def start_new_chat(self, worker) -> bool:
+        """Navigate the page to a fresh chat, dropping the old conversation's DOM"""
+        try:
+            await worker.page.goto(Config.CHATGPT_URL, wait_until=Config.NAVIGATION_WAIT_UNTIL)
+        except Exception as e:
+            logger.error(f"Failed to start a new chat: {str(e)}")
+            return False
+        await self.wait_for_composer(worker.page)
+        worker.session_id = None
+        worker.turns = 0
+        worker.dom_nodes = 0
+        return True
+
+    def record_turn(self, worker, session=None):
+        worker.turns += 1
+        if session is not None:
+            session.turns += 1
+            session.conversation_url = worker.page.url
+            worker.session_id = session.session_id
+
+    def note_block(self, reason: str):
+        """Record that ChatGPT refused this account (``"login"`` or ``"rate_limit"``)"""
+        self.last_block = {"reason": reason, "at": time.time()}
+        (LOGIN_WALLS if reason == "login" else RATE_LIMITS).inc()
+
+    def blocked_since(self, started: float):
+        """The block reason if one was recorded after ``started``, else None"""
+        if self.last_block and self.last_block["at"] >= started:
+            return self.last_block["reason"]
+        return None
 
-            if not current_text or current_text.strip() != prompt.strip():
-                logger.error(f"Failed to type text properly. Expected: '{prompt}', Got: '{current_text}'")
-                return None
+    async def check_rate_limit(self, worker, response: str = None) -> bool:
+        """Detect ChatGPT's rate-limit notice in the reply or on the page"""
+        limited = is_rate_limit_message(response)
+        if not limited and not response:
+            try:
+                limited = await worker.selectors.rate_limited(worker.page)
+            except Exception as e:
+                logger.debug(f"Could not check for a rate limit: {e}")
+        if limited:
+            logger.error("ChatGPT reports that this account is rate limited")
+            self.note_block("rate_limit")
+        return limited
+
+    @traced()
+    async def run_prompt(self, worker, prompt: str, max_retries: int = 3, output_format: str = "text"):
+        """Type the prompt into the worker's page and wait for the assistant's answer.
+
+        Returns ``(response, complete)`` like ``get_chat_response``.
+        """
+        page = worker.page
+        try:
+            prompt = await self.deliver_long_prompt(worker, prompt)
+            if prompt is None:
+                return None, False
+            chat_input, previous_response_count = await self.prepare_prompt(worker, prompt)
+            if not chat_input:
+                return None, False
 
             total_timeout = Config.RESPONSE_TIMEOUT * max(1, max_retries)
 
-            await self.submit_message(chat_input)
+            with time_phase("submit"):
+                await self.submit_message(page, chat_input)
+            submitted_at = time.perf_counter()
 
-            response = await self.wait_for_response(previous_response_count, total_timeout)
+            response, complete = await self.wait_for_response(worker, previous_response_count, total_timeout, output_format)
             if response:
-                return response
+                if await self.check_rate_limit(worker, response):
+                    return None, False
+                if complete:
+                    PHASE_SECONDS.labels("complete").observe(time.perf_counter() - submitted_at)
+                return response, complete
 
             logger.warning("No response detected after pressing Enter. Trying send button fallback.")
-            if await self.click_send_button():
-                response = await self.wait_for_response(previous_response_count, max(1, total_timeout // 2))
+            SEND_BUTTON_FALLBACKS.inc()
+            RETRIES.labels("send_button").inc()
+            if await self.click_send_button(worker):
+                response, complete = await self.wait_for_response(
+                    worker, previous_response_count, max(1, total_timeout // 2), output_format
+                )
                 if response:
-                    return response
+                    if await self.check_rate_limit(worker, response):
+                        return None, False
+                    if complete:
+                        PHASE_SECONDS.labels("complete").observe(time.perf_counter() - submitted_at)
+                    return response, complete
 
-            logger.error("Failed to obtain response from ChatGPT after retries")
-            return None
+            if not await self.check_rate_limit(worker):
+                logger.error("Failed to obtain response from ChatGPT after retries")
+            return None, False
 
         except Exception as e:
             logger.error(f"Error getting chat response: {str(e)}")
-            return None
+            return None, False
 
 
 
-    async def dismiss_page_overlays(self):
-        """Click cookie/consent dialogs so the composer remains usable"""
-        selectors = [
-            'button:has-text("Accept all")',
-            'button:has-text("Accept")',
-            'button:has-text("Reject non-essential")',
-            'button:has-text("I agree")',
-            'button:has-text("Got it")'
-        ]
-        for selector in selectors:
-            try:
-                button = await self.page.query_selector(selector)
-                if button:
-                    logger.info(f"Clicking overlay button: {selector}")
-                    await button.click()
-                    await asyncio.sleep(0.3)
+    async def stream_chat_response(self, prompt: str, max_retries: int = 3, session=None, output_format: str = "text"):
+        """Yield response events for the prompt while ChatGPT is still generating"""
+        if not self.is_initialized or not self.is_logged_in:
+            logger.error("ChatGPT automation not ready. Please ensure server started successfully.")
+            yield self.stream_result(False, "", "ChatGPT automation not ready", time.time())
+            return
+
+        async with self.lease_page(session) as worker:
+            logger.info(f"Streaming prompt on page worker {worker.index}")
+            if not await self.prepare_conversation(worker, session):
+                yield self.stream_result(False, "", "Failed to open the conversation", time.time())
+                return
+            async for event in self.stream_prompt(worker, prompt, max_retries, output_format):
+                if event["type"] == "done" and event["success"]:
+                    self.record_turn(worker, session)
+                yield event
+
+    async def stream_prompt(self, worker, prompt: str, max_retries: int = 3, output_format: str = "text"):
+        """Enter the prompt and yield text deltas, ending with a "done" event
+
+        Deltas are always plain text; with another ``output_format`` the final
+        event carries the finished message serialized in that format.
+        """
+        page = worker.page
+        started = time.time()
+        first_token_at = None
+        streamed = ""
+        try:
+            prompt = await self.deliver_long_prompt(worker, prompt)
+            if prompt is None:
+                yield self.stream_result(False, "", "Failed to deliver the long prompt to ChatGPT", started)
+                return
+            chat_input, previous_response_count = await self.prepare_prompt(worker, prompt)
+            if not chat_input:
+                yield self.stream_result(False, "", "Failed to enter prompt into ChatGPT", started)
+                return
+
+            total_timeout = Config.RESPONSE_TIMEOUT * max(1, max_retries)
+            with time_phase("submit"):
+                await self.submit_message(page, chat_input)
+            submitted_at = time.time()
+
+            final = None
+            for attempt, timeout_seconds in enumerate((total_timeout, max(1, total_timeout // 2))):
+                if attempt:
+                    logger.warning("No response detected after pressing Enter. Trying send button fallback.")
+                    SEND_BUTTON_FALLBACKS.inc()
+                    RETRIES.labels("send_button").inc()
+                    if not await self.click_send_button(worker):
+                        break
+
+                watching = worker.watcher.installed and await worker.watcher.start(previous_response_count)
+                if watching:
+                    events = worker.watcher.stream(timeout_seconds)
+                else:
+                    events = self.poll_events(page, previous_response_count, timeout_seconds)
+
+                async for event in events:
+                    text = event["text"]
+                    if event["type"] in ("progress", "done") and text.strip() and text != streamed:
+                        if first_token_at is None:
+                            first_token_at = time.time()
+                            # A poll's first text is the whole settled answer, not a first token
+                            if watching:
+                                PHASE_SECONDS.labels("first_token").observe(first_token_at - submitted_at)
+                        yield self.stream_delta(streamed, text)
+                        streamed = text
+                    if event["type"] != "progress":
+                        final = event
+
+                if (final and final["type"] == "login") or streamed.strip():
                     break
-            except Exception as overlay_error:
-                logger.debug(f"Overlay dismissal failed for {selector}: {overlay_error}")
 
+            if final is None or final["type"] == "login":
+                logger.error("ChatGPT requested login before responding.")
+                self.note_block("login")
+                yield self.stream_result(False, "", "ChatGPT requested login before responding", started, first_token_at)
+            elif streamed.strip() and await self.check_rate_limit(worker, streamed.strip()):
+                yield self.stream_result(False, "", "ChatGPT reports that this account is rate limited", started, first_token_at)
+            elif streamed.strip():
+                complete = final["type"] == "done"
+                if complete:
+                    PHASE_SECONDS.labels("complete").observe(time.time() - submitted_at)
+                else:
+                    logger.warning("Timed out before the response settled, returning partial text")
+                    TIMEOUTS.inc()
+                response = streamed.strip()
+                if complete and output_format != "text":
+                    response = await self.format_response(page, previous_response_count, output_format) or response
+                yield self.stream_result(True, response, None, started, first_token_at, complete)
+            elif await self.check_rate_limit(worker):
+                yield self.stream_result(False, "", "ChatGPT reports that this account is rate limited", started, first_token_at)
+            else:
+                logger.error("Failed to obtain response from ChatGPT after retries")
+                TIMEOUTS.inc()
+                yield self.stream_result(False, "", "Failed to get response from ChatGPT", started, first_token_at)
+
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            yield self.stream_result(False, streamed.strip(), str(e), started, first_token_at)
+
+    async def poll_events(self, page, previous_count: int, timeout_seconds: int):
+        """Adapt DOM polling to the watcher's event shape when no observer is available"""
+        response, complete = await self.poll_for_response(page, previous_count, timeout_seconds)
+        yield {"type": "done" if complete else "timeout", "text": response or ""}
+
+    def stream_delta(self, previous_text: str, current_text: str) -> dict:
+        """Describe how the response changed since the last snapshot"""
+        if current_text.startswith(previous_text):
+            return {"type": "delta", "text": current_text[len(previous_text):], "reset": False}
+        return {"type": "delta", "text": current_text, "reset": True}
+
+    def stream_result(self, success: bool, response: str, error_message, started: float,
+                      first_token_at: float = None, complete: bool = True) -> dict:
+        """Build the final streaming event with timing metadata"""
+        finished = time.time()
+        return {
+            "type": "done",
+            "success": success,
+            "response": response,
+            "error_message": error_message,
+            "complete": complete and success,
+            "timing": {
+                "first_token_seconds": round(first_token_at - started, 3) if first_token_at else None,
+                "total_seconds": round(finished - started, 3)
+            }
+        }
+
+    async def deliver_long_prompt(self, worker, prompt: str):
+        """Send what a large prompt needs ahead of its final message.
+
+        Attaches the prompt as a text file, or sends all but the last of its
+        numbered parts and waits for each acknowledgement. Returns the text
+        still to be entered and submitted (the prompt itself when it is small),
+        or None if delivery failed.
+        """
+        plan = plan_prompt(prompt)
+        if plan.strategy == "direct":
+            return prompt
+        logger.info(f"Prompt of about {plan.tokens} tokens, delivering it via {plan.strategy}")
+        if plan.strategy == "upload":
+            with time_phase("prompt_upload"):
+                if await self.upload_prompt(worker, plan):
+                    return plan.instruction
+            logger.warning("Could not attach the prompt as a file, sending it in parts instead")
+            plan = plan_prompt(prompt, strategy="chunks")
+        with time_phase("prompt_chunks"):
+            for index, part in enumerate(plan.parts[:-1], start=1):
+                if not await self.send_prompt_part(worker, part):
+                    logger.error(f"Part {index}/{len(plan.parts)} of the prompt was not acknowledged")
+                    return None
+        return plan.parts[-1]
+
+    async def upload_prompt(self, worker, plan) -> bool:
+        try:
+            return await worker.selectors.attach_file(
+                worker.page, plan.attachment_name, plan.prompt.encode("utf-8"), Config.UPLOAD_TIMEOUT
+            )
+        except Exception as e:
+            logger.warning(f"Prompt upload failed: {e}")
+            return False
+
+    @traced()
+    async def send_prompt_part(self, worker, part: str) -> bool:
+        """Send one intermediate part of a chunked prompt and wait for ChatGPT's acknowledgement"""
+        chat_input, previous_response_count = await self.prepare_prompt(worker, part)
+        if not chat_input:
+            return False
+        await self.submit_message(worker.page, chat_input)
+        acknowledgement, complete = await self.wait_for_response(worker, previous_response_count, Config.PROMPT_CHUNK_TIMEOUT)
+        worker.turns += 1
+        return complete and bool(acknowledgement) and not await self.check_rate_limit(worker, acknowledgement)
+
+    async def prepare_prompt(self, worker, prompt: str):
+        """Find the composer and enter the prompt without sending it.
+
+        Returns the composer element and the number of assistant messages already
+        on the page, or ``(None, None)`` if the prompt could not be entered.
+        """
+        page = worker.page
+        page_state = await worker.selectors.page_state(page)
+        worker.dom_nodes = page_state['domNodes']
+        logger.info(f"Current page: {page_state['title']} at {page.url}")
+        login_prompt_present = page_state['loginPromptPresent']
+
+        with time_phase("overlay_dismissal"):
+            await self.dismiss_page_overlays(worker)
+
+        previous_response_count = page_state['assistantCount']
+
+        with time_phase("selector_lookup"):
+            chat_input = await worker.selectors.composer.resolve(page)
+
+        if not chat_input:
+            if login_prompt_present:
+                logger.error("ChatGPT login screen detected. Please log in or open a temporary chat manually.")
+                self.note_block("login")
+                return None, None
+            logger.error("Could not find chat input field")
+            await self.log_page_controls(worker, "composer")
+            return None, None
+
+        await chat_input.click()
+        await asyncio.sleep(0.2)
+        try:
+            await chat_input.evaluate('el => el.focus()')
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+
+        tag_name = await chat_input.evaluate('el => el.tagName.toLowerCase()')
+        logger.info(f"Input element type: {tag_name}")
 
-    async def submit_message(self, chat_input):
+        with time_phase("input_entry"):
+            current_text = await self.enter_prompt(page, chat_input, tag_name, prompt)
+
+        if not self.prompt_matches(current_text, prompt):
+            logger.error(
+                f"Failed to type text properly. Expected {len(prompt)} chars ('{prompt[:80]}'), "
+                f"got {len(current_text or '')} chars ('{(current_text or '')[:80]}')"
+            )
+            return None, None
+
+        return chat_input, previous_response_count
+
+    def prompt_matches(self, current_text: str, prompt: str) -> bool:
+        """Check that the composer holds the prompt, ignoring how it rewrote whitespace"""
+        return bool(current_text) and prompt_digest(current_text) == prompt_digest(prompt)
+
+    async def enter_prompt(self, page, chat_input, tag_name: str, prompt: str) -> str:
+        """Put the prompt into the composer and return what the composer now holds"""
+        if Config.INPUT_MODE == "insert":
+            current_text = await self.insert_prompt(page, chat_input, tag_name, prompt)
+            if self.prompt_matches(current_text, prompt):
+                return current_text
+            logger.warning("Fast prompt insertion did not match the prompt, falling back to typing")
+            RETRIES.labels("typing_fallback").inc()
+        return await self.type_prompt(page, chat_input, tag_name, prompt)
+
+    async def clear_composer(self, page, chat_input, tag_name: str):
+        """Remove any leftover text from the composer"""
+        if tag_name != 'div':
+            await chat_input.fill('')
+            await asyncio.sleep(0.2)
+            return
+        cleared = False
+        for shortcut in ("Control+A", "Meta+A"):
+            try:
+                await page.keyboard.press(shortcut)
+                await asyncio.sleep(0.1)
+                await page.keyboard.press('Backspace')
+                cleared = True
+                break
+            except Exception:
+                continue
+        if not cleared:
+            try:
+                await chat_input.evaluate('el => el.innerHTML = ""')
+            except Exception:
+                pass
+            await asyncio.sleep(0.1)
+
+    async def read_composer(self, chat_input, tag_name: str) -> str:
+        if tag_name == 'div':
+            return await chat_input.inner_text()
+        return await chat_input.input_value()
+
+    async def insert_prompt(self, page, chat_input, tag_name: str, prompt: str) -> str:
+        """Set the whole prompt in one shot instead of typing it key by key"""
+        try:
+            await self.clear_composer(page, chat_input, tag_name)
+            if tag_name == 'div':
+                logger.info("Inserting prompt into contenteditable div in one shot")
+                await page.keyboard.insert_text(prompt)
+            else:
+                logger.info("Filling textarea with prompt in one shot")
+                await chat_input.fill(prompt)
+            await asyncio.sleep(0.1)
+            return await self.read_composer(chat_input, tag_name)
+        except Exception as insert_error:
+            logger.warning(f"Fast prompt insertion failed: {insert_error}")
+            return ''
+
+    async def type_prompt(self, page, chat_input, tag_name: str, prompt: str) -> str:
+        """Type the prompt one character at a time (slow but most compatible)"""
+        await self.clear_composer(page, chat_input, tag_name)
+        if tag_name == 'div':
+            logger.info("Handling contenteditable div input via keyboard")
+            await page.keyboard.type(prompt, delay=Config.TYPING_DELAY)
+        else:
+            logger.info("Handling textarea input")
+            await chat_input.type(prompt, delay=Config.TYPING_DELAY)
+        await asyncio.sleep(0.5)
+        return await self.read_composer(chat_input, tag_name)
+
+    async def dismiss_page_overlays(self, worker):
+        """Click cookie/consent dialogs so the composer remains usable"""
+        selector = None
+        try:
+            selector, button = await worker.selectors.find_overlay_button(worker.page)
+            if button:
+                logger.info(f"Clicking overlay button: {selector}")
+                await button.click()
+                await asyncio.sleep(0.3)
+        except Exception as overlay_error:
+            logger.debug(f"Overlay dismissal failed for {selector}: {overlay_error}")
+
+
+    async def submit_message(self, page, chat_input):
         """Send the current composer contents using the most reliable available method."""
         try:
             await chat_input.press("Enter")
@@ -279,101 +770,197 @@ class ChatGPTAutomation:
         except Exception as err:
             logger.debug(f"Chat input press failed: {err}")
         try:
-            await self.page.keyboard.press("Enter")
+            await page.keyboard.press("Enter")
             logger.info("Pressed Enter via page keyboard to send the message")
         except Exception as err:
             logger.error(f"Unable to submit message with Enter: {err}")
 
-    async def click_send_button(self) -> bool:
+    @traced()
+    async def click_send_button(self, worker) -> bool:
         """Attempt to click the send button if it exists"""
-        send_selectors = [
-            'button[data-testid="composer-send-button"]',
-            'button[data-testid="send-button"]',
-            'button[aria-label*="Send"]',
-            'button[title*="Send"]',
-            'button[type="submit"]'
-        ]
-
-        for selector in send_selectors:
-            logger.info(f"Trying send button selector: {selector}")
+        page = worker.page
+        try:
+            send_button = await worker.selectors.send_button.resolve(page)
+        except Exception as query_error:
+            logger.debug(f"Send button lookup failed: {query_error}")
+            send_button = None
+
+        if send_button:
             try:
-                send_button = await self.page.query_selector(selector)
-            except Exception as query_error:
-                logger.debug(f"Selector query failed for {selector}: {query_error}")
-                continue
+                await send_button.click()
+                logger.info("Send button clicked")
+                return True
+            except Exception as click_error:
+                logger.error(f"Failed to click send button: {str(click_error)}")
+                worker.selectors.send_button.invalidate()
 
-            if send_button:
-                logger.info(f"Found send button with selector: {selector}")
-                try:
-                    await send_button.click()
-                    logger.info("Send button clicked")
-                    return True
-                except Exception as click_error:
-                    logger.error(f"Failed to click send button: {str(click_error)}")
+        logger.error("Could not find send button")
+        await self.log_page_controls(worker, "send_button")
+        return False
+
+    async def log_page_controls(self, worker, kind: str):
+        """Log the page's inputs and buttons (one evaluate, one record), at most once per DIAGNOSTIC_DUMP_INTERVAL per kind.
 
-        all_buttons = await self.page.query_selector_all('button')
-        logger.error(f"Could not find send button. Found {len(all_buttons)} buttons on page:")
-        for i, button in enumerate(all_buttons):
+        With LOG_FORMAT = "json" the element attributes travel in the record's
+        ``controls`` field; plain text logs get them as a one-line summary.
+        """
+        now = time.time()
+        if now - self.last_diagnostics.get(kind, 0) < Config.DIAGNOSTIC_DUMP_INTERVAL:
+            return
+        self.last_diagnostics[kind] = now
+        try:
+            controls = await worker.selectors.describe_controls(worker.page)
+        except Exception as e:
+            logger.error(f"Could not collect page controls: {e}")
+            return
+        message = (
+            f"Page controls after {kind} lookup failed: {len(controls['textareas'])} textareas, "
+            f"{len(controls['contenteditable'])} contenteditable divs, {len(controls['buttons'])} buttons"
+        )
+        if Config.LOG_FORMAT != "json":
+            message += f": {format_controls(controls)}"
+        logger.error(message, extra={"controls": controls})
+
+
+    @traced()
+    async def wait_for_response(self, worker, previous_count: int, timeout_seconds: int, output_format: str = "text"):
+        """Wait for ChatGPT to finish generating a response, returned in ``output_format``
+
+        Returns ``(text, complete)``; on a timeout ``text`` is whatever had been
+        generated so far (or None) and ``complete`` is False.
+        """
+        started = time.perf_counter()
+        if worker.watcher.installed and await worker.watcher.start(previous_count):
+            result = None
+            events = worker.watcher.stream(timeout_seconds)
             try:
-                text = await button.inner_text()
-                aria_label = await button.get_attribute('aria-label')
-                title = await button.get_attribute('title')
-                data_testid = await button.get_attribute('data-testid')
-                logger.error(
-                    f"  Button {i + 1}: text='{text}', aria-label='{aria_label}', title='{title}', data-testid='{data_testid}'"
-                )
-            except Exception:
-                logger.error(f"  Button {i + 1}: Could not get attributes")
-        return False
+                async for event in events:
+                    if event["type"] in ("progress", "done") and event["text"].strip() and result is None:
+                        PHASE_SECONDS.labels("first_token").observe(time.perf_counter() - started)
+                        result = event
+                    if event["type"] != "progress":
+                        result = event
+            finally:
+                await events.aclose()
+
+            if result["type"] == "done":
+                cleaned = result["text"].strip()
+                logger.info(f"Response text preview: '{cleaned[:100]}...'")
+                if output_format != "text":
+                    return await self.format_response(worker.page, previous_count, output_format) or cleaned, True
+                return cleaned, True
+            if result["type"] == "login":
+                logger.error("ChatGPT requested login before responding.")
+                self.note_block("login")
+                return None, False
+            TIMEOUTS.inc()
+            if result["text"].strip():
+                logger.warning("Timed out before the response settled, returning partial text")
+                return result["text"].strip(), False
+            logger.error("Timed out waiting for assistant response")
+            return None, False
+
+        # Polling only sees the answer once it has settled, so it has no first-token time to record
+        return await self.poll_for_response(worker.page, previous_count, timeout_seconds, output_format)
+
+    @traced()
+    async def format_response(self, page, previous_count: int, output_format: str):
+        """Serialize the finished assistant message as Markdown or HTML"""
+        try:
+            extracted = await extract_response(page, previous_count, output_format)
+        except Exception as e:
+            logger.warning(f"Could not extract the response as {output_format}: {e}")
+            return None
+        return extracted["content"] or None
 
+    async def poll_for_response(self, page, previous_count: int, timeout_seconds: int, output_format: str = "text"):
+        """Wait for ChatGPT to generate a response by polling the DOM.
 
-    async def wait_for_response(self, previous_count: int, timeout_seconds: int):
-        """Wait for ChatGPT to generate a response by polling the DOM."""
-        selector = '[data-message-author-role="assistant"]'
+        Each poll is a single ``evaluate`` that reads the latest message, its
+        serialized form and the page state, instead of per-element round trips.
+        Returns ``(text, complete)`` like ``wait_for_response``.
+        """
         deadline = time.time() + max(1, timeout_seconds)
+        partial = None
 
         while time.time() < deadline:
             try:
-                assistant_messages = await self.page.query_selector_all(selector)
+                extracted = await extract_response(page, previous_count, output_format)
             except Exception as query_error:
                 logger.error(f"Error querying assistant messages: {query_error}")
-                return None
-
-            if assistant_messages and len(assistant_messages) > previous_count:
-                latest_element = assistant_messages[-1]
-                response_text = await latest_element.inner_text()
-                if response_text and response_text.strip():
-                    cleaned = response_text.strip()
-                    logger.info(f"Response text preview: '{cleaned[:100]}...'")
-                    return cleaned
-
-            login_prompt = await self.page.query_selector('button[data-testid="login-button"], button[data-testid="mobile-login-button"]')
-            if login_prompt:
+                return None, False
+
+            if extracted["text"]:
+                partial = extracted["content"] or extracted["text"]
+                if extracted["complete"]:
+                    logger.info(f"Response text preview: '{extracted['text'][:100]}...' ({extracted['length']} chars)")
+                    return partial, True
+
+            if extracted["loginPromptPresent"]:
                 logger.error("ChatGPT requested login before responding.")
-                return None
+                self.note_block("login")
+                return None, False
 
             await asyncio.sleep(1)
 
+        TIMEOUTS.inc()
+        if partial:
+            logger.warning("Timed out before the response settled, returning partial text")
+            return partial, False
         logger.error("Timed out waiting for assistant response")
-        return None
+        return None, False
 
     async def is_browser_connected(self):
         """Check if browser is still connected and accessible"""
         try:
-            if not self.page:
-                return False
-            await self.page.evaluate('() => document.title')
-            return True
+            if self.browser is not None:
+                return self.browser.is_connected()
+            # Persistent contexts have no Browser object: connected if any page answers
+            for worker in self.pool.workers:
+                try:
+                    await asyncio.wait_for(worker.page.evaluate('() => document.title'), Config.PAGE_CHECK_TIMEOUT)
+                    return True
+                except Exception:
+                    continue
+            return False
         except:
             return False
     
     async def close(self):
         """Close the browser and cleanup"""
         try:
+            if self.shared_context:
+                # The browser outlives this process: close only the pages we opened
+                for worker in self.pool.workers:
+                    try:
+                        await worker.page.close()
+                    except Exception as e:
+                        logger.debug(f"Closing page worker {worker.index} failed: {e}")
+            self.pool.clear()
+            if self.context and Config.STORAGE_STATE_PATH and not Config.BROWSER_PROFILE_DIR:
+                try:
+                    await self.context.storage_state(path=Config.STORAGE_STATE_PATH)
+                    logger.info(f"Saved session to {Config.STORAGE_STATE_PATH}")
+                except Exception as e:
+                    logger.warning(f"Could not save session state: {e}")
+            if self.playwright_tracing:
+                try:
+                    await self.context.tracing.stop(path=self.playwright_trace_path())
+                except Exception as e:
+                    logger.warning(f"Could not save Playwright trace: {e}")
+                self.playwright_tracing = False
+            if self.context and not self.shared_context:
+                await self.context.close()
             if self.browser:
+                # For an attached browser this only disconnects
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
+            self.context = None
+            self.browser = None
+            self.shared_context = False
+            self.playwright = None
+            self.is_initialized = False
             logger.info("Browser closed successfully")
         except Exception as e:
             logger.error(f"Error closing browser: {str(e)}")
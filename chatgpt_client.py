@@ -0,0 +1,391 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from models import ChatRequest, ChatResponse
+
+# Answers can take a while (queue wait plus generation); connecting should not
+DEFAULT_TIMEOUT = httpx.Timeout(180.0, connect=10.0)
+
+# Overload answers worth retrying: queue full (429) and queue timeout / no worker (503)
+RETRY_STATUSES = (429, 503)
+
+# Failures to open a connection, so the request was never sent. Errors after
+# sending (e.g. RemoteProtocolError) are not retried: the prompt may already be
+# running and a retry would submit it twice.
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class ChatAPIError(Exception):
+    """Raised when the API answers with an error status"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float = None):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class OverloadedError(ChatAPIError):
+    """The API was still overloaded (429/503) after every retry"""
+
+
+def percentile(values: list, q: float) -> float:
+    """Linear-interpolated percentile of ``values`` (q in 0..100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def retry_delay(attempt: int, retry_after: float = None, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter, added on top of the server's Retry-After"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after:
+        delay += retry_after
+    return min(cap, delay)
+
+
+def build_request(prompt, options: dict) -> dict:
+    """JSON body for /chat from a prompt string or ChatRequest plus field overrides"""
+    fields = prompt.model_dump(exclude_unset=True) if isinstance(prompt, ChatRequest) else {"prompt": prompt}
+    return ChatRequest(**dict(fields, **options)).model_dump(exclude_unset=True)
+
+
+class SSEParser:
+    """Turns the lines of a text/event-stream into ``{"type": event, **data}`` dicts"""
+
+    def __init__(self):
+        self.event = None
+        self.data = []
+
+    def feed(self, line: str):
+        """Consume one line; returns an event when a blank line completes one"""
+        if line.startswith("event:"):
+            self.event = line[6:].strip()
+        elif line.startswith("data:"):
+            self.data.append(line[5:].strip())
+        elif not line and self.data:
+            event = dict(json.loads("\n".join(self.data)), type=self.event or "message")
+            self.event, self.data = None, []
+            return event
+        return None
+
+
+class ClientMetrics:
+    """Client-side request counts and latency percentiles over the last ``window`` requests.
+
+    Updated from ChatClient.map's worker threads, so every access holds the lock.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=window)
+        self.first_token_latencies = deque(maxlen=window)
+
+    def record(self, started: float, success: bool, first_token_at: float = None):
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.requests += 1
+            if not success:
+                self.failures += 1
+            self.latencies.append(latency)
+            if first_token_at is not None:
+                self.first_token_latencies.append(first_token_at - started)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def summary(self) -> dict:
+        def describe(values):
+            values = list(values)
+            if not values:
+                return None
+            return {
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+                "p99": round(percentile(values, 99), 3),
+                "max": round(max(values), 3)
+            }
+
+        with self._lock:
+            requests, failures, retries = self.requests, self.failures, self.retries
+            latencies, first_token_latencies = list(self.latencies), list(self.first_token_latencies)
+        return {
+            "requests": requests,
+            "failures": failures,
+            "retries": retries,
+            "latency_seconds": describe(latencies),
+            "first_token_seconds": describe(first_token_latencies)
+        }
+
+
+class BaseChatClient:
+    """Settings and response handling shared by the async and sync clients"""
+
+    def __init__(self, base_url: str = "http://localhost:8000", *, timeout=DEFAULT_TIMEOUT, max_connections: int = 10,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 api_key: str = None, client_id: str = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.headers = {}
+        if api_key:
+            self.headers["X-API-Key"] = api_key
+        if client_id:
+            self.headers["X-Client-Id"] = client_id
+        self.metrics = ClientMetrics()
+
+    def retry_wait(self, attempt: int, response: httpx.Response = None):
+        """Seconds to wait before retrying, or None if the request must not be retried"""
+        if attempt >= self.max_retries:
+            return None
+        if response is None:
+            # The connection could not be opened, so nothing was sent: always safe to repeat
+            return retry_delay(attempt, None, self.backoff_base, self.backoff_max)
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        return retry_delay(attempt, self.retry_after(response), self.backoff_base, self.backoff_max)
+
+    def retry_after(self, response: httpx.Response):
+        try:
+            return float(response.headers.get("retry-after", ""))
+        except ValueError:
+            return None
+
+    def error(self, response: httpx.Response, body: bytes) -> ChatAPIError:
+        try:
+            detail = json.loads(body).get("detail", "")
+        except (ValueError, AttributeError):
+            detail = body.decode("utf-8", "replace")[:200]
+        error_type = OverloadedError if response.status_code in RETRY_STATUSES else ChatAPIError
+        return error_type(response.status_code, str(detail), self.retry_after(response))
+
+
+class AsyncChatClient(BaseChatClient):
+    """Async client: one pooled httpx connection set shared by every call
+
+        async with AsyncChatClient("http://pi:8000") as client:
+            reply = await client.chat("Hello")
+            replies = await client.map(prompts, concurrency=4)
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8000", **settings):
+        super().__init__(base_url, **settings)
+        self.http = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits, headers=self.headers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def send(self, method: str, path: str, body=None, stream: bool = False) -> httpx.Response:
+        """Send with retries on overload; the returned response is open when ``stream`` is set"""
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.send(self.http.build_request(method, path, json=body), stream=True)
+            except CONNECT_ERRORS:
+                wait = self.retry_wait(attempt)
+                if wait is None:
+                    raise
+            else:
+                if response.status_code < 400:
+                    if not stream:
+                        await response.aread()
+                    return response
+                content = await response.aread()
+                await response.aclose()
+                wait = self.retry_wait(attempt, response)
+                if wait is None:
+                    raise self.error(response, content)
+            self.metrics.record_retry()
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    async def chat(self, prompt, **options) -> ChatResponse:
+        """POST /chat; ``prompt`` is a string or ChatRequest, ``options`` are ChatRequest fields"""
+        started = time.perf_counter()
+        try:
+            response = await self.send("POST", "/chat", build_request(prompt, options))
+        except Exception:
+            self.metrics.record(started, False)
+            raise
+        result = ChatResponse(**response.json())
+        self.metrics.record(started, result.success)
+        return result
+
+    async def stream(self, prompt, **options):
+        """POST /chat/stream; yields ``delta`` events and ends with the ``done`` event"""
+        started = time.perf_counter()
+        first_token_at = None
+        success = False
+        response = None
+        try:
+            response = await self.send("POST", "/chat/stream", build_request(prompt, options), stream=True)
+            parser = SSEParser()
+            async for line in response.aiter_lines():
+                event = parser.feed(line)
+                if event is None:
+                    continue
+                if event["type"] == "delta" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                if event["type"] == "done":
+                    success = event.get("success", False)
+                yield event
+        finally:
+            if response is not None:
+                await response.aclose()
+            self.metrics.record(started, success, first_token_at)
+
+    async def map(self, prompts, concurrency: int = 4, return_exceptions: bool = False, **options) -> list:
+        """Run ``chat`` for every prompt with at most ``concurrency`` in flight; results keep input order"""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(prompt):
+            async with semaphore:
+                return await self.chat(prompt, **options)
+
+        return await asyncio.gather(*(run(prompt) for prompt in prompts), return_exceptions=return_exceptions)
+
+    async def batch(self, prompts, concurrency: int = None):
+        """POST /chat/batch; yields ``(index, ChatResponse)`` in completion order"""
+        body = {"prompts": [build_request(prompt, {}) if isinstance(prompt, ChatRequest) else prompt for prompt in prompts]}
+        if concurrency:
+            body["concurrency"] = concurrency
+        response = await self.send("POST", "/chat/batch", body, stream=True)
+        try:
+            async for line in response.aiter_lines():
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.pop("index"), ChatResponse(**item)
+        finally:
+            await response.aclose()
+
+    async def health(self) -> dict:
+        return (await self.send("GET", "/health")).json()
+
+
+class ChatClient(BaseChatClient):
+    """Blocking client with the same API as AsyncChatClient (thread-safe, pooled connections)"""
+
+    def __init__(self, base_url: str = "http://localhost:8000", **settings):
+        super().__init__(base_url, **settings)
+        self.http = httpx.Client(base_url=self.base_url, timeout=self.timeout, limits=self.limits, headers=self.headers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.http.close()
+
+    def send(self, method: str, path: str, body=None, stream: bool = False) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = self.http.send(self.http.build_request(method, path, json=body), stream=True)
+            except CONNECT_ERRORS:
+                wait = self.retry_wait(attempt)
+                if wait is None:
+                    raise
+            else:
+                if response.status_code < 400:
+                    if not stream:
+                        response.read()
+                    return response
+                content = response.read()
+                response.close()
+                wait = self.retry_wait(attempt, response)
+                if wait is None:
+                    raise self.error(response, content)
+            self.metrics.record_retry()
+            attempt += 1
+            time.sleep(wait)
+
+    def chat(self, prompt, **options) -> ChatResponse:
+        started = time.perf_counter()
+        try:
+            response = self.send("POST", "/chat", build_request(prompt, options))
+        except Exception:
+            self.metrics.record(started, False)
+            raise
+        result = ChatResponse(**response.json())
+        self.metrics.record(started, result.success)
+        return result
+
+    def stream(self, prompt, **options):
+        started = time.perf_counter()
+        first_token_at = None
+        success = False
+        response = None
+        try:
+            response = self.send("POST", "/chat/stream", build_request(prompt, options), stream=True)
+            parser = SSEParser()
+            for line in response.iter_lines():
+                event = parser.feed(line)
+                if event is None:
+                    continue
+                if event["type"] == "delta" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                if event["type"] == "done":
+                    success = event.get("success", False)
+                yield event
+        finally:
+            if response is not None:
+                response.close()
+            self.metrics.record(started, success, first_token_at)
+
+    def map(self, prompts, concurrency: int = 4, return_exceptions: bool = False, **options) -> list:
+        """Run ``chat`` for every prompt on ``concurrency`` threads; results keep input order.
+
+        With ``return_exceptions`` a failed prompt's exception takes its place in
+        the list; otherwise the first failure (in input order) is raised.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [executor.submit(self.chat, prompt, **options) for prompt in prompts]
+        results = []
+        for future in futures:
+            error = future.exception()
+            if error is not None and not return_exceptions:
+                raise error
+            results.append(error if error is not None else future.result())
+        return results
+
+    def batch(self, prompts, concurrency: int = None):
+        body = {"prompts": [build_request(prompt, {}) if isinstance(prompt, ChatRequest) else prompt for prompt in prompts]}
+        if concurrency:
+            body["concurrency"] = concurrency
+        response = self.send("POST", "/chat/batch", body, stream=True)
+        try:
+            for line in response.iter_lines():
+                if line.strip():
+                    item = json.loads(line)
+                    yield item.pop("index"), ChatResponse(**item)
+        finally:
+            response.close()
+
+    def health(self) -> dict:
+        return self.send("GET", "/health").json()
@@ -10,13 +10,113 @@ class Config:
     CHATGPT_URL: str = "https://chat.openai.com/"
     MAX_RETRIES: int = 3
     RESPONSE_TIMEOUT: int = 30  # seconds
+    RESPONSE_DETECTION: str = "observer"  # "observer" uses an in-page MutationObserver, "poll" checks the DOM every second
+    RESPONSE_STABILITY_MS: int = 1500  # Response is complete once unchanged this long with no stop button
+    RESPONSE_PROGRESS_MS: int = 100  # Minimum gap between progress events pushed from the page
+    
+    # Request queue configuration
+    QUEUE_MAX_DEPTH: int = 8  # Requests allowed to wait for a free page before returning 429
+    QUEUE_TIMEOUT: int = 60  # seconds a request may wait in the queue before returning 503
+    SERVICE_TIME_SMOOTHING: float = 0.2  # Weight of the newest sample in the Retry-After estimate
+    BATCH_MAX_CONCURRENCY: int = 4  # Upper bound on prompts a single /chat/batch call runs at once
+    PRIORITY_WEIGHTS: dict = {"interactive": 8, "batch": 1}  # Fair-queuing share of each priority class
+    CLIENT_MAX_CONCURRENCY: Optional[int] = None  # Pages one client may hold at once (None: no cap)
+    CLIENT_CONCURRENCY_LIMITS: dict = {}  # Per-client overrides, e.g. {"nightly-batch": 1}
+    RESERVED_INTERACTIVE_SLOTS: int = 0  # Pages batch requests leave free for interactive ones
+    API_KEYS: dict = {}  # Optional API key -> client name; other keys are identified by a hash
+    
+    # Response cache configuration
+    CACHE_ENABLED: bool = False  # Serve repeated prompts from cache (per request: cache="bypass"|"prefer"|"only")
+    CACHE_MAX_ENTRIES: int = 1024  # In-memory LRU size
+    CACHE_TTL: int = 3600  # seconds a cached response stays valid
+    CACHE_DB_PATH: Optional[str] = None  # SQLite file that keeps cached responses across restarts, e.g. "response_cache.db"
+    
+    # Identical prompts that arrive while one is in flight share its result
+    SINGLE_FLIGHT_ENABLED: bool = True
     
     # Browser configuration
     HEADLESS_MODE: bool = False  # Set to False for login process and debugging
     BROWSER_TIMEOUT: int = 30000  # milliseconds
+    BROWSER_PROFILE_DIR: Optional[str] = "browser_profile"  # Persistent Chromium profile that keeps the login across restarts (None for a fresh profile)
+    STORAGE_STATE_PATH: Optional[str] = None  # Without a profile dir, save/restore cookies and local storage via this JSON file
+    NAVIGATION_WAIT_UNTIL: str = "domcontentloaded"  # Playwright load state to wait for when opening ChatGPT
+    COMPOSER_READY_SELECTOR: str = 'div#prompt-textarea, div[contenteditable="true"], textarea'  # Page is ready once this is visible
+    STARTUP_RETRY_DELAY: int = 2  # seconds between startup attempts
+    BROWSER_CONNECT_MODE: str = "launch"  # "launch" starts Chromium in this process; "cdp" / "server" attach to a long-lived browser at BROWSER_ENDPOINT
+    BROWSER_ENDPOINT: Optional[str] = None  # e.g. "http://127.0.0.1:9222" (cdp) or "ws://127.0.0.1:3000/<id>" (Playwright browser server)
+    
+    # Browser supervisor (background liveness/memory checks behind /health)
+    SUPERVISOR_ENABLED: bool = True
+    SUPERVISOR_INTERVAL: int = 15  # seconds between checks
+    PAGE_CHECK_TIMEOUT: int = 5  # seconds a page has to answer a liveness probe
+    MAX_PAGE_HEAP_MB: int = 400  # Pages using more JS heap than this are recycled
+    SUPERVISOR_DRAIN_TIMEOUT: int = 120  # seconds to wait for in-flight prompts before recycling
+    
+    # Resource blocking (cuts page weight, CPU and memory on the Pi)
+    BLOCK_RESOURCES: bool = True
+    BLOCKED_RESOURCE_TYPES: list = ["image", "media", "font"]
+    BLOCKED_DOMAINS: list = [
+        "google-analytics.com",
+        "googletagmanager.com",
+        "doubleclick.net",
+        "segment.io",
+        "segment.com",
+        "intercom.io",
+        "intercomcdn.com",
+        "browser-intake-datadoghq.com",
+        "sentry.io"
+    ]
+    ALLOWED_DOMAINS: Optional[list] = None  # When set, requests to any other domain are blocked (keep login/captcha hosts in it)
+    PAGE_POOL_SIZE: int = 2  # Number of ChatGPT pages serving requests in parallel
+    MAX_TURNS_PER_CHAT: int = 20  # Stateless prompts move to a fresh chat after this many turns
+    MAX_DOM_NODES: int = 15000  # ...or once the conversation's DOM grows past this many elements
+    SESSION_IDLE_TIMEOUT: int = 1800  # seconds before an unused session is dropped
+    INPUT_MODE: str = "insert"  # "insert" sets the prompt in one shot, "type" types it key by key
+    TYPING_DELAY: int = 50  # milliseconds between keystrokes when typing
+    
+    # Long prompts: estimated size decides how they are delivered
+    PROMPT_DIRECT_MAX_TOKENS: int = 6000  # Larger prompts are attached as a file or split into parts
+    LONG_PROMPT_STRATEGY: str = "upload"  # "upload" attaches a .txt via the file input (falls back to chunks), "chunks" sends numbered parts
+    PROMPT_CHUNK_TOKENS: int = 4000  # Size of each part of a chunked prompt
+    PROMPT_CHUNK_TIMEOUT: int = 60  # seconds to wait for ChatGPT to acknowledge each part
+    UPLOAD_TIMEOUT: int = 30  # seconds to wait for an attached prompt file to finish uploading
+    
+    # Async job API (POST /jobs): durable SQLite queue drained in the background
+    JOBS_ENABLED: bool = True
+    JOBS_DB_PATH: str = "jobs.db"
+    JOB_WORKERS: int = 1  # Jobs run at once per process (they share the page pool with /chat)
+    JOB_POLL_INTERVAL: int = 5  # seconds between checks for jobs queued by other processes
+    JOB_RETENTION: int = 7 * 24 * 3600  # seconds finished jobs are kept
+    WEBHOOK_TIMEOUT: int = 10  # seconds
+    WEBHOOK_RETRIES: int = 3
+    
+    # Multi-process mode: start_server.py runs this many worker processes, each with
+    # its own browser, behind a front router that forwards requests over unix sockets
+    WORKER_PROCESSES: int = 1
+    WORKER_SOCKET_DIR: str = "/tmp/chatgpt-api"  # One <dir>/worker-<n>.sock per worker
+    WORKER_HEALTH_INTERVAL: int = 5  # seconds between the router's readiness polls
+    WORKER_RESTART_DELAY: int = 5  # seconds before a worker that exited is started again
+    SESSION_ID_PREFIX: str = ""  # Set per worker so the router can route a session back to it
+    BACKENDS_FILE: Optional[str] = None  # JSON list of accounts (name, profile_dir or browser_endpoint, concurrency, weight); one worker each
+    RATE_LIMIT_COOLDOWN: int = 900  # seconds the router avoids a backend after ChatGPT rate limits it
+    LOGIN_WALL_COOLDOWN: int = 300  # seconds the router avoids a backend after it hits a login wall
     
     # Logging configuration
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # "json" writes one JSON object per line with the request's correlation id
+    LOG_FILE: Optional[str] = "chatgpt_api.log"  # Written by a background thread, never by the event loop
+    LOG_SAMPLE_RATE: float = 1.0  # Fraction of requests whose hot-path INFO/DEBUG lines are kept (warnings always are)
+    DIAGNOSTIC_DUMP_INTERVAL: int = 60  # seconds between DOM dumps of inputs/buttons when a selector is not found
+    
+    # Tracing and profiling (all opt-in; output goes to TRACE_DIR)
+    TRACE_ENABLED: bool = False  # Trace every request; otherwise only requests sent with "X-Trace: 1"
+    TRACE_FORMAT: str = "chrome"  # "chrome" (chrome://tracing, Perfetto) or "otlp" (OpenTelemetry JSON)
+    TRACE_DIR: str = "traces"
+    TRACE_RETENTION: int = 200  # Newest request traces kept on disk
+    PLAYWRIGHT_TRACING: bool = False  # Record a Playwright trace (screenshots, DOM snapshots); saved by POST /debug/playwright-trace and on shutdown
+    PROFILING_ENABLED: bool = False  # Allow POST /debug/profile (cProfile or py-spy capture of the server process)
+    PROFILE_INTERVAL: int = 0  # When > 0, capture a cProfile sample every this many seconds
+    PROFILE_DURATION: int = 10  # seconds per sampled capture
     
     @classmethod
     def get_browser_args(cls) -> list:
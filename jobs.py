@@ -0,0 +1,328 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+
+import httpx
+
+from config import Config
+from logging_setup import bind_request_id, reset_request_id
+from request_queue import QueueFullError, QueueTimeoutError
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = (
+    "job_id", "status", "request", "response", "success", "error_message", "webhook_url",
+    "webhook_status", "owner", "affinity", "attempts", "created_at", "started_at", "finished_at"
+)
+
+DEFER_MAX_DELAY = 60  # cap in seconds on the backoff of jobs deferred by JobDeferredError
+
+
+class JobNotFoundError(KeyError):
+    """Raised when a job id does not exist (or was pruned)"""
+
+    def __init__(self, job_id: str):
+        super().__init__(job_id)
+        self.job_id = job_id
+
+    def __str__(self):
+        return f"Job '{self.job_id}' not found"
+
+
+class JobDeferredError(Exception):
+    """Raised by the job handler when the job cannot run yet (e.g. the browser is restarting)"""
+
+
+class JobStore:
+    """SQLite (WAL) table of jobs, shared safely by the worker processes of one host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, response TEXT, "
+            "success INTEGER, error_message TEXT, webhook_url TEXT, webhook_status TEXT, owner TEXT, "
+            "affinity TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _row(self, row) -> dict:
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        job["request"] = json.loads(job["request"])
+        job["success"] = None if job["success"] is None else bool(job["success"])
+        return job
+
+    def create(self, request: dict, webhook_url: str = None, affinity: str = None) -> dict:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, status, request, webhook_url, affinity, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(request), webhook_url, affinity, time.time())
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def claim(self, owner: str, affinity: str = None) -> dict:
+        """Atomically move the oldest queued job this worker may run to 'running'"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE status = 'queued' AND (affinity IS NULL OR affinity = ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (affinity,)
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, started_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+                        (owner, time.time(), row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row else None
+
+    def defer(self, job_id: str):
+        """Requeue a job that never started, without counting the claim as an attempt"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, started_at = NULL, attempts = attempts - 1 WHERE job_id = ?",
+                (job_id,)
+            )
+
+    def recover(self, owner: str) -> int:
+        """Requeue jobs this owner was running when it stopped"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL WHERE status = 'running' AND owner = ?", (owner,)
+            )
+        return cursor.rowcount
+
+    def finish(self, job_id: str, success: bool, response: str, error_message: str = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, success = ?, response = ?, error_message = ?, finished_at = ?, "
+                "webhook_status = CASE WHEN webhook_url IS NULL THEN NULL ELSE 'pending' END WHERE job_id = ?",
+                ("completed" if success else "failed", int(success), response, error_message, time.time(), job_id)
+            )
+
+    def set_webhook_status(self, job_id: str, status: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET webhook_status = ? WHERE job_id = ?", (status, job_id))
+
+    def pending_webhooks(self, owner: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE webhook_status = 'pending' AND owner = ?", (owner,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def prune(self, older_than: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?", (older_than,)
+            )
+        return cursor.rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def describe_job(job: dict) -> dict:
+    """Public view of a job, as returned by GET /jobs/{id} and sent to webhooks"""
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "response": job["response"],
+        "success": job["success"],
+        "error_message": job["error_message"],
+        "webhook_status": job["webhook_status"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
+
+
+class JobRunner:
+    """Background tasks that pull queued jobs from the store and run them like /chat requests"""
+
+    def __init__(self):
+        self._store = None
+        self._tasks = []
+        self._wakeup = None
+        self.handler = None
+        self.owner = None
+        self.completed = 0
+        self.failed = 0
+        self.deferrals = 0  # consecutive JobDeferredErrors, for the backoff
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = JobStore(Config.JOBS_DB_PATH)
+        return self._store
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def submit(self, request: dict, webhook_url: str = None) -> dict:
+        # Session jobs must run in the process that holds the session's page
+        affinity = Config.SESSION_ID_PREFIX if request.get("session_id") else None
+        job = await self._call(self.store.create, request, webhook_url, affinity)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> dict:
+        job = await self._call(self.store.get, job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    def start(self, handler):
+        """Run jobs with ``handler(request_dict)``, which returns a ChatResponse"""
+        if self._tasks:
+            return
+        self.handler = handler
+        self.owner = Config.SESSION_ID_PREFIX or "main"
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self.run()) for _ in range(max(1, Config.JOB_WORKERS))]
+        self._tasks.append(asyncio.ensure_future(self.resume()))
+        logger.info(f"Job runner started with {Config.JOB_WORKERS} worker(s), store {Config.JOBS_DB_PATH}")
+
+    async def resume(self):
+        """After a restart: requeue interrupted jobs, redeliver webhooks and prune old jobs"""
+        recovered = await self._call(self.store.recover, self.owner)
+        if recovered:
+            logger.info(f"Requeued {recovered} job(s) interrupted by the last shutdown")
+            self._wakeup.set()
+        for job_id in await self._call(self.store.pending_webhooks, self.owner):
+            await self.deliver_webhook(await self.get(job_id))
+        pruned = await self._call(self.store.prune, time.time() - Config.JOB_RETENTION)
+        if pruned:
+            logger.info(f"Pruned {pruned} finished job(s)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        # Jobs cut off mid-prompt are picked up again on the next start
+        if self._store is not None:
+            await self._call(self.store.recover, self.owner)
+            self._store.close()
+            self._store = None
+
+    async def run(self):
+        while True:
+            try:
+                job = await self._call(self.store.claim, self.owner, Config.SESSION_ID_PREFIX)
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), Config.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Log lines of a job carry its id as the correlation id
+            token = bind_request_id(job["job_id"])
+            try:
+                await self.execute(job)
+            finally:
+                reset_request_id(token)
+
+    async def execute(self, job: dict):
+        logger.info(f"Running job {job['job_id']} (attempt {job['attempts']})")
+        try:
+            result = await self.handler(job["request"])
+            self.deferrals = 0
+        except (QueueFullError, QueueTimeoutError) as e:
+            # Interactive requests have the pages: try again once a slot frees up.
+            # The prompt never ran, so this claim is not an attempt either
+            await self._call(self.store.defer, job["job_id"])
+            await asyncio.sleep(e.retry_after)
+            return
+        except JobDeferredError as e:
+            # Not the job's fault: keep it queued and back off until the automation is back
+            delay = min(DEFER_MAX_DELAY, Config.JOB_POLL_INTERVAL * 2 ** min(self.deferrals, 6))
+            self.deferrals += 1
+            logger.warning(f"Job {job['job_id']} deferred for {delay}s: {e}")
+            await self._call(self.store.defer, job["job_id"])
+            await asyncio.sleep(delay)
+            return
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} failed: {e}")
+            await self._call(self.store.finish, job["job_id"], False, "", str(e))
+            self.failed += 1
+        else:
+            await self._call(self.store.finish, job["job_id"], result.success, result.response, result.error_message)
+            if result.success:
+                self.completed += 1
+            else:
+                self.failed += 1
+        finished = await self.get(job["job_id"])
+        if finished["webhook_url"]:
+            await self.deliver_webhook(finished)
+
+    async def deliver_webhook(self, job: dict):
+        """POST the finished job to its webhook, retrying with backoff"""
+        payload = describe_job(job)
+        payload["webhook_status"] = "delivered"
+        async with httpx.AsyncClient(timeout=Config.WEBHOOK_TIMEOUT) as client:
+            for attempt in range(Config.WEBHOOK_RETRIES):
+                try:
+                    response = await client.post(job["webhook_url"], json=payload)
+                    if response.status_code < 400:
+                        await self._call(self.store.set_webhook_status, job["job_id"], "delivered")
+                        return
+                    logger.warning(f"Webhook for job {job['job_id']} answered {response.status_code}")
+                except httpx.HTTPError as e:
+                    logger.warning(f"Webhook for job {job['job_id']} failed: {e}")
+                await asyncio.sleep(2 ** attempt)
+        await self._call(self.store.set_webhook_status, job["job_id"], "failed")
+
+    async def stats(self) -> dict:
+        try:
+            counts = await self._call(self.store.counts)
+        except Exception as e:
+            counts = {"error": str(e)}
+        return {
+            "running": bool(self._tasks),
+            "workers": Config.JOB_WORKERS,
+            "completed": self.completed,
+            "failed": self.failed,
+            "by_status": counts
+        }
+
+
+# Global instance
+job_runner = JobRunner()
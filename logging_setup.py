@@ -0,0 +1,179 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+import zlib
+
+from config import Config
+
+REQUEST_ID_HEADER = "X-Request-Id"
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,64}")  # Caller-supplied ids that are safe to log
+
+# Correlation id of the request the current task is serving (None outside requests)
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Loggers on the per-prompt hot path whose INFO/DEBUG lines are sampled by LOG_SAMPLE_RATE
+HOT_PATH_LOGGERS = ("chatgpt_automation", "selector_registry", "response_watcher", "response_extractor", "page_pool")
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+def bind_request_id(request_id: str = None):
+    """Make ``request_id`` (or a fresh one) the current task's correlation id; returns the reset token"""
+    return request_id_var.set(request_id or new_request_id())
+
+
+def reset_request_id(token):
+    request_id_var.reset(token)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: bind the caller's X-Request-Id (or a new one) and echo it on the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        supplied = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode("latin-1"), b"").decode("latin-1")
+        request_id = supplied if REQUEST_ID_PATTERN.fullmatch(supplied) else new_request_id()
+        token = bind_request_id(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = [(name, value) for name, value in message.get("headers", []) if name.lower() != b"x-request-id"]
+                message["headers"] = headers + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            reset_request_id(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the correlation id; runs in the calling task, before the queue hand-off"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of hot-path INFO/DEBUG records; warnings and errors always pass.
+
+    Records of one request are kept or dropped together so a sampled request can
+    be followed end to end.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if not record.name.startswith(HOT_PATH_LOGGERS):
+            return True
+        request_id = getattr(record, "request_id", "-")
+        if request_id == "-":
+            return random.random() < self.rate
+        return (zlib.crc32(request_id.encode("utf-8")) % 10000) < self.rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields passed to the logger"""
+
+    def __init__(self, process_name: str = None):
+        super().__init__()
+        self.process_name = process_name
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": self.process_name or "main",
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(process_name: str = None, log_file: str = None):
+    """Route all logging through a queue so the event loop never writes to disk itself.
+
+    The root logger gets a ``QueueHandler``; a ``QueueListener`` thread formats
+    (plain text or JSON, per LOG_FORMAT) and writes to stdout and ``log_file``.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    else:
+        atexit.register(stop_logging)
+
+    if Config.LOG_FORMAT == "json":
+        formatter = JsonFormatter(process_name)
+    else:
+        prefix = f'{process_name} - ' if process_name else ''
+        formatter = logging.Formatter(f'%(asctime)s - {prefix}%(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    log_file = log_file if log_file is not None else Config.LOG_FILE
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(SamplingFilter(Config.LOG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, Config.LOG_LEVEL))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def logging_configured() -> bool:
+    return _listener is not None
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
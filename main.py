@@ -1,26 +1,94 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from typing import List
+from contextlib import asynccontextmanager
 import asyncio
+import hashlib
+import json
 import logging
+import time
 from chatgpt_automation import chatgpt_automation
+from config import Config
+from request_queue import request_queue, QueueFullError, QueueTimeoutError, DEFAULT_CLIENT
+from response_cache import response_cache, cache_key
+from singleflight import chat_flights
+from sessions import session_manager, SessionNotFoundError
+from supervisor import browser_supervisor
+from jobs import job_runner, describe_job, JobNotFoundError, JobDeferredError
+from models import ChatRequest, ChatResponse, JobRequest, BatchRequest
+from logging_setup import RequestIdMiddleware, current_request_id, configure_logging, logging_configured
+from streaming import GuardedStreamingResponse
+from tracing import tracer, TRACE_ID_HEADER
+from profiler import profiler, ProfilerError
+from metrics import registry, time_phase, REQUEST_SECONDS, QUEUE_DEPTH, QUEUE_RUNNING, PAGES_BUSY, PAGES_TOTAL
 import uvicorn
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by start_server.py, the __main__ block below, or on startup
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Custom ChatGPT API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # `uvicorn main:app` does not go through start_server.py's setup
+    if not logging_configured():
+        configure_logging()
+    yield
+
+app = FastAPI(title="Custom ChatGPT API", version="1.0.0", lifespan=lifespan)
+app.add_middleware(RequestIdMiddleware)
 
 # Use the same automation instance as start_server.py
 
-class ChatRequest(BaseModel):
-    prompt: str
-    max_retries: int = 3
+def resolve_client(http_request: Request, request: ChatRequest) -> str:
+    """Identify the caller for fair queuing and per-client limits.
+
+    An API key always wins, so a keyed caller cannot claim another client's share
+    or limits; without one the X-Client-Id header, then the body's client_id.
+    """
+    api_key = http_request.headers.get("x-api-key")
+    authorization = http_request.headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    if api_key:
+        return Config.API_KEYS.get(api_key) or "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    if http_request.headers.get("x-client-id"):
+        return http_request.headers["x-client-id"]
+    if request.client_id:
+        return request.client_id
+    return DEFAULT_CLIENT
+
+def request_cache_key(request: ChatRequest) -> str:
+    """Cache and single-flight key; formatted answers are kept apart from plain text"""
+    if request.format == "text":
+        return cache_key(request.prompt)
+    return cache_key(request.prompt, format=request.format)
+
+def flight_key(request: ChatRequest) -> str:
+    """Single-flight key: identical prompts coalesce only within one client's flow.
 
-class ChatResponse(BaseModel):
-    response: str
-    success: bool
-    error_message: str = None
+    Followers wait on the leader's queue slot, so they must share its client
+    (per-client limits), priority class, queue timeout and retry budget.
+    """
+    flow = (request.client_id or DEFAULT_CLIENT, request.priority, request.queue_timeout, request.max_retries)
+    return request_cache_key(request) + ":" + json.dumps(flow)
+
+async def lookup_cached_response(request: ChatRequest):
+    """Return a ChatResponse from the cache, or None if the prompt must go to ChatGPT"""
+    # Answers inside a conversation depend on its history, so they are never cached
+    if request.cache == "bypass" or request.session_id:
+        return None
+    if response_cache.enabled:
+        cached = await response_cache.get(request_cache_key(request))
+        if cached is not None:
+            logger.info("Serving chat request from response cache")
+            return ChatResponse(response=cached, success=True, cached=True, format=request.format)
+    if request.cache == "only":
+        return ChatResponse(response="", success=False, error_message="No cached response for this prompt")
+    return None
+
+async def store_cached_response(request: ChatRequest, response: str):
+    if response_cache.enabled and not request.session_id:
+        await response_cache.put(request_cache_key(request), response)
 
 @app.get("/")
 async def root():
@@ -31,48 +99,395 @@ async def root():
         "automation_ready": automation_ready
     }
 
+async def process_chat_request(request: ChatRequest) -> ChatResponse:
+    """
+    Run one chat request through the cache, admission queue and automation.
+
+    Raises QueueFullError / QueueTimeoutError when the request is not admitted and
+    SessionNotFoundError when it names an unknown session.
+    """
+    session = session_manager.get(request.session_id) if request.session_id else None
+
+    cached_response = await lookup_cached_response(request)
+    if cached_response:
+        return cached_response
+
+    # Check if automation is ready
+    if not chatgpt_automation.is_initialized or not chatgpt_automation.is_logged_in:
+        logger.error("Chat request received but automation not ready")
+        return ChatResponse(
+            response="", 
+            success=False, 
+            error_message="ChatGPT automation not ready. Please ensure server started successfully and login completed."
+        )
+    
+    logger.info(f"Received chat request: {request.prompt[:50]}...")
+    
+    # Wait for an admission slot, then get response from ChatGPT
+    queue_timeout = request.queue_timeout if request.queue_timeout is not None else Config.QUEUE_TIMEOUT
+
+    async def run_prompt():
+        async with request_queue.slot(timeout=queue_timeout, client=request.client_id or DEFAULT_CLIENT, priority=request.priority):
+            return await chatgpt_automation.get_chat_response(
+                prompt=request.prompt,
+                max_retries=request.max_retries,
+                session=session,
+                output_format=request.format
+            )
+
+    if Config.SINGLE_FLIGHT_ENABLED and session is None:
+        # Identical prompts already in flight share one browser round trip
+        response, complete = await chat_flights.do(flight_key(request), run_prompt)
+    else:
+        response, complete = await run_prompt()
+    
+    if response and complete:
+        logger.info("Successfully got response from ChatGPT")
+        await store_cached_response(request, response)
+        return ChatResponse(response=response, success=True, format=request.format)
+    elif response:
+        # A truncated answer is returned for inspection but is neither a success nor cached
+        logger.error("ChatGPT was still generating when the response timed out")
+        return ChatResponse(
+            response=response,
+            success=False,
+            error_message="Timed out before the response finished; 'response' holds the partial text",
+            format=request.format
+        )
+    else:
+        logger.error("Failed to get response from ChatGPT")
+        return ChatResponse(
+            response="", 
+            success=False, 
+            error_message="Failed to get response from ChatGPT"
+        )
+
+def start_trace(name: str, request: ChatRequest, http_request: Request):
+    """Trace this request if TRACE_ENABLED or it was sent with ``X-Trace: 1``"""
+    return tracer.start(
+        name, http_request.headers, request_id=current_request_id() or "-", client=request.client_id,
+        priority=request.priority, format=request.format, prompt_chars=len(request.prompt)
+    )
+
+def request_outcome(result: ChatResponse) -> str:
+    """Outcome label for the request latency histogram"""
+    if result.cached:
+        return "cached"
+    return "success" if result.success else "failure"
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response, http_request: Request):
     """
     Send a prompt to ChatGPT and return the response
     """
+    request.client_id = resolve_client(http_request, request)
+    started = time.perf_counter()
+    received_at = time.time()
+    outcome = "error"
+    trace = start_trace("chat", request, http_request)
+    if trace:
+        response.headers[TRACE_ID_HEADER] = trace.trace_id
     try:
-        # Check if automation is ready
-        if not chatgpt_automation.is_initialized or not chatgpt_automation.is_logged_in:
-            logger.error("Chat request received but automation not ready")
-            return ChatResponse(
-                response="", 
-                success=False, 
-                error_message="ChatGPT automation not ready. Please ensure server started successfully and login completed."
-            )
-        
-        logger.info(f"Received chat request: {request.prompt[:50]}...")
-        
-        # Get response from ChatGPT
-        response = await chatgpt_automation.get_chat_response(
-            prompt=request.prompt,
-            max_retries=request.max_retries
-        )
-        
-        if response:
-            logger.info("Successfully got response from ChatGPT")
-            return ChatResponse(response=response, success=True)
-        else:
-            logger.error("Failed to get response from ChatGPT")
-            return ChatResponse(
-                response="", 
-                success=False, 
-                error_message="Failed to get response from ChatGPT"
-            )
-            
+        result = await process_chat_request(request)
+        outcome = request_outcome(result)
+        blocked = chatgpt_automation.blocked_since(received_at)
+        if blocked and not result.success:
+            # Lets the multi-process router put this backend on cooldown right away
+            response.headers["X-Backend-Blocked"] = blocked
+        return result
+    except SessionNotFoundError as e:
+        outcome = "not_found"
+        raise HTTPException(status_code=404, detail=str(e))
+    except QueueFullError as e:
+        outcome = "rejected"
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except QueueTimeoutError as e:
+        outcome = "queue_timeout"
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        REQUEST_SECONDS.labels("chat", outcome).observe(time.perf_counter() - started)
+        if trace:
+            trace.root.set("outcome", outcome)
+        tracer.finish(trace)
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Send a prompt to ChatGPT and stream the response as server-sent events.
+
+    Emits ``delta`` events with the new text (``reset`` is true when the text
+    was rewritten and replaces everything sent so far) and a final ``done`` event
+    carrying the complete response and timing metadata.
+    """
+    request.client_id = resolve_client(http_request, request)
+    cached_response = await lookup_cached_response(request)
+    if cached_response:
+        events = []
+        if cached_response.success:
+            events.append(sse_event("delta", {"text": cached_response.response, "reset": False}))
+        events.append(sse_event("done", dict(cached_response.model_dump(), complete=cached_response.success)))
+        return StreamingResponse(iter(events), media_type="text/event-stream")
+
+    if not chatgpt_automation.is_initialized or not chatgpt_automation.is_logged_in:
+        logger.error("Stream request received but automation not ready")
+        error = ChatResponse(
+            response="",
+            success=False,
+            error_message="ChatGPT automation not ready. Please ensure server started successfully and login completed."
+        )
+        return StreamingResponse(iter([sse_event("done", error.model_dump())]), media_type="text/event-stream")
+
+    logger.info(f"Received stream request: {request.prompt[:50]}...")
+
+    try:
+        session = session_manager.get(request.session_id) if request.session_id else None
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    queue_timeout = request.queue_timeout if request.queue_timeout is not None else Config.QUEUE_TIMEOUT
+    queued_at = time.time()
+    trace = start_trace("chat_stream", request, http_request)
+    try:
+        with time_phase("queue_wait"):
+            await request_queue.acquire(timeout=queue_timeout, client=request.client_id, priority=request.priority)
+    except QueueFullError as e:
+        tracer.finish(trace)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except QueueTimeoutError as e:
+        tracer.finish(trace)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    queue_seconds = time.time() - queued_at
+    state = {"started": None, "outcome": "error"}
+
+    async def events():
+        state["started"] = time.time()
+        async for event in chatgpt_automation.stream_chat_response(
+            request.prompt, request.max_retries, session, request.format
+        ):
+            event_type = event.pop("type")
+            if event_type == "done":
+                event["timing"]["queue_seconds"] = round(queue_seconds, 3)
+                if event["success"] and event["complete"]:
+                    await store_cached_response(request, event["response"])
+                state["outcome"] = ("success" if event["complete"] else "partial") if event["success"] else "failure"
+            yield sse_event(event_type, event)
+
+    async def finish():
+        # Runs even if the client went away before the body was iterated, so the slot is never leaked
+        if state["started"] is not None:
+            request_queue.record_service_time(time.time() - state["started"])
+        request_queue.release(request.client_id)
+        REQUEST_SECONDS.labels("chat_stream", state["outcome"]).observe(time.time() - queued_at)
+        if trace:
+            trace.root.set("outcome", state["outcome"])
+        tracer.finish(trace)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if trace:
+        headers[TRACE_ID_HEADER] = trace.trace_id
+    try:
+        return GuardedStreamingResponse(events(), finish, media_type="text/event-stream", headers=headers)
+    except Exception:
+        await finish()
+        raise
+
+def parse_batch_jsonl(content: bytes) -> List[ChatRequest]:
+    """Parse an uploaded JSONL file: one prompt string or ChatRequest object per line"""
+    items = []
+    for line_number, line in enumerate(content.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            items.append(ChatRequest(prompt=item) if isinstance(item, str) else ChatRequest(**item))
+        except (ValueError, TypeError, ValidationError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSONL on line {line_number}: {e}")
+    return items
+
+async def run_batch_item(index: int, item: ChatRequest, semaphore: asyncio.Semaphore) -> dict:
+    """Run one batch item, waiting out queue backpressure instead of failing"""
+    async with semaphore:
+        queue_timeout = item.queue_timeout if item.queue_timeout is not None else Config.QUEUE_TIMEOUT
+        deadline = time.time() + queue_timeout
+        while True:
+            try:
+                result = await process_chat_request(item)
+                break
+            except QueueFullError as e:
+                if time.time() + e.retry_after > deadline:
+                    result = ChatResponse(response="", success=False, error_message=str(e))
+                    break
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                logger.error(f"Error processing batch item {index}: {str(e)}")
+                result = ChatResponse(response="", success=False, error_message=str(e))
+                break
+    return dict(result.model_dump(), index=index)
+
+@app.post("/chat/batch")
+async def chat_batch(request: Request):
+    """
+    Send many prompts and stream results as NDJSON in completion order.
+
+    Accepts either a JSON body matching ``BatchRequest`` or a multipart upload with
+    a JSONL ``file`` (and optional ``concurrency`` field). Every output line has the
+    ``ChatResponse`` fields plus the ``index`` of the input it answers.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Multipart batch requests need a JSONL 'file' field")
+        items = parse_batch_jsonl(await upload.read())
+        try:
+            concurrency = int(form["concurrency"]) if form.get("concurrency") else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="'concurrency' must be an integer")
+    else:
+        try:
+            batch = BatchRequest(**await request.json())
+        except (ValueError, TypeError, ValidationError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid batch request: {e}")
+        items = [ChatRequest(prompt=item) if isinstance(item, str) else item for item in batch.prompts]
+        concurrency = batch.concurrency
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch contains no prompts")
+    for item in items:
+        # Batch prompts are bulk work unless an item asks otherwise
+        if "priority" not in item.model_fields_set:
+            item.priority = "batch"
+        item.client_id = resolve_client(request, item)
+
+    concurrency = max(1, min(concurrency or request_queue.concurrency, Config.BATCH_MAX_CONCURRENCY))
+    logger.info(f"Received batch of {len(items)} prompts (concurrency {concurrency})")
+
+    async def results():
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [asyncio.ensure_future(run_batch_item(index, item, semaphore)) for index, item in enumerate(items)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+async def run_job(request: dict) -> ChatResponse:
+    """Job runner handler: jobs go through the same path as /chat"""
+    if not chatgpt_automation.is_initialized or not chatgpt_automation.is_logged_in:
+        # E.g. the supervisor is restarting the browser: the job waits instead of failing
+        raise JobDeferredError("ChatGPT automation not ready")
+    return await process_chat_request(ChatRequest(**request))
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: JobRequest, http_request: Request):
+    """
+    Queue a prompt and return a job id right away; poll GET /jobs/{id} or pass webhook_url
+    """
+    if not Config.JOBS_ENABLED:
+        raise HTTPException(status_code=404, detail="The job API is disabled")
+    if request.session_id:
+        try:
+            session_manager.get(request.session_id)
+        except SessionNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    if "priority" not in request.model_fields_set:
+        request.priority = "batch"
+    request.client_id = resolve_client(http_request, request)
+    payload = request.model_dump(exclude={"webhook_url"})
+    job = await job_runner.submit(payload, request.webhook_url)
+    logger.info(f"Queued job {job['job_id']}: {request.prompt[:50]}...")
+    return describe_job(job)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    if not Config.JOBS_ENABLED:
+        raise HTTPException(status_code=404, detail="The job API is disabled")
+    try:
+        return describe_job(await job_runner.get(job_id))
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/sessions")
+async def create_session():
+    """
+    Start a multi-turn conversation pinned to one browser page.
+    Pass the returned ``session_id`` on /chat requests to continue it.
+    """
+    session = session_manager.create(chatgpt_automation.pool.workers)
+    return session.describe()
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    try:
+        return session_manager.get(session_id).describe()
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    try:
+        session_manager.delete(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"session_id": session_id, "deleted": True}
+
+# Gauges are read from the live objects at scrape time
+QUEUE_DEPTH.set_function(lambda: request_queue.depth)
+QUEUE_RUNNING.set_function(lambda: request_queue.running)
+PAGES_BUSY.set_function(lambda: chatgpt_automation.pool.busy_count)
+PAGES_TOTAL.set_function(lambda: chatgpt_automation.pool.size)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: per-phase latency histograms, retry counters and queue/pool gauges
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Span tree of a traced request (Chrome trace or OTLP JSON, per TRACE_FORMAT)"""
+    trace = tracer.load(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found")
+    return trace
+
+@app.post("/debug/profile")
+async def capture_profile(seconds: float = 10, tool: str = "cprofile"):
+    """Profile this process for ``seconds`` (cProfile, or py-spy if installed) and write it to TRACE_DIR"""
+    if not Config.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING_ENABLED)")
+    try:
+        return await profiler.capture(min(max(seconds, 1), 300), tool)
+    except ProfilerError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/debug/playwright-trace")
+async def save_playwright_trace():
+    """Save the Playwright trace recorded since the last save"""
+    if not chatgpt_automation.playwright_tracing:
+        raise HTTPException(status_code=404, detail="Playwright tracing is off (set PLAYWRIGHT_TRACING)")
+    try:
+        return {"path": await chatgpt_automation.save_playwright_trace()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
 async def health_check():
     """
-    Health check endpoint
+    Health check endpoint (reports the supervisor's last check, or probes the browser
+    connection when no supervisor is running; never sends a prompt)
     """
     try:
         # Check if automation is initialized and logged in
@@ -80,15 +495,32 @@ async def health_check():
             return {
                 "status": "unhealthy",
                 "chatgpt_accessible": False,
-                "error": "ChatGPT automation not ready - please ensure server started successfully"
+                "error": "ChatGPT automation not ready - please ensure server started successfully",
+                "supervisor": browser_supervisor.stats(),
+                "last_block": chatgpt_automation.last_block
             }
         
-        # Test if ChatGPT automation is working
-        test_response = await chatgpt_automation.get_chat_response("Hello", max_retries=1)
+        supervisor_state = browser_supervisor.stats()
+        if browser_supervisor.running:
+            status, accessible = supervisor_state["status"], supervisor_state["browser_connected"]
+        else:
+            # No supervisor (disabled, or not started via start_server.py): probe the browser directly
+            accessible = await chatgpt_automation.is_browser_connected()
+            status = "healthy" if accessible else "unhealthy"
         return {
-            "status": "healthy",
-            "chatgpt_accessible": test_response is not None,
-            "automation_ready": True
+            "status": status,
+            "chatgpt_accessible": accessible,
+            "automation_ready": True,
+            "supervisor": supervisor_state,
+            "page_pool": chatgpt_automation.pool.stats(),
+            "startup_timings": chatgpt_automation.startup_timings,
+            "resource_filter": chatgpt_automation.resource_filter.stats(),
+            "request_queue": request_queue.stats(),
+            "cache": response_cache.stats(),
+            "single_flight": chat_flights.stats(),
+            "sessions": session_manager.stats(),
+            "jobs": await job_runner.stats() if Config.JOBS_ENABLED else None,
+            "last_block": chatgpt_automation.last_block
         }
     except Exception as e:
         return {
@@ -98,4 +530,5 @@ async def health_check():
         }
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    configure_logging()
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
@@ -0,0 +1,258 @@
+import bisect
+import time
+from contextlib import contextmanager
+
+from tracing import span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def format_labels(names, values, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base class for a metric family with optional labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            # Unlabelled metrics are exported (as zero) before their first update
+            self.labels()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{format_labels(self.labelnames, values)} {format_value(child.value)}"]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from ``function()`` at scrape time"""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function else self.value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    def _render_child(self, values, child):
+        try:
+            value = child.get()
+        except Exception:
+            return []
+        return [f"{self.name}{format_labels(self.labelnames, values)} {format_value(value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, child.counts):
+            cumulative += count
+            labels = format_labels(self.labelnames, values, {"le": format_value(bound)})
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = format_labels(self.labelnames, values, {"le": "+Inf"})
+        lines.append(f"{self.name}_bucket{labels} {child.count}")
+        plain = format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{plain} {format_value(child.sum)}")
+        lines.append(f"{self.name}_count{plain} {child.count}")
+        return lines
+
+
+class Registry:
+    """Collects metric families and renders the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics the automation hot path records
+registry = Registry()
+
+PHASE_SECONDS = registry.histogram(
+    "chatapi_phase_seconds",
+    "Time spent in each phase of a chat request",
+    ["phase"]
+)
+REQUEST_SECONDS = registry.histogram(
+    "chatapi_request_seconds",
+    "End-to-end latency of API requests",
+    ["endpoint", "outcome"]
+)
+RETRIES = registry.counter("chatapi_retries_total", "Retries inside a chat request", ["reason"])
+SEND_BUTTON_FALLBACKS = registry.counter(
+    "chatapi_send_button_fallbacks_total",
+    "Times Enter did not send the prompt and the send button was clicked"
+)
+LOGIN_WALLS = registry.counter("chatapi_login_walls_total", "Times ChatGPT showed a login wall")
+RATE_LIMITS = registry.counter("chatapi_rate_limits_total", "Times ChatGPT reported the account as rate limited")
+TIMEOUTS = registry.counter("chatapi_timeouts_total", "Responses that did not complete in time")
+QUEUE_DEPTH = registry.gauge("chatapi_queue_depth", "Requests waiting for an admission slot")
+QUEUE_RUNNING = registry.gauge("chatapi_queue_running", "Requests holding an admission slot")
+PAGES_BUSY = registry.gauge("chatapi_pages_busy", "Browser pages currently serving a prompt")
+PAGES_TOTAL = registry.gauge("chatapi_pages_total", "Browser pages in the pool")
+
+
+def merge_expositions(texts: dict, label: str) -> str:
+    """Merge Prometheus text from several processes, tagging each sample with ``label``.
+
+    ``texts`` maps the label value (e.g. a worker index) to that process's
+    exposition; each metric family keeps a single HELP/TYPE header.
+    """
+    families = {}
+    for value, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = families.setdefault(parts[2], {"header": [], "samples": []})
+                    if line not in family["header"]:
+                        family["header"].append(line)
+                continue
+            if family is None:
+                family = families.setdefault("", {"header": [], "samples": []})
+            tag = format_labels((label,), (value,))[1:-1]
+            if "{" in line:
+                name, rest = line.split("{", 1)
+                family["samples"].append(f"{name}{{{tag},{rest}")
+            else:
+                name, rest = line.split(" ", 1)
+                family["samples"].append(f"{name}{{{tag}}} {rest}")
+    lines = []
+    for family in families.values():
+        lines.extend(family["header"])
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def time_phase(phase: str):
+    """Context manager that records the duration of a request phase (and a span when tracing)"""
+    with span(phase), PHASE_SECONDS.labels(phase).time():
+        yield
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the ChatGPT web app, for offline benchmarks and development.
+
+Serves a page with the same composer and assistant message markup the automation
+looks for and streams a deterministic reply at a configurable token rate.
+"""
+import argparse
+import json
+import logging
+import re
+
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+REPLY_PREFIX = "Mock reply to:"
+
+FILLER_WORDS = (
+    "the quick brown fox jumps over the lazy dog while a small model streams "
+    "one token at a time so the automation has something realistic to watch"
+).split()
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>ChatGPT</title></head>
+<body>
+<main>
+<div id="mock-thread"></div>
+<form id="mock-composer" onsubmit="return false">
+<div contenteditable="true" translate="no" class="ProseMirror" id="prompt-textarea" data-virtualkeyboard="true"><p><br></p></div>
+<button type="button" id="mock-send" data-testid="send-button" aria-label="Send prompt">Send</button>
+</form>
+</main>
+</body>
+</html>
+"""
+
+# Drives the page: Enter or the send button posts the composer text, the reply is
+# streamed word by word into a new assistant message while the send button is
+# swapped for a stop button, and the conversation gets a /c/<id> URL whose
+# messages survive a reload of the same tab.
+MOCK_SCRIPT = """
+(() => {
+    const settings = window.__mockSettings;
+    document.querySelectorAll(
+        'button[data-testid="login-button"], button[data-testid="mobile-login-button"], button[data-testid="signup-button"]'
+    ).forEach(element => element.remove());
+
+    const composer = document.querySelector('#prompt-textarea');
+    let thread = document.getElementById('mock-thread');
+    if (!thread) {
+        thread = document.createElement('div');
+        thread.id = 'mock-thread';
+        const form = composer.closest('form') || composer.parentElement;
+        form.parentElement.insertBefore(thread, form);
+    }
+    let button = document.getElementById('mock-send');
+    if (!button) {
+        button = document.createElement('button');
+        button.type = 'button';
+        button.id = 'mock-send';
+        composer.parentElement.appendChild(button);
+    }
+
+    const match = location.pathname.match(/^\\/c\\/([\\w-]+)/);
+    let conversationId = match ? match[1] : null;
+    let streaming = false, timer = null, finishReply = null;
+
+    const setButton = (stop) => {
+        button.setAttribute('data-testid', stop ? 'stop-button' : 'send-button');
+        button.setAttribute('aria-label', stop ? 'Stop streaming' : 'Send prompt');
+        button.textContent = stop ? 'Stop' : 'Send';
+    };
+    const addMessage = (role, text) => {
+        const message = document.createElement('div');
+        message.setAttribute('data-message-author-role', role);
+        const body = document.createElement('div');
+        body.className = 'markdown prose';
+        body.textContent = text;
+        message.appendChild(body);
+        thread.appendChild(message);
+        return body;
+    };
+    const storageKey = () => 'mock-conversation-' + conversationId;
+    const save = () => {
+        const messages = Array.from(
+            thread.querySelectorAll('[data-message-author-role]'),
+            element => [element.getAttribute('data-message-author-role'), element.innerText]
+        );
+        sessionStorage.setItem(storageKey(), JSON.stringify(messages));
+    };
+    if (conversationId) {
+        JSON.parse(sessionStorage.getItem(storageKey()) || '[]').forEach(([role, text]) => addMessage(role, text));
+    }
+
+    const replyTokens = (prompt) => {
+        const tokens = (settings.prefix + ' ' + prompt.trim().split(/\\s+/).slice(0, 12).join(' ')).split(' ');
+        for (let i = 0; tokens.length < settings.replyTokens; i++) {
+            tokens.push(settings.filler[i % settings.filler.length]);
+        }
+        return tokens;
+    };
+    const tokenDelay = () => {
+        const base = 1000 / settings.tokenRate;
+        return Math.max(0, base * (1 + settings.jitter * (2 * Math.random() - 1)));
+    };
+
+    const send = () => {
+        if (streaming) return;
+        const prompt = composer.innerText.trim();
+        if (!prompt) return;
+        composer.innerHTML = '<p><br></p>';
+        addMessage('user', prompt);
+        if (!conversationId) {
+            conversationId = Math.random().toString(36).slice(2, 10) + Date.now().toString(36);
+            history.pushState(null, '', '/c/' + conversationId);
+        }
+        const body = addMessage('assistant', '');
+        const tokens = replyTokens(prompt);
+        let index = 0;
+        streaming = true;
+        setButton(true);
+        finishReply = () => {
+            clearTimeout(timer);
+            streaming = false;
+            finishReply = null;
+            setButton(false);
+            save();
+        };
+        const tick = () => {
+            body.textContent += (index ? ' ' : '') + tokens[index++];
+            if (index < tokens.length) {
+                timer = setTimeout(tick, tokenDelay());
+            } else {
+                finishReply();
+            }
+        };
+        timer = setTimeout(tick, settings.firstTokenMs);
+    };
+
+    composer.addEventListener('keydown', (event) => {
+        if (event.key === 'Enter' && !event.shiftKey) {
+            event.preventDefault();
+            send();
+        }
+    });
+    button.addEventListener('click', () => {
+        if (streaming && finishReply) {
+            finishReply();
+        } else {
+            send();
+        }
+    });
+})();
+"""
+
+
+def strip_saved_page(html: str) -> str:
+    """Drop scripts and external links from a saved ChatGPT page so it loads offline"""
+    html = re.sub(r"<script\b.*?</script>", "", html, flags=re.IGNORECASE | re.DOTALL)
+    return re.sub(r"<link\b[^>]*>", "", html, flags=re.IGNORECASE)
+
+
+class MockChatGPT:
+    """Settings and page rendering for the mock ChatGPT app"""
+
+    def __init__(self):
+        self.token_rate = 30.0  # tokens per second
+        self.jitter = 0.25  # +/- fraction applied to each token delay
+        self.first_token_ms = 300
+        self.reply_tokens = 60
+        self.seed_html = None  # Saved ChatGPT page (e.g. chgpt.html) to use as the page markup
+        self._page = None
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if not hasattr(self, name) or name.startswith("_"):
+                raise AttributeError(f"Unknown mock setting: {name}")
+            setattr(self, name, value)
+        self._page = None
+
+    def settings(self) -> dict:
+        return {
+            "token_rate": self.token_rate,
+            "jitter": self.jitter,
+            "first_token_ms": self.first_token_ms,
+            "reply_tokens": self.reply_tokens,
+            "seed_html": self.seed_html
+        }
+
+    def page(self) -> str:
+        """The HTML served for new chats and /c/<id> conversations"""
+        if self._page is None:
+            if self.seed_html:
+                with open(self.seed_html, encoding="utf-8") as f:
+                    html = strip_saved_page(f.read())
+            else:
+                html = PAGE_TEMPLATE
+            page_settings = {
+                "tokenRate": self.token_rate,
+                "jitter": self.jitter,
+                "firstTokenMs": self.first_token_ms,
+                "replyTokens": self.reply_tokens,
+                "prefix": REPLY_PREFIX,
+                "filler": FILLER_WORDS
+            }
+            scripts = (
+                f"<script>window.__mockSettings = {json.dumps(page_settings)};</script>"
+                f"<script>{MOCK_SCRIPT}</script>"
+            )
+            index = html.lower().rfind("</body>")
+            self._page = html[:index] + scripts + html[index:] if index >= 0 else html + scripts
+        return self._page
+
+
+def is_mock_reply(prompt: str, response: str) -> bool:
+    """True if ``response`` is the mock's reply to ``prompt``"""
+    words = prompt.split()
+    expected = REPLY_PREFIX + (" " + words[0] if words else "")
+    return bool(response) and response.strip().startswith(expected)
+
+
+# Global instance
+mock = MockChatGPT()
+
+app = FastAPI(title="Mock ChatGPT", version="1.0.0")
+
+
+@app.get("/", response_class=HTMLResponse)
+async def new_chat():
+    return mock.page()
+
+
+@app.get("/c/{conversation_id}", response_class=HTMLResponse)
+async def conversation(conversation_id: str):
+    return mock.page()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local mock of the ChatGPT web app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token-rate", type=float, default=mock.token_rate, help="Tokens streamed per second")
+    parser.add_argument("--jitter", type=float, default=mock.jitter, help="Random +/- fraction of each token delay")
+    parser.add_argument("--first-token-ms", type=int, default=mock.first_token_ms)
+    parser.add_argument("--reply-tokens", type=int, default=mock.reply_tokens)
+    parser.add_argument("--seed", dest="seed_html", help="Saved ChatGPT page to use as markup, e.g. chgpt.html")
+    args = parser.parse_args()
+
+    mock.configure(
+        token_rate=args.token_rate,
+        jitter=args.jitter,
+        first_token_ms=args.first_token_ms,
+        reply_tokens=args.reply_tokens,
+        seed_html=args.seed_html
+    )
+    print(f"Mock ChatGPT at http://{args.host}:{args.port}/ (set Config.CHATGPT_URL to this)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
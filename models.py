@@ -0,0 +1,33 @@
+from typing import List, Literal, Optional, Union
+
+from pydantic import BaseModel
+
+# Bodies of the HTTP API, shared by main.py and the chatgpt_client.py SDK
+
+
+class ChatRequest(BaseModel):
+    prompt: str
+    max_retries: int = 3
+    queue_timeout: Optional[float] = None  # seconds to wait for a free page, defaults to Config.QUEUE_TIMEOUT
+    cache: Literal["bypass", "prefer", "only"] = "prefer"  # bypass skips the lookup but still stores the fresh answer
+    session_id: Optional[str] = None  # continue a conversation created with POST /sessions
+    priority: Literal["interactive", "batch"] = "interactive"  # batch work only gets pages interactive requests leave idle
+    client_id: Optional[str] = None  # fair-queuing identity when there is no API key or X-Client-Id header
+    format: Literal["text", "markdown", "html"] = "text"  # markdown keeps code blocks, lists and tables
+
+
+class ChatResponse(BaseModel):
+    response: str
+    success: bool
+    error_message: Optional[str] = None
+    cached: bool = False
+    format: Optional[Literal["text", "markdown", "html"]] = None
+
+
+class JobRequest(ChatRequest):
+    webhook_url: Optional[str] = None  # POSTed the finished job (same body as GET /jobs/{id})
+
+
+class BatchRequest(BaseModel):
+    prompts: List[Union[str, ChatRequest]]
+    concurrency: Optional[int] = None  # parallel prompts, capped at Config.BATCH_MAX_CONCURRENCY
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from response_watcher import ResponseWatcher
+from selector_registry import SelectorRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PageWorker:
+    """A single browser page with its own composer and response tracker"""
+
+    def __init__(self, index: int, page):
+        self.index = index
+        self.busy = False
+        self.requests_served = 0
+        self.leased_at = None
+        self.attach(page)
+
+    def attach(self, page):
+        """Bind the worker to a (new) page, resetting everything tied to the old one"""
+        self.page = page
+        self.watcher = ResponseWatcher(page)
+        self.selectors = SelectorRegistry(page)
+        self.cdp_session = None
+        self.session_id = None  # session whose conversation the page is showing
+        self.turns = 0  # prompts sent in the page's current conversation
+        self.dom_nodes = 0  # element count seen when the last prompt was entered
+
+    def describe(self) -> dict:
+        """Return a JSON-friendly snapshot of this worker"""
+        return {
+            "index": self.index,
+            "busy": self.busy,
+            "requests_served": self.requests_served,
+            "busy_seconds": round(time.time() - self.leased_at, 2) if self.leased_at else 0.0,
+            "session_id": self.session_id,
+            "turns": self.turns,
+            "dom_nodes": self.dom_nodes,
+            "selectors": self.selectors.stats()
+        }
+
+
+class PagePool:
+    """Hands out idle page workers to requests and takes them back when done"""
+
+    def __init__(self):
+        self.workers = []
+        self._waiters = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def add(self, page) -> PageWorker:
+        """Register a freshly opened page as an idle worker"""
+        worker = PageWorker(len(self.workers), page)
+        self.workers.append(worker)
+        self._dispatch()
+        return worker
+
+    def clear(self):
+        """Forget all workers (used when the browser is closed)"""
+        self.workers = []
+
+    @property
+    def size(self) -> int:
+        return len(self.workers)
+
+    @property
+    def busy_count(self) -> int:
+        return sum(1 for worker in self.workers if worker.busy)
+
+    def _pick(self, preferred: PageWorker = None):
+        """Choose an idle worker, honouring a preferred one while it is still in the pool.
+
+        Without a preference, pages not showing a session's conversation go first.
+        """
+        if preferred is not None and preferred in self.workers:
+            return None if preferred.busy else preferred
+        idle = [worker for worker in self.workers if not worker.busy]
+        unbound = [worker for worker in idle if worker.session_id is None]
+        return (unbound or idle or [None])[0]
+
+    def _take(self, worker: PageWorker) -> PageWorker:
+        worker.busy = True
+        worker.leased_at = time.time()
+        logger.debug(f"Leased page worker {worker.index} ({self.busy_count}/{self.size} busy)")
+        return worker
+
+    def _dispatch(self):
+        """Hand idle workers to waiters in arrival order"""
+        for waiter, preferred in list(self._waiters):
+            if waiter.done():
+                self._waiters.remove((waiter, preferred))
+                continue
+            worker = self._pick(preferred)
+            if worker is None:
+                continue
+            self._waiters.remove((waiter, preferred))
+            waiter.set_result(self._take(worker))
+
+    async def acquire(self, timeout: float = None, preferred: PageWorker = None) -> PageWorker:
+        """Wait for an idle worker (or a specific one) and mark it busy"""
+        worker = self._pick(preferred)
+        if worker is not None:
+            return self._take(worker)
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, preferred)
+        self._waiters.append(entry)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result(), served=False)
+            else:
+                waiter.cancel()
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+            raise
+
+    def release(self, worker: PageWorker, served: bool = True):
+        """Return a worker to the pool"""
+        worker.busy = False
+        worker.leased_at = None
+        if served:
+            worker.requests_served += 1
+        logger.debug(f"Released page worker {worker.index} ({self.busy_count}/{self.size} busy)")
+        self._dispatch()
+
+    @asynccontextmanager
+    async def lease(self, timeout: float = None, preferred: PageWorker = None):
+        """Lease a worker for the duration of an ``async with`` block"""
+        worker = await self.acquire(timeout, preferred)
+        try:
+            yield worker
+        finally:
+            self.release(worker)
+
+    def stats(self) -> dict:
+        """Return pool occupancy for the health endpoint"""
+        busy = self.busy_count
+        return {
+            "size": self.size,
+            "busy": busy,
+            "idle": self.size - busy,
+            "waiting": self.waiting,
+            "workers": [worker.describe() for worker in self.workers]
+        }
@@ -0,0 +1,124 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import shutil
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOOLS = ("cprofile", "py-spy")
+
+
+class ProfilerError(RuntimeError):
+    """Raised when a capture cannot run (one is already running, or the tool is missing)"""
+
+
+class Profiler:
+    """On-demand and periodic profiles of this server process, written to TRACE_DIR"""
+
+    def __init__(self):
+        self.capturing = False
+        self.captures = 0
+        self.last_capture = None
+        self._task = None
+
+    def start(self):
+        """Capture PROFILE_DURATION seconds every PROFILE_INTERVAL seconds in the background"""
+        if Config.PROFILE_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+            logger.info(f"Sampling a {Config.PROFILE_DURATION}s profile every {Config.PROFILE_INTERVAL}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(Config.PROFILE_INTERVAL)
+            try:
+                await self.capture(Config.PROFILE_DURATION)
+            except ProfilerError as e:
+                logger.info(f"Skipping sampled profile: {e}")
+            except Exception as e:
+                logger.error(f"Sampled profile failed: {e}")
+
+    def output_path(self, extension: str) -> str:
+        os.makedirs(Config.TRACE_DIR, exist_ok=True)
+        prefix = f"{Config.SESSION_ID_PREFIX.rstrip('-')}-" if Config.SESSION_ID_PREFIX else ""
+        return os.path.join(Config.TRACE_DIR, f"profile-{prefix}{time.strftime('%Y%m%d-%H%M%S')}.{extension}")
+
+    async def capture(self, seconds: float, tool: str = "cprofile") -> dict:
+        """Profile the process for ``seconds`` and return where the result was written"""
+        if tool not in PROFILE_TOOLS:
+            raise ProfilerError(f"Unknown profiler '{tool}' (expected one of {', '.join(PROFILE_TOOLS)})")
+        if self.capturing:
+            raise ProfilerError("A profile capture is already running")
+        self.capturing = True
+        try:
+            if tool == "py-spy":
+                result = await self.capture_py_spy(seconds)
+            else:
+                result = await self.capture_cprofile(seconds)
+        finally:
+            self.capturing = False
+        self.captures += 1
+        self.last_capture = dict(result, tool=tool, seconds=seconds, at=time.time())
+        logger.info(f"Wrote {tool} profile to {result['path']}")
+        return self.last_capture
+
+    async def capture_cprofile(self, seconds: float) -> dict:
+        """Deterministic profile of the event loop thread (every request it serves meanwhile)"""
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+        path = self.output_path("prof")
+        top = await asyncio.get_running_loop().run_in_executor(None, self.write_cprofile, profile, path)
+        return {"path": path, "top": top}
+
+    def write_cprofile(self, profile, path: str) -> list:
+        """Save pstats data (open with snakeviz or ``python -m pstats``) and return the top entries"""
+        profile.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(15)
+        return [line.rstrip() for line in stream.getvalue().splitlines() if line.strip()][-16:]
+
+    async def capture_py_spy(self, seconds: float) -> dict:
+        """Sampling profile via the py-spy binary, including native frames (needs ptrace permission)"""
+        binary = shutil.which("py-spy")
+        if binary is None:
+            raise ProfilerError("py-spy is not installed (pip install py-spy)")
+        path = self.output_path("speedscope.json")
+        process = await asyncio.create_subprocess_exec(
+            binary, "record", "--pid", str(os.getpid()), "--duration", str(int(max(1, seconds))),
+            "--format", "speedscope", "--output", path, "--nonblocking",
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        if process.returncode != 0:
+            raise ProfilerError(f"py-spy failed: {output.decode('utf-8', 'replace').strip()[-300:]}")
+        return {"path": path}
+
+    def stats(self) -> dict:
+        return {
+            "capturing": self.capturing,
+            "captures": self.captures,
+            "sampling_interval": Config.PROFILE_INTERVAL or None,
+            "last_capture": self.last_capture and {key: self.last_capture[key] for key in ("path", "tool", "at")}
+        }
+
+
+# Global instance
+profiler = Profiler()
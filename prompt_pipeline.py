@@ -0,0 +1,89 @@
+import hashlib
+import math
+
+from config import Config
+from response_cache import normalize_prompt
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without a tokenizer: ~4 ASCII characters per token, one per other character"""
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return math.ceil((len(text) - non_ascii) / 4) + non_ascii
+
+
+def prompt_digest(text: str) -> str:
+    """Hash of the normalized text, so composer rewrites of whitespace do not count as a mismatch"""
+    return hashlib.sha256(normalize_prompt(text).encode("utf-8")).hexdigest()
+
+
+def split_text(text: str, max_chars: int) -> list:
+    """Split at paragraph, line or word boundaries into pieces of at most ``max_chars``.
+
+    Lossless: separators stay at the end of the piece before the cut, so
+    ``"".join(pieces) == text`` and indentation after a cut is kept.
+    """
+    chunks = []
+    while len(text) > max_chars:
+        cut = max_chars
+        for separator, minimum in (("\n\n", max_chars // 2), ("\n", max_chars // 2), (" ", 1)):
+            position = text.rfind(separator, 0, max_chars - len(separator) + 1)
+            if position >= minimum:
+                cut = position + len(separator)
+                break
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class PromptPlan:
+    """How a prompt is delivered: typed as is, attached as a file, or sent as numbered parts"""
+
+    def __init__(self, prompt: str, strategy: str, tokens: int, parts: list = None):
+        self.prompt = prompt
+        self.strategy = strategy
+        self.tokens = tokens
+        self.parts = parts or [prompt]
+        self.attachment_name = f"prompt-{prompt_digest(prompt)[:8]}.txt"
+
+    @property
+    def instruction(self) -> str:
+        """What is typed next to the attached file"""
+        return (
+            f"The attached file {self.attachment_name} contains my full message (about {self.tokens} tokens). "
+            "Read all of it and respond to it exactly as if I had typed it here."
+        )
+
+
+def chunk_messages(prompt: str, tokens: int) -> list:
+    """The numbered parts of the chunking protocol; only the last one asks for an answer"""
+    max_chars = max(1000, int(len(prompt) * Config.PROMPT_CHUNK_TOKENS / max(1, tokens)))
+    chunks = split_text(prompt, max_chars)
+    total = len(chunks)
+    if total == 1:
+        return chunks
+    messages = [
+        f"[Part 1/{total}] I will send one long message in {total} parts. Do not respond to it yet: "
+        f"reply only with \"OK\" until part {total}/{total} arrives.\n\n{chunks[0]}"
+    ]
+    messages.extend(
+        f"[Part {index}/{total}] Reply only with \"OK\".\n\n{chunk}"
+        for index, chunk in enumerate(chunks[1:-1], start=2)
+    )
+    messages.append(
+        f"[Part {total}/{total}]\n\n{chunks[-1]}\n\n"
+        f"[End of message. Treat parts 1-{total} together as one message and respond to it now.]"
+    )
+    return messages
+
+
+def plan_prompt(prompt: str, strategy: str = None) -> PromptPlan:
+    """Pick the delivery for ``prompt`` from its estimated size and LONG_PROMPT_STRATEGY"""
+    tokens = estimate_tokens(prompt)
+    if tokens <= Config.PROMPT_DIRECT_MAX_TOKENS:
+        return PromptPlan(prompt, "direct", tokens)
+    strategy = strategy or Config.LONG_PROMPT_STRATEGY
+    if strategy == "upload":
+        return PromptPlan(prompt, "upload", tokens)
+    return PromptPlan(prompt, "chunks", tokens, chunk_messages(prompt, tokens))
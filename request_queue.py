@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+from config import Config
+from metrics import time_phase
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the admission queue cannot take another request"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Request queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a queued request is not admitted before its deadline"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Request was not admitted before its deadline, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+DEFAULT_CLIENT = "anonymous"
+
+
+class Waiter:
+    """A queued request: its flow (client and priority class) and fair-queuing tag"""
+
+    def __init__(self, future, client: str, priority: str, tag: float, sequence: int):
+        self.future = future
+        self.client = client
+        self.priority = priority
+        self.tag = tag
+        self.sequence = sequence
+
+
+class RequestQueue:
+    """Bounded admission queue in front of the automation layer.
+
+    Waiting requests are admitted by weighted fair queuing: every (client,
+    priority) pair is a flow, each admission advances the flow's virtual finish
+    time by 1 / weight of its priority class, and the waiter with the smallest
+    finish time goes next. Clients at their concurrency cap are skipped, so one
+    bulk client cannot hold every page while others wait.
+    """
+
+    def __init__(self, concurrency: int = None, max_depth: int = None):
+        self.concurrency = concurrency or Config.PAGE_POOL_SIZE
+        self.max_depth = Config.QUEUE_MAX_DEPTH if max_depth is None else max_depth
+        self.running = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._flow_finish = {}
+        self._client_running = Counter()
+        self._priority_admitted = Counter()
+        self._service_time = None
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def average_service_time(self) -> float:
+        """Exponentially weighted average of recent service times in seconds"""
+        if self._service_time is None:
+            return float(Config.RESPONSE_TIMEOUT)
+        return self._service_time
+
+    def record_service_time(self, seconds: float):
+        alpha = Config.SERVICE_TIME_SMOOTHING
+        if self._service_time is None:
+            self._service_time = seconds
+        else:
+            self._service_time = alpha * seconds + (1 - alpha) * self._service_time
+
+    def retry_after(self) -> int:
+        """Estimate how long a client should wait before trying again"""
+        rounds = (self.depth + 1) / max(1, self.concurrency)
+        return max(1, math.ceil(rounds * self.average_service_time))
+
+    def client_cap(self, client: str) -> int:
+        cap = Config.CLIENT_CONCURRENCY_LIMITS.get(client, Config.CLIENT_MAX_CONCURRENCY)
+        return cap if cap else self.concurrency
+
+    def _has_capacity(self, client: str, priority: str) -> bool:
+        if self.running >= self.concurrency or self._client_running[client] >= self.client_cap(client):
+            return False
+        # Optionally keep a few pages free for interactive requests
+        return priority == "interactive" or self.concurrency - self.running > Config.RESERVED_INTERACTIVE_SLOTS
+
+    def _finish_tag(self, client: str, priority: str) -> float:
+        """Virtual finish time of the flow's next request"""
+        weight = Config.PRIORITY_WEIGHTS.get(priority, 1)
+        start = max(self._virtual_time, self._flow_finish.get((client, priority), 0.0))
+        return start + 1.0 / weight
+
+    def _admit(self, client: str, priority: str, tag: float):
+        self.running += 1
+        self._client_running[client] += 1
+        self._priority_admitted[priority] += 1
+        self._flow_finish[(client, priority)] = tag
+        self._virtual_time = max(self._virtual_time, tag - 1.0 / Config.PRIORITY_WEIGHTS.get(priority, 1))
+
+    def _grant_next(self):
+        while self._waiters and self.running < self.concurrency:
+            eligible = [waiter for waiter in self._waiters if self._has_capacity(waiter.client, waiter.priority)]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda candidate: (candidate.tag, candidate.sequence))
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self._admit(waiter.client, waiter.priority, waiter.tag)
+            waiter.future.set_result(True)
+        if not self._waiters:
+            # Idle flows must not bank credit: restart virtual time when the queue drains
+            self._flow_finish.clear()
+
+    async def acquire(self, timeout: float = None, client: str = DEFAULT_CLIENT, priority: str = "interactive"):
+        """Wait for a free slot, failing fast when the queue is full"""
+        tag = self._finish_tag(client, priority)
+        if not self._waiters and self._has_capacity(client, priority):
+            self._admit(client, priority, tag)
+            self.admitted += 1
+            return
+
+        if self.depth >= self.max_depth:
+            self.rejected += 1
+            retry_after = self.retry_after()
+            logger.warning(f"Request queue full ({self.depth}/{self.max_depth}), rejecting with Retry-After {retry_after}s")
+            raise QueueFullError(retry_after)
+
+        waiter = Waiter(asyncio.get_running_loop().create_future(), client, priority, tag, next(self._sequence))
+        # Reserve the tag so the flow's next request queues behind this one
+        self._flow_finish[(client, priority)] = tag
+        self._waiters.append(waiter)
+        self._grant_next()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.expired += 1
+            raise QueueTimeoutError(self.retry_after())
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self.admitted += 1
+
+    def _abandon(self, waiter: Waiter):
+        """Drop a waiter that gave up, handing its slot on if it was already granted"""
+        if waiter.future.done() and not waiter.future.cancelled():
+            self.release(waiter.client)
+            return
+        waiter.future.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, client: str = DEFAULT_CLIENT):
+        self.running = max(0, self.running - 1)
+        self._client_running[client] = max(0, self._client_running[client] - 1)
+        if not self._client_running[client]:
+            del self._client_running[client]
+        self._grant_next()
+
+    @asynccontextmanager
+    async def slot(self, timeout: float = None, client: str = DEFAULT_CLIENT, priority: str = "interactive"):
+        """Hold an admission slot for the duration of an ``async with`` block"""
+        with time_phase("queue_wait"):
+            await self.acquire(timeout, client, priority)
+        started = time.time()
+        try:
+            yield
+        finally:
+            self.record_service_time(time.time() - started)
+            self.release(client)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "admitted_by_priority": dict(self._priority_admitted),
+            "running_by_client": dict(self._client_running),
+            "queued_by_priority": dict(Counter(waiter.priority for waiter in self._waiters)),
+            "average_service_seconds": round(self.average_service_time, 2),
+            "retry_after_estimate": self.retry_after()
+        }
+
+
+# Global instance
+request_queue = RequestQueue()
@@ -0,0 +1,75 @@
+import logging
+from collections import Counter
+from urllib.parse import urlparse
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def domain_matches(host: str, domains) -> bool:
+    """True if ``host`` is one of ``domains`` or a subdomain of one"""
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class ResourceFilter:
+    """Aborts page requests ChatGPT does not need and counts what it saved"""
+
+    def __init__(self):
+        self.blocked_types = set(Config.BLOCKED_RESOURCE_TYPES)
+        self.blocked_domains = list(Config.BLOCKED_DOMAINS)
+        self.allowed_domains = list(Config.ALLOWED_DOMAINS) if Config.ALLOWED_DOMAINS else None
+        self.blocked = Counter()
+        self.blocked_requests = 0
+        self.allowed_requests = 0
+        self.loaded_bytes = 0
+
+    def block_reason(self, resource_type: str, url: str):
+        """Return why a request should be blocked, or None to let it through"""
+        host = (urlparse(url).hostname or "").lower()
+        if not host:
+            return None
+        if self.allowed_domains is not None and not domain_matches(host, self.allowed_domains):
+            return "domain"
+        if domain_matches(host, self.blocked_domains):
+            return "domain"
+        if resource_type in self.blocked_types:
+            return resource_type
+        return None
+
+    async def handle_route(self, route):
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+        if reason is None:
+            self.allowed_requests += 1
+            await route.continue_()
+            return
+        self.blocked_requests += 1
+        self.blocked[reason] += 1
+        logger.debug(f"Blocked {request.resource_type} request to {request.url} ({reason})")
+        await route.abort()
+
+    def record_response(self, response):
+        """Tally bytes of the responses that were allowed through"""
+        try:
+            self.loaded_bytes += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
+
+    async def install(self, target):
+        """Route every request of a browser context, or of a single page, through the filter"""
+        await target.route("**/*", self.handle_route)
+        target.on("response", self.record_response)
+        logger.info(
+            f"Resource filter active: blocking types {sorted(self.blocked_types)} "
+            f"and {len(self.blocked_domains)} domain(s)"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": Config.BLOCK_RESOURCES,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_reason": dict(self.blocked),
+            "allowed_requests": self.allowed_requests,
+            "loaded_bytes": self.loaded_bytes
+        }
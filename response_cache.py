@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt so trivially different spellings share a cache entry"""
+    prompt = unicodedata.normalize("NFC", prompt)
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def cache_key(prompt: str, **options) -> str:
+    """Hash the normalized prompt together with any options that change the answer"""
+    payload = json.dumps({"prompt": normalize_prompt(prompt), "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskStore:
+    """SQLite backing store so cached responses survive restarts"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] <= time.time():
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return row
+
+    def put(self, key: str, response: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at)
+            )
+            self._conn.commit()
+
+    def prune(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Bounded in-memory LRU with TTL, optionally backed by SQLite"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, disk_path: str = None):
+        self.enabled = Config.CACHE_ENABLED
+        self.max_entries = max_entries or Config.CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or Config.CACHE_TTL
+        self._entries = OrderedDict()
+        self._disk_path = disk_path if disk_path is not None else Config.CACHE_DB_PATH
+        self._disk = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def disk(self):
+        if self._disk is None and self.enabled and self._disk_path:
+            try:
+                self._disk = DiskStore(self._disk_path)
+                self._disk.prune()
+            except Exception as e:
+                logger.error(f"Could not open response cache database {self._disk_path}: {e}")
+                self._disk_path = None
+        return self._disk
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str):
+        """Return the cached response for ``key`` or None"""
+        entry = self._entries.get(key)
+        if entry:
+            response, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+            del self._entries[key]
+
+        if self.disk:
+            try:
+                row = await asyncio.get_running_loop().run_in_executor(None, self.disk.get, key)
+            except Exception as e:
+                logger.error(f"Response cache lookup failed: {e}")
+                row = None
+            if row:
+                self._remember(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, response: str):
+        """Store a successful response"""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, response, expires_at)
+        if self.disk:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.disk.put, key, response, expires_at)
+            except Exception as e:
+                logger.error(f"Response cache write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def close(self):
+        if self._disk:
+            self._disk.close()
+            self._disk = None
+
+
+# Global instance
+response_cache = ResponseCache()
@@ -0,0 +1,130 @@
+import logging
+
+from selector_registry import ASSISTANT_MESSAGE_SELECTOR, LOGIN_PROMPT_SELECTOR
+
+logger = logging.getLogger(__name__)
+
+STOP_BUTTON_SELECTOR = 'button[data-testid="stop-button"], button[aria-label*="Stop"]'
+
+OUTPUT_FORMATS = ("text", "markdown", "html")
+
+# Serializes the newest assistant message in one round trip. Returns the rendered
+# text plus the requested format ("markdown" keeps code fences with their
+# language, nested lists, tables, quotes and links; "html" is the message markup)
+# and whether ChatGPT has finished generating.
+EXTRACT_SCRIPT = r"""
+([assistantSelector, stopSelector, loginSelector, previousCount, format]) => {
+    const SKIP = new Set(['BUTTON', 'SVG', 'STYLE', 'SCRIPT', 'NOSCRIPT']);
+    const BLOCK = new Set([
+        'P', 'H1', 'H2', 'H3', 'H4', 'H5', 'H6', 'PRE', 'UL', 'OL', 'BLOCKQUOTE', 'TABLE', 'HR',
+        'DIV', 'SECTION', 'ARTICLE', 'HEADER', 'FOOTER', 'FIGURE'
+    ]);
+    const tag = (node) => (node.tagName || '').toUpperCase();
+
+    const inline = (node) => Array.from(node.childNodes, convertInline).join('');
+    const convertInline = (node) => {
+        if (node.nodeType === 3) return node.textContent.replace(/\s+/g, ' ');
+        if (node.nodeType !== 1 || SKIP.has(tag(node))) return '';
+        switch (tag(node)) {
+            case 'STRONG': case 'B': return '**' + inline(node) + '**';
+            case 'EM': case 'I': return '*' + inline(node) + '*';
+            case 'DEL': case 'S': return '~~' + inline(node) + '~~';
+            case 'CODE': {
+                const code = node.textContent;
+                const fence = code.includes('`') ? '``' : '`';
+                return fence + code + fence;
+            }
+            case 'A': return '[' + inline(node) + '](' + (node.getAttribute('href') || '') + ')';
+            case 'IMG': return '![' + (node.getAttribute('alt') || '') + '](' + (node.getAttribute('src') || '') + ')';
+            case 'BR': return '\n';
+            default: return BLOCK.has(tag(node)) ? blocks(node).join('\n\n') : inline(node);
+        }
+    };
+
+    const blocks = (parent) => {
+        const out = [];
+        let buffer = '';
+        const flush = () => {
+            if (buffer.trim()) out.push(buffer.trim());
+            buffer = '';
+        };
+        for (const node of parent.childNodes) {
+            if (node.nodeType === 1 && (BLOCK.has(tag(node)) || tag(node) === 'LI')) {
+                flush();
+                const converted = convertBlock(node);
+                if (converted) out.push(converted);
+            } else {
+                buffer += convertInline(node);
+            }
+        }
+        flush();
+        return out;
+    };
+
+    const indentRest = (text, width) => text.split('\n')
+        .map((line, index) => index === 0 || !line ? line : ' '.repeat(width) + line)
+        .join('\n');
+
+    const tableRow = (row) => '| ' + Array.from(row.children, cell =>
+        inline(cell).trim().replace(/\|/g, '\\|').replace(/\n/g, ' ')
+    ).join(' | ') + ' |';
+
+    const convertBlock = (node) => {
+        const name = tag(node);
+        if (/^H[1-6]$/.test(name)) return '#'.repeat(Number(name[1])) + ' ' + inline(node).trim();
+        switch (name) {
+            case 'P': return inline(node).trim();
+            case 'HR': return '---';
+            case 'PRE': {
+                const code = node.querySelector('code');
+                const language = code ? ((/language-([\w+#.-]+)/.exec(code.className || '') || [])[1] || '') : '';
+                const body = (code || node).textContent.replace(/\n$/, '');
+                const fence = body.includes('```') ? '````' : '```';
+                return fence + language + '\n' + body + '\n' + fence;
+            }
+            case 'UL': case 'OL': {
+                const start = Number(node.getAttribute('start') || 1);
+                return Array.from(node.children).filter(child => tag(child) === 'LI').map((item, index) => {
+                    const marker = name === 'OL' ? (start + index) + '. ' : '- ';
+                    return marker + indentRest(blocks(item).join('\n'), marker.length);
+                }).join('\n');
+            }
+            case 'LI': return '- ' + indentRest(blocks(node).join('\n'), 2);
+            case 'BLOCKQUOTE':
+                return blocks(node).join('\n\n').split('\n').map(line => line ? '> ' + line : '>').join('\n');
+            case 'TABLE': {
+                const rows = Array.from(node.querySelectorAll('tr'));
+                if (!rows.length) return '';
+                const header = tableRow(rows[0]);
+                const separator = '| ' + Array.from(rows[0].children, () => '---').join(' | ') + ' |';
+                return [header, separator, ...rows.slice(1).map(tableRow)].join('\n');
+            }
+            default: return blocks(node).join('\n\n');
+        }
+    };
+
+    const messages = document.querySelectorAll(assistantSelector);
+    const complete = !document.querySelector(stopSelector);
+    const loginPromptPresent = !!document.querySelector(loginSelector);
+    if (messages.length <= previousCount) {
+        return {count: messages.length, text: '', content: '', length: 0, complete, loginPromptPresent};
+    }
+    const element = messages[messages.length - 1];
+    const root = element.querySelector('.markdown') || element;
+    const text = (element.innerText || '').trim();
+    let content = text;
+    if (format === 'markdown') content = blocks(root).join('\n\n').trim();
+    else if (format === 'html') content = root.innerHTML.trim();
+    return {count: messages.length, text, content, length: content.length, complete, loginPromptPresent};
+}
+"""
+
+
+async def extract_response(page, previous_count: int, output_format: str = "text") -> dict:
+    """Read the newest assistant message (and its Markdown/HTML form) in one ``evaluate``"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+    return await page.evaluate(
+        EXTRACT_SCRIPT,
+        [ASSISTANT_MESSAGE_SELECTOR, STOP_BUTTON_SELECTOR, LOGIN_PROMPT_SELECTOR, previous_count, output_format]
+    )
@@ -0,0 +1,180 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+BINDING_NAME = "__chatapiNotify"
+
+# Installed into the page for every prompt. Reports "progress" snapshots while the
+# assistant message grows, then a single "done" once the text has been stable for
+# the stability window (or the stop-generating button disappears), or "login" if
+# ChatGPT shows a login wall instead.
+WATCH_SCRIPT = """
+({token, previousCount, stabilityMs, progressMs, bindingName}) => {
+    if (window.__chatapiWatch) window.__chatapiWatch.stop();
+    const ASSISTANT = '[data-message-author-role="assistant"]';
+    const STOP = 'button[data-testid="stop-button"], button[aria-label*="Stop"]';
+    const LOGIN = 'button[data-testid="login-button"], button[data-testid="mobile-login-button"]';
+    const notify = (type, text) => window[bindingName]({token, type, text});
+    let lastText = null, sentText = null, lastSent = 0;
+    let sawStop = false, finished = false, settleTimer = null, progressTimer = null;
+
+    const latest = () => {
+        const messages = document.querySelectorAll(ASSISTANT);
+        return messages.length > previousCount ? messages[messages.length - 1] : null;
+    };
+    const stop = () => {
+        finished = true;
+        observer.disconnect();
+        clearTimeout(settleTimer);
+        clearTimeout(progressTimer);
+        window.__chatapiWatch = null;
+    };
+    const finish = (type, text) => {
+        if (finished) return;
+        stop();
+        notify(type, text);
+    };
+    const flushProgress = () => {
+        progressTimer = null;
+        if (finished || lastText === sentText) return;
+        sentText = lastText;
+        lastSent = Date.now();
+        notify('progress', lastText);
+    };
+    const reportProgress = () => {
+        if (progressTimer) return;
+        const wait = Math.max(0, progressMs - (Date.now() - lastSent));
+        progressTimer = setTimeout(flushProgress, wait);
+    };
+    const settle = () => {
+        settleTimer = null;
+        if (finished) return;
+        const element = latest();
+        const text = element ? element.innerText : '';
+        if (text.trim() && text === lastText && !document.querySelector(STOP)) {
+            finish('done', text);
+            return;
+        }
+        check();
+        if (!settleTimer && !finished) settleTimer = setTimeout(settle, stabilityMs);
+    };
+    const check = () => {
+        if (finished) return;
+        if (document.querySelector(LOGIN)) {
+            finish('login', '');
+            return;
+        }
+        const stopVisible = !!document.querySelector(STOP);
+        sawStop = sawStop || stopVisible;
+        const element = latest();
+        if (!element) return;
+        const text = element.innerText;
+        if (text !== lastText) {
+            lastText = text;
+            if (text.trim()) reportProgress();
+            clearTimeout(settleTimer);
+            settleTimer = setTimeout(settle, stabilityMs);
+        }
+        if (sawStop && !stopVisible && text.trim()) finish('done', text);
+    };
+
+    const observer = new MutationObserver(check);
+    observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+    window.__chatapiWatch = {stop};
+    check();
+    return true;
+}
+"""
+
+STOP_SCRIPT = "() => { if (window.__chatapiWatch) window.__chatapiWatch.stop(); }"
+
+
+class ResponseWatcher:
+    """Receives completion events pushed from an in-page MutationObserver"""
+
+    _tokens = itertools.count(1)
+
+    def __init__(self, page):
+        self.page = page
+        self.installed = False
+        self._token = None
+        self._events = asyncio.Queue()
+
+    async def install(self) -> bool:
+        """Expose the notification binding on the page (survives navigations)"""
+        try:
+            await self.page.expose_binding(BINDING_NAME, self._on_event)
+            self.installed = True
+        except Exception as e:
+            logger.warning(f"Could not install response watcher binding: {e}")
+            self.installed = False
+        return self.installed
+
+    def _on_event(self, source, event):
+        if not isinstance(event, dict) or event.get("token") != self._token:
+            return
+        self._events.put_nowait(event)
+
+    async def start(self, previous_count: int) -> bool:
+        """Begin watching for an assistant message beyond ``previous_count``"""
+        if not self.installed:
+            return False
+        self._token = next(self._tokens)
+        self._events = asyncio.Queue()
+        try:
+            await self.page.evaluate(WATCH_SCRIPT, {
+                "token": self._token,
+                "previousCount": previous_count,
+                "stabilityMs": Config.RESPONSE_STABILITY_MS,
+                "progressMs": Config.RESPONSE_PROGRESS_MS,
+                "bindingName": BINDING_NAME
+            })
+            return True
+        except Exception as e:
+            logger.warning(f"Could not start response watcher: {e}")
+            self._token = None
+            return False
+
+    async def stop(self):
+        self._token = None
+        try:
+            await self.page.evaluate(STOP_SCRIPT)
+        except Exception as e:
+            logger.debug(f"Could not stop response watcher: {e}")
+
+    async def next_event(self, deadline: float):
+        """Return the next event, or None once ``deadline`` (time.time()) has passed"""
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self._events.get(), remaining)
+        except asyncio.TimeoutError:
+            return None
+
+    async def stream(self, timeout_seconds: float):
+        """Yield events until the watcher reports completion.
+
+        Progress events are yielded as they arrive. The last event is always a
+        terminal one whose ``type`` is "done", "login" or "timeout"; on timeout its
+        ``text`` holds the last partial snapshot, if any.
+        """
+        deadline = time.time() + max(1, timeout_seconds)
+        last_text = ""
+        try:
+            while True:
+                event = await self.next_event(deadline)
+                if event is None:
+                    yield {"type": "timeout", "text": last_text}
+                    return
+                yield event
+                if event["type"] != "progress":
+                    return
+                last_text = event["text"]
+        finally:
+            await self.stop()
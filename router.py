@@ -0,0 +1,396 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+import httpx
+
+from backends import load_backends
+from config import Config
+from logging_setup import RequestIdMiddleware, current_request_id
+from metrics import merge_expositions
+from streaming import GuardedStreamingResponse
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREFIX_PATTERN = re.compile(r"^w(\d+)-")
+
+# Hop-by-hop headers that must not be copied between the client and a worker
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-length", "host"}
+
+
+def worker_socket_path(index: int) -> str:
+    return os.path.join(Config.WORKER_SOCKET_DIR, f"worker-{index}.sock")
+
+
+def worker_session_prefix(index: int) -> str:
+    return f"w{index}-"
+
+
+def worker_profile_dir(index: int):
+    """Each worker needs its own Chromium profile; seed it from the single-process one"""
+    if not Config.BROWSER_PROFILE_DIR:
+        return None
+    profile_dir = f"{Config.BROWSER_PROFILE_DIR}-{index}"
+    if not os.path.exists(profile_dir) and os.path.isdir(Config.BROWSER_PROFILE_DIR):
+        logger.info(f"Seeding worker {index} profile from {Config.BROWSER_PROFILE_DIR}")
+        shutil.copytree(Config.BROWSER_PROFILE_DIR, profile_dir, ignore=shutil.ignore_patterns("Singleton*"))
+    return profile_dir
+
+
+def configure_worker(index: int) -> str:
+    """Apply worker ``index``'s settings to Config and return its socket path"""
+    from request_queue import request_queue
+
+    if Config.BACKENDS_FILE:
+        backend = load_backends(Config.BACKENDS_FILE)[index]
+        Config.BROWSER_PROFILE_DIR = backend.profile_dir
+        Config.STORAGE_STATE_PATH = backend.storage_state_path or Config.STORAGE_STATE_PATH
+        if backend.browser_endpoint:
+            Config.BROWSER_CONNECT_MODE = backend.connect_mode
+            Config.BROWSER_ENDPOINT = backend.browser_endpoint
+        Config.PAGE_POOL_SIZE = backend.concurrency
+        request_queue.concurrency = backend.concurrency
+    elif Config.BROWSER_CONNECT_MODE == "launch":
+        Config.BROWSER_PROFILE_DIR = worker_profile_dir(index)
+    Config.SESSION_ID_PREFIX = worker_session_prefix(index)
+    return worker_socket_path(index)
+
+
+class WorkerProcess:
+    """One worker process (own browser and page pool) and the router's view of it"""
+
+    def __init__(self, index: int, backend=None):
+        self.index = index
+        self.backend = backend
+        self.name = backend.name if backend else f"worker-{index}"
+        self.weight = backend.weight if backend else 1.0
+        self.socket_path = worker_socket_path(index)
+        self.process = None
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=self.socket_path),
+            base_url="http://worker",
+            timeout=None
+        )
+        self.in_flight = 0
+        self.ready = False
+        self.health = None
+        self.restarts = 0
+        self.requests_served = 0
+        self.failures = 0
+        self.cooldowns = 0
+        self.cooldown_until = 0
+        self.cooldown_reason = None
+        self.last_block_at = 0
+
+    @property
+    def cooling_down(self) -> bool:
+        return time.time() < self.cooldown_until
+
+    def start_cooldown(self, reason: str, at: float = None):
+        """Keep requests away from this backend after a login wall or rate limit"""
+        at = at or time.time()
+        if at <= self.last_block_at:
+            return
+        self.last_block_at = at
+        seconds = Config.LOGIN_WALL_COOLDOWN if reason == "login" else Config.RATE_LIMIT_COOLDOWN
+        self.cooldown_until = max(self.cooldown_until, at + seconds)
+        self.cooldown_reason = reason
+        self.cooldowns += 1
+        logger.warning(f"Backend {self.name} hit a {reason}, cooling down for {seconds}s")
+
+    def load(self) -> float:
+        """Outstanding work relative to the backend's weight, counting the request being placed"""
+        return (self.in_flight + 1) / self.weight
+
+    async def start(self, script: str):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.process = await asyncio.create_subprocess_exec(sys.executable, script, "--worker", str(self.index))
+        self.ready = False
+        logger.info(f"Started worker {self.index} (pid {self.process.pid})")
+
+    async def poll(self):
+        """Refresh readiness from the worker's own /health"""
+        try:
+            response = await self.client.get("/health", timeout=Config.PAGE_CHECK_TIMEOUT)
+            self.health = response.json()
+            self.ready = bool(self.health.get("automation_ready"))
+            last_block = self.health.get("last_block")
+            if last_block:
+                self.start_cooldown(last_block["reason"], last_block["at"])
+        except Exception as e:
+            self.health = {"status": "unreachable", "error": str(e)}
+            self.ready = False
+
+    def describe(self) -> dict:
+        return {
+            "worker": self.index,
+            "name": self.name,
+            "backend": self.backend.describe() if self.backend else None,
+            "pid": self.process.pid if self.process else None,
+            "ready": self.ready,
+            "in_flight": self.in_flight,
+            "weight": self.weight,
+            "requests_served": self.requests_served,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "cooling_down": self.cooling_down,
+            "cooldown_reason": self.cooldown_reason if self.cooling_down else None,
+            "cooldown_remaining": max(0, round(self.cooldown_until - time.time())),
+            "cooldowns": self.cooldowns,
+            "health": self.health
+        }
+
+
+class WorkerRouter:
+    """Starts the worker processes and forwards requests to them.
+
+    Requests go to the ready worker with the least outstanding work per unit of
+    weight, skipping backends on cooldown after a rate limit or login wall while
+    any other is available; session requests go to the worker whose prefix is on
+    the session id.
+    """
+
+    def __init__(self):
+        self.workers = []
+        self.script = None
+        self._tasks = []
+        self._stopping = False
+
+    async def start(self, count: int, script: str):
+        """Start ``count`` workers, or one per backend when BACKENDS_FILE is set"""
+        os.makedirs(Config.WORKER_SOCKET_DIR, exist_ok=True)
+        self.script = script
+        if Config.BACKENDS_FILE:
+            backends = load_backends(Config.BACKENDS_FILE)
+            self.workers = [WorkerProcess(index, backend) for index, backend in enumerate(backends)]
+        else:
+            self.workers = [WorkerProcess(index) for index in range(count)]
+        for worker in self.workers:
+            if worker.backend is None:
+                worker_profile_dir(worker.index)
+            await worker.start(script)
+            self._tasks.append(asyncio.ensure_future(self.watch(worker)))
+        self._tasks.append(asyncio.ensure_future(self.poll_health()))
+
+    async def watch(self, worker: WorkerProcess):
+        """Restart a worker whenever its process exits"""
+        while not self._stopping:
+            code = await worker.process.wait()
+            worker.ready = False
+            if self._stopping:
+                return
+            logger.error(f"Worker {worker.index} exited with code {code}, restarting in {Config.WORKER_RESTART_DELAY}s")
+            await asyncio.sleep(Config.WORKER_RESTART_DELAY)
+            worker.restarts += 1
+            await worker.start(self.script)
+
+    async def poll_health(self):
+        while not self._stopping:
+            await asyncio.gather(*(worker.poll() for worker in self.workers))
+            await asyncio.sleep(Config.WORKER_HEALTH_INTERVAL)
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        for worker in self.workers:
+            if worker.process and worker.process.returncode is None:
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process:
+                try:
+                    await asyncio.wait_for(worker.process.wait(), Config.SUPERVISOR_DRAIN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Worker {worker.index} did not stop in time, killing it")
+                    worker.process.kill()
+            await worker.client.aclose()
+
+    def candidates(self) -> list:
+        """Workers in dispatch order: available ones first, then by weighted outstanding work"""
+        return sorted(
+            self.workers,
+            key=lambda worker: (worker.cooling_down, not worker.ready, worker.load(), worker.index)
+        )
+
+    def worker_for_session(self, session_id: str) -> WorkerProcess:
+        match = SESSION_PREFIX_PATTERN.match(session_id or "")
+        if not match or int(match.group(1)) >= len(self.workers):
+            raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+        return self.workers[int(match.group(1))]
+
+    async def forward(self, request: Request, body: bytes = None, session_id: str = None, retry_busy: bool = False):
+        """Send the request to a worker and relay its (possibly streaming) response"""
+        if body is None:
+            body = await request.body()
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_HEADERS}
+        # The worker logs under the same correlation id as the router
+        headers["x-request-id"] = current_request_id()
+        targets = [self.worker_for_session(session_id)] if session_id else self.candidates()
+
+        for position, worker in enumerate(targets):
+            worker.in_flight += 1
+            try:
+                upstream = worker.client.build_request(
+                    request.method, request.url.path, params=request.query_params, headers=headers, content=body
+                )
+                response = await worker.client.send(upstream, stream=True)
+            except httpx.TransportError as e:
+                worker.in_flight -= 1
+                worker.ready = False
+                logger.warning(f"Worker {worker.index} unreachable: {e}")
+                continue
+            blocked = response.headers.get("x-backend-blocked")
+            if blocked:
+                worker.start_cooldown(blocked)
+            # A full queue or a refused account on one backend is not the same everywhere: try the next one
+            if retry_busy and (response.status_code == 429 or blocked) and position < len(targets) - 1:
+                await response.aclose()
+                worker.in_flight -= 1
+                worker.failures += 1
+                continue
+            break
+        else:
+            raise HTTPException(status_code=503, detail="No worker process is reachable")
+
+        async def finish():
+            # Also runs when the client disconnects before the relay starts
+            await response.aclose()
+            worker.in_flight -= 1
+            worker.requests_served += 1
+
+        if response.status_code >= 400 or blocked:
+            worker.failures += 1
+        response_headers = {name: value for name, value in response.headers.items() if name.lower() not in HOP_HEADERS}
+        try:
+            return GuardedStreamingResponse(
+                response.aiter_raw(), finish, status_code=response.status_code, headers=response_headers
+            )
+        except Exception:
+            await finish()
+            raise
+
+    async def health(self) -> dict:
+        await asyncio.gather(*(worker.poll() for worker in self.workers))
+        ready = sum(1 for worker in self.workers if worker.ready)
+        if ready == len(self.workers):
+            status = "healthy"
+        elif ready:
+            status = "degraded"
+        else:
+            status = "unhealthy"
+        return {
+            "status": status,
+            "chatgpt_accessible": ready > 0,
+            "automation_ready": ready > 0,
+            "workers_ready": ready,
+            "workers_cooling_down": sum(1 for worker in self.workers if worker.cooling_down),
+            "workers": [worker.describe() for worker in self.workers]
+        }
+
+    async def metrics(self) -> str:
+        async def scrape(worker):
+            try:
+                response = await worker.client.get("/metrics", timeout=Config.PAGE_CHECK_TIMEOUT)
+                return str(worker.index), response.text
+            except Exception as e:
+                logger.debug(f"Could not scrape worker {worker.index}: {e}")
+                return str(worker.index), ""
+        return merge_expositions(dict(await asyncio.gather(*(scrape(worker) for worker in self.workers))), "worker")
+
+
+# Global instance
+worker_router = WorkerRouter()
+
+app = FastAPI(title="Custom ChatGPT API", version="1.0.0")
+app.add_middleware(RequestIdMiddleware)
+
+
+def session_id_from_body(body: bytes):
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        return None
+    return payload.get("session_id") if isinstance(payload, dict) else None
+
+
+@app.get("/")
+async def root():
+    health = await worker_router.health()
+    return {
+        "message": "Custom ChatGPT API is running!",
+        "status": "healthy" if health["automation_ready"] else "initializing",
+        "automation_ready": health["automation_ready"],
+        "workers_ready": health["workers_ready"]
+    }
+
+
+@app.post("/chat")
+@app.post("/chat/stream")
+async def chat(request: Request):
+    body = await request.body()
+    session_id = session_id_from_body(body)
+    return await worker_router.forward(request, body, session_id=session_id, retry_busy=session_id is None)
+
+
+@app.post("/jobs")
+async def create_job(request: Request):
+    body = await request.body()
+    session_id = session_id_from_body(body)
+    return await worker_router.forward(request, body, session_id=session_id)
+
+
+@app.get("/jobs/{job_id}")
+@app.post("/chat/batch")
+@app.post("/sessions")
+async def forward_to_least_loaded(request: Request):
+    return await worker_router.forward(request, retry_busy=True)
+
+
+@app.get("/sessions/{session_id}")
+@app.delete("/sessions/{session_id}")
+async def session(session_id: str, request: Request):
+    return await worker_router.forward(request, session_id=session_id)
+
+
+@app.get("/backends")
+async def backends():
+    """
+    Per-backend routing stats: load, weight, cooldowns and failures
+    """
+    return {"backends": [worker.describe() for worker in worker_router.workers]}
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    A traced request's span tree; workers share TRACE_DIR, so it is read from disk
+    """
+    trace = tracer.load(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found")
+    return trace
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Metrics of every worker, each sample labelled with its worker index
+    """
+    return PlainTextResponse(await worker_router.metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+async def health_check():
+    """
+    Aggregated readiness: healthy when every worker is ready, degraded when some are
+    """
+    return await worker_router.health()
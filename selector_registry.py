@@ -0,0 +1,239 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+COMPOSER_SELECTORS = [
+    'div[contenteditable="true"].ProseMirror',
+    'div#prompt-textarea[contenteditable="true"]',
+    'div[contenteditable="true"]',
+    'textarea[name="prompt-textarea"]',
+    'textarea[placeholder*="Ask anything"]',
+    'textarea[placeholder*="Message"]',
+    'textarea[placeholder="Message ChatGPT"]',
+    'textarea[data-id="root"]',
+    'textarea[role="textbox"]',
+    'textarea[aria-label*="Message"]',
+    'textarea'
+]
+
+SEND_BUTTON_SELECTORS = [
+    'button[data-testid="composer-send-button"]',
+    'button[data-testid="send-button"]',
+    'button[aria-label*="Send"]',
+    'button[title*="Send"]',
+    'button[type="submit"]'
+]
+
+# Matched against button text the way Playwright's :has-text() does
+OVERLAY_BUTTON_TEXTS = [
+    "Accept all",
+    "Accept",
+    "Reject non-essential",
+    "I agree",
+    "Got it"
+]
+
+FILE_INPUT_SELECTOR = 'input[type="file"]'
+LOGIN_PROMPT_SELECTOR = 'button[data-testid="login-button"], button[data-testid="mobile-login-button"], a[href="/auth/login"]'
+ASSISTANT_MESSAGE_SELECTOR = '[data-message-author-role="assistant"]'
+
+# What ChatGPT says (in an error banner or as the reply itself) when the account is rate limited
+RATE_LIMIT_PATTERN = r"you(?:'|\u2019|\s+ha)ve\s+(?:reached|hit)\s+(?:our|your|the)\s+(?:limit|usage cap)|too many requests"
+
+# Everything prepare_prompt needs to know about the page, in one round trip
+PAGE_STATE_SCRIPT = """
+([loginSelector, assistantSelector]) => ({
+    title: document.title,
+    loginPromptPresent: !!document.querySelector(loginSelector),
+    assistantCount: document.querySelectorAll(assistantSelector).length,
+    domNodes: document.getElementsByTagName('*').length
+})
+"""
+
+# Returns the index of the first candidate selector that matches, or -1
+FIRST_MATCH_SCRIPT = """
+(selectors) => {
+    for (let i = 0; i < selectors.length; i++) {
+        try {
+            if (document.querySelector(selectors[i])) return i;
+        } catch (e) {}
+    }
+    return -1;
+}
+"""
+
+# Returns the index of the first candidate text found in a button, or -1
+FIRST_BUTTON_TEXT_SCRIPT = """
+(texts) => {
+    const labels = Array.from(document.querySelectorAll('button'), b => (b.innerText || '').toLowerCase());
+    for (let i = 0; i < texts.length; i++) {
+        const text = texts[i].toLowerCase();
+        if (labels.some(label => label.includes(text))) return i;
+    }
+    return -1;
+}
+"""
+
+# True if an error banner or the latest assistant message matches the rate-limit pattern
+RATE_LIMIT_SCRIPT = """
+([pattern, assistantSelector]) => {
+    const regex = new RegExp(pattern, 'i');
+    const candidates = Array.from(document.querySelectorAll('[role="alert"], [data-testid*="toast"], .text-token-text-error'));
+    const messages = document.querySelectorAll(assistantSelector);
+    if (messages.length) candidates.push(messages[messages.length - 1]);
+    return candidates.some(element => regex.test(element.innerText || ''));
+}
+"""
+
+
+# Attributes of the page's inputs and buttons, for the diagnostic log when a selector stops matching
+CONTROLS_SCRIPT = """
+(limit) => {
+    const attributes = (element, names) => Object.fromEntries(names.map(name => [name, element.getAttribute(name)]));
+    const pick = (selector, names, withText) => Array.from(document.querySelectorAll(selector)).slice(0, limit).map(element => {
+        const entry = attributes(element, names);
+        if (withText) entry.text = (element.innerText || '').trim().slice(0, 80);
+        return entry;
+    });
+    return {
+        textareas: pick('textarea', ['placeholder', 'role', 'data-id', 'name'], false),
+        contenteditable: pick('div[contenteditable="true"]', ['class', 'id'], false),
+        buttons: pick('button', ['aria-label', 'title', 'data-testid'], true)
+    };
+}
+"""
+
+
+# Attachment chips live in the composer (the upload input's form), not in the
+# conversation, which may already mention the same file name from an earlier turn.
+# Counts how often the composer shows the file name.
+ATTACHMENT_COUNT_SCRIPT = """
+(name) => {
+    const input = document.querySelector('input[type="file"]');
+    const area = (input && input.closest('form')) || document.querySelector('form') || document.body;
+    return (area.innerText || '').split(name).length - 1;
+}
+"""
+
+# True once the composer shows the file name more often than before the upload and no upload progress remains
+ATTACHMENT_READY_SCRIPT = """
+([name, before]) => {
+    const input = document.querySelector('input[type="file"]');
+    const area = (input && input.closest('form')) || document.querySelector('form') || document.body;
+    const uploading = area.querySelector('[role="progressbar"], [data-testid*="upload-progress"]');
+    return !uploading && (area.innerText || '').split(name).length - 1 > before;
+}
+"""
+
+
+def format_controls(controls: dict) -> str:
+    """Render a describe_controls() result on one line, e.g. ``button(aria-label="Send", data-testid="send-button")``"""
+    tags = {"textareas": "textarea", "contenteditable": "div[contenteditable]", "buttons": "button"}
+    entries = []
+    for kind, tag in tags.items():
+        for element in controls.get(kind, []):
+            fields = ", ".join(f"{name}={json.dumps(value)}" for name, value in element.items() if value)
+            entries.append(f"{tag}({fields})")
+    return " ".join(entries) or "none"
+
+
+def is_rate_limit_message(text: str) -> bool:
+    """True if a (short) reply is ChatGPT's rate-limit notice rather than an answer"""
+    return bool(text) and len(text) < 400 and re.search(RATE_LIMIT_PATTERN, text, re.IGNORECASE) is not None
+
+
+class SelectorStrategy:
+    """An ordered list of candidate selectors that remembers which one last matched"""
+
+    def __init__(self, name: str, candidates: list):
+        self.name = name
+        self.candidates = candidates
+        self.winner = None
+        self.hits = 0
+        self.fallbacks = 0
+
+    def invalidate(self):
+        self.winner = None
+
+    async def resolve(self, page):
+        """Return the element for the best matching candidate, or None.
+
+        Tries the remembered winner first (one round trip), otherwise resolves the
+        whole candidate list in a single ``evaluate`` call.
+        """
+        if self.winner is not None:
+            element = await page.query_selector(self.candidates[self.winner])
+            if element:
+                self.hits += 1
+                return element
+            logger.info(f"Remembered {self.name} selector no longer matches, re-resolving")
+            self.invalidate()
+
+        self.fallbacks += 1
+        index = await page.evaluate(FIRST_MATCH_SCRIPT, self.candidates)
+        if index < 0:
+            return None
+        element = await page.query_selector(self.candidates[index])
+        if element:
+            self.winner = index
+            logger.info(f"Found {self.name} with selector: {self.candidates[index]}")
+        return element
+
+    def stats(self) -> dict:
+        return {
+            "winner": self.candidates[self.winner] if self.winner is not None else None,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks
+        }
+
+
+class SelectorRegistry:
+    """Per-page selector strategies, invalidated whenever the page navigates"""
+
+    def __init__(self, page=None):
+        self.composer = SelectorStrategy("chat input", COMPOSER_SELECTORS)
+        self.send_button = SelectorStrategy("send button", SEND_BUTTON_SELECTORS)
+        if page is not None:
+            page.on("framenavigated", lambda frame: self.invalidate() if frame == page.main_frame else None)
+
+    def invalidate(self):
+        self.composer.invalidate()
+        self.send_button.invalidate()
+
+    async def page_state(self, page) -> dict:
+        """Return the page title, login-wall flag, assistant message count and DOM size"""
+        return await page.evaluate(PAGE_STATE_SCRIPT, [LOGIN_PROMPT_SELECTOR, ASSISTANT_MESSAGE_SELECTOR])
+
+    async def rate_limited(self, page) -> bool:
+        """True if the page shows ChatGPT's rate-limit notice"""
+        return await page.evaluate(RATE_LIMIT_SCRIPT, [RATE_LIMIT_PATTERN, ASSISTANT_MESSAGE_SELECTOR])
+
+    async def describe_controls(self, page, limit: int = 50) -> dict:
+        """Attributes of the page's textareas, contenteditable divs and buttons, in one round trip"""
+        return await page.evaluate(CONTROLS_SCRIPT, limit)
+
+    async def attach_file(self, page, name: str, content: bytes, timeout: float) -> bool:
+        """Attach a file through the composer's upload input and wait until it is uploaded"""
+        file_input = await page.query_selector(FILE_INPUT_SELECTOR)
+        if file_input is None:
+            return False
+        before = await page.evaluate(ATTACHMENT_COUNT_SCRIPT, name)
+        await file_input.set_input_files({"name": name, "mimeType": "text/plain", "buffer": content})
+        await page.wait_for_function(ATTACHMENT_READY_SCRIPT, arg=[name, before], timeout=timeout * 1000)
+        return True
+
+    async def find_overlay_button(self, page):
+        """Return the first consent/overlay button present, checking all texts in one call"""
+        index = await page.evaluate(FIRST_BUTTON_TEXT_SCRIPT, OVERLAY_BUTTON_TEXTS)
+        if index < 0:
+            return None, None
+        selector = f'button:has-text("{OVERLAY_BUTTON_TEXTS[index]}")'
+        return selector, await page.query_selector(selector)
+
+    def stats(self) -> dict:
+        return {
+            "composer": self.composer.stats(),
+            "send_button": self.send_button.stats()
+        }
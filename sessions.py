@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a request names a session that does not exist (or expired)"""
+
+    def __init__(self, session_id: str):
+        super().__init__(session_id)
+        self.session_id = session_id
+
+    def __str__(self):
+        return f"Session '{self.session_id}' not found"
+
+
+class ChatSession:
+    """A multi-turn conversation pinned to one page of the pool"""
+
+    def __init__(self, session_id: str, worker=None):
+        self.session_id = session_id
+        self.worker = worker
+        self.conversation_url = None
+        self.turns = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.lock = asyncio.Lock()
+
+    def touch(self):
+        self.last_used = time.time()
+
+    def describe(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "page": self.worker.index if self.worker else None,
+            "conversation_url": self.conversation_url,
+            "turns": self.turns,
+            "created_at": self.created_at,
+            "last_used": self.last_used
+        }
+
+
+class SessionManager:
+    """Creates, looks up and expires chat sessions"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def expire_idle(self):
+        cutoff = time.time() - Config.SESSION_IDLE_TIMEOUT
+        for session_id, session in list(self.sessions.items()):
+            if session.last_used < cutoff and not session.lock.locked():
+                logger.info(f"Expiring idle session {session_id}")
+                self.delete(session_id)
+
+    def create(self, workers: list) -> ChatSession:
+        """Open a session on the page currently serving the fewest sessions"""
+        self.expire_idle()
+        worker = None
+        if workers:
+            load = {worker.index: 0 for worker in workers}
+            for session in self.sessions.values():
+                if session.worker is not None and session.worker.index in load:
+                    load[session.worker.index] += 1
+            worker = min(workers, key=lambda candidate: load[candidate.index])
+        session = ChatSession(Config.SESSION_ID_PREFIX + uuid.uuid4().hex, worker)
+        self.sessions[session.session_id] = session
+        logger.info(f"Created session {session.session_id} on page worker {worker.index if worker else None}")
+        return session
+
+    def get(self, session_id: str) -> ChatSession:
+        self.expire_idle()
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        session.touch()
+        return session
+
+    def delete(self, session_id: str):
+        # The page keeps this session_id, so the next stateless request on it
+        # starts a fresh chat instead of continuing the deleted conversation
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        return session
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.sessions),
+            "idle_timeout_seconds": Config.SESSION_IDLE_TIMEOUT
+        }
+
+
+# Global instance
+session_manager = SessionManager()
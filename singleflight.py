@@ -0,0 +1,46 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one shared execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    async def do(self, key: str, func):
+        """Run ``func()`` for ``key`` unless an identical call is already in flight.
+
+        Every caller gets the same result or exception. The shared work is
+        shielded, so a caller that is cancelled (e.g. a disconnected client)
+        stops waiting without cancelling it for everyone else.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info("Joining identical in-flight request")
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
+
+
+# Global instance
+chat_flights = SingleFlight()
@@ -2,33 +2,65 @@
 """
 Startup script for the Custom ChatGPT API
 """
+import argparse
 import asyncio
 import logging
+import os
 import sys
-from main import app
+from main import app, run_job
 import uvicorn
 from config import Config
 from chatgpt_automation import chatgpt_automation
+from supervisor import browser_supervisor
+from jobs import job_runner
+from profiler import profiler
+from logging_setup import configure_logging
 
-def setup_logging():
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=getattr(logging, Config.LOG_LEVEL),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('chatgpt_api.log'),
-            logging.StreamHandler(sys.stdout)
-        ]
+def setup_logging(process_name: str = None):
+    """Setup logging configuration (text or JSON, written off the event loop)"""
+    configure_logging(process_name)
+
+async def run_router():
+    """Start WORKER_PROCESSES workers and serve the front router on the public port"""
+    from router import app as router_app, worker_router
+
+    setup_logging("router")
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting worker processes behind the router ({Config.BACKENDS_FILE or Config.WORKER_PROCESSES})...")
+    await worker_router.start(Config.WORKER_PROCESSES, os.path.abspath(__file__))
+
+    config = uvicorn.Config(
+        router_app,
+        host=Config.HOST,
+        port=Config.PORT,
+        log_config=None,  # uvicorn's loggers propagate to our queue handler
+        log_level=Config.LOG_LEVEL.lower(),
+        access_log=True
     )
+    server = uvicorn.Server(config)
+    try:
+        await server.serve()
+    finally:
+        logger.info("Router stopped, stopping workers")
+        await worker_router.stop()
 
-async def main():
+async def main(worker: int = None):
     """Main startup function"""
-    setup_logging()
+    uds = None
+    if worker is not None:
+        # Worker of the multi-process mode: own profile (or backend account), session
+        # ids the router can route back here, and a unix socket instead of the public port
+        from router import configure_worker
+        uds = configure_worker(worker)
+    setup_logging(f"worker-{worker}" if worker is not None else None)
     logger = logging.getLogger(__name__)
     
     logger.info("Starting Custom ChatGPT API Server...")
-    logger.info(f"Server will be available at: http://{Config.HOST}:{Config.PORT}")
-    logger.info("API Documentation: http://localhost:8000/docs")
+    if uds:
+        logger.info(f"Worker {worker} will listen on {uds}")
+    else:
+        logger.info(f"Server will be available at: http://{Config.HOST}:{Config.PORT}")
+        logger.info("API Documentation: http://localhost:8000/docs")
     
     try:
         # Initialize ChatGPT automation (login detection disabled for testing)
@@ -50,17 +82,32 @@ async def main():
         
         logger.info("ChatGPT automation ready! Starting API server...")
         
+        if Config.SUPERVISOR_ENABLED:
+            browser_supervisor.start()
+        if Config.JOBS_ENABLED:
+            job_runner.start(run_job)
+        profiler.start()
+        
         # Start the server
         config = uvicorn.Config(
             app,
             host=Config.HOST,
             port=Config.PORT,
+            uds=uds,
+            log_config=None,
             log_level=Config.LOG_LEVEL.lower(),
             access_log=True
         )
         server = uvicorn.Server(config)
         await server.serve()
         
+        # Graceful shutdown (e.g. systemd stop/restart): persist the session
+        logger.info("Server stopped, closing browser")
+        await browser_supervisor.stop()
+        await job_runner.stop()
+        await profiler.stop()
+        await chatgpt_automation.close()
+        
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
         # Clean up browser
@@ -72,4 +119,11 @@ async def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Start the Custom ChatGPT API")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)  # Set by the router for its worker processes
+    args = parser.parse_args()
+
+    if args.worker is None and (Config.WORKER_PROCESSES > 1 or Config.BACKENDS_FILE):
+        asyncio.run(run_router())
+    else:
+        asyncio.run(main(args.worker))
@@ -0,0 +1,23 @@
+import anyio
+from fastapi.responses import StreamingResponse
+
+
+class GuardedStreamingResponse(StreamingResponse):
+    """Streaming response that awaits ``on_close`` once the response ends, however it ends.
+
+    A generator's ``finally`` only runs if the body was iterated; when the client
+    disconnects or ``send`` fails before streaming starts it never runs, so
+    resources held for the stream (queue slots, upstream connections) are
+    released here instead.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.on_close()
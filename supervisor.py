@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+
+from chatgpt_automation import chatgpt_automation
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserSupervisor:
+    """Background task that checks page liveness and memory and recycles bad pages.
+
+    The last check is cached in ``state`` so /health can report it without
+    touching the browser.
+    """
+
+    def __init__(self, automation):
+        self.automation = automation
+        self._task = None
+        self.page_recycles = 0
+        self.browser_restarts = 0
+        self.state = {
+            "status": "starting",
+            "checked_at": None,
+            "browser_connected": False,
+            "pages": []
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+            logger.info(f"Browser supervisor started (every {Config.SUPERVISOR_INTERVAL}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Supervisor check failed: {str(e)}")
+            await asyncio.sleep(Config.SUPERVISOR_INTERVAL)
+
+    async def page_metrics(self, worker) -> dict:
+        """Read renderer metrics for a page through CDP Performance.getMetrics"""
+        if worker.cdp_session is None:
+            worker.cdp_session = await self.automation.context.new_cdp_session(worker.page)
+            await worker.cdp_session.send("Performance.enable")
+        result = await worker.cdp_session.send("Performance.getMetrics")
+        return {metric["name"]: metric["value"] for metric in result.get("metrics", [])}
+
+    async def check_page(self, worker) -> dict:
+        """Cheap liveness probe plus memory metrics for one page"""
+        report = {"index": worker.index, "alive": False, "busy": worker.busy, "js_heap_mb": None, "dom_nodes": None}
+        if worker.page.is_closed():
+            return report
+        try:
+            await asyncio.wait_for(worker.page.evaluate("() => 1"), Config.PAGE_CHECK_TIMEOUT)
+            report["alive"] = True
+        except Exception as e:
+            logger.warning(f"Page worker {worker.index} failed liveness check: {e}")
+            return report
+        try:
+            metrics = await asyncio.wait_for(self.page_metrics(worker), Config.PAGE_CHECK_TIMEOUT)
+            report["js_heap_mb"] = round(metrics.get("JSHeapUsedSize", 0) / (1024 * 1024), 1)
+            report["dom_nodes"] = int(metrics.get("Nodes", 0))
+        except Exception as e:
+            logger.debug(f"Could not read metrics for page worker {worker.index}: {e}")
+            worker.cdp_session = None
+        return report
+
+    async def check(self):
+        automation = self.automation
+        if not automation.is_initialized:
+            # The supervisor only runs after a successful startup, so this means a
+            # previous restart failed: keep trying
+            self.state = dict(self.state, status="unhealthy", checked_at=time.time(), browser_connected=False)
+            self.browser_restarts += 1
+            await automation.restart_browser(drain_timeout=Config.SUPERVISOR_DRAIN_TIMEOUT)
+            return
+
+        workers = list(automation.pool.workers)
+        reports = await asyncio.gather(*(self.check_page(worker) for worker in workers))
+        connected = await automation.is_browser_connected()
+
+        if not connected or not any(report["alive"] for report in reports):
+            logger.error("Browser is not responding, restarting it")
+            self.state = dict(self.state, status="restarting", checked_at=time.time(), browser_connected=False)
+            self.browser_restarts += 1
+            await automation.restart_browser(drain_timeout=Config.SUPERVISOR_DRAIN_TIMEOUT)
+            return
+
+        for worker, report in zip(workers, reports):
+            bloated = report["js_heap_mb"] is not None and report["js_heap_mb"] > Config.MAX_PAGE_HEAP_MB
+            if not report["alive"] or bloated:
+                reason = "unresponsive" if not report["alive"] else f"using {report['js_heap_mb']} MB of JS heap"
+                logger.warning(f"Page worker {worker.index} is {reason}, recycling it")
+                if await automation.recycle_page(worker, timeout=Config.SUPERVISOR_DRAIN_TIMEOUT):
+                    self.page_recycles += 1
+
+        alive = sum(1 for report in reports if report["alive"])
+        self.state = {
+            "status": "healthy" if alive == len(reports) else "degraded",
+            "checked_at": time.time(),
+            "browser_connected": connected,
+            "pages": reports
+        }
+
+    def stats(self) -> dict:
+        return dict(self.state, page_recycles=self.page_recycles, browser_restarts=self.browser_restarts)
+
+
+# Global instance
+browser_supervisor = BrowserSupervisor(chatgpt_automation)
@@ -24,9 +24,9 @@ async def test_startup():
         
         # Test a simple request
         logger.info("Testing a simple chat request...")
-        response = await automation.get_chat_response("Hello! Please respond with 'Test successful'")
+        response, complete = await automation.get_chat_response("Hello! Please respond with 'Test successful'")
         
-        if response:
+        if response and complete:
             logger.info(f"✅ Chat test successful! Response: {response}")
         else:
             logger.error("❌ Chat test failed")
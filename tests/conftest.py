@@ -0,0 +1,26 @@
+import httpx
+import pytest
+
+from chatgpt_automation import chatgpt_automation
+from config import Config
+from main import app
+
+
+@pytest.fixture
+def automation(monkeypatch):
+    """The global automation, marked ready; tests stub the browser-facing methods they need"""
+    monkeypatch.setattr(chatgpt_automation, "is_initialized", True)
+    monkeypatch.setattr(chatgpt_automation, "is_logged_in", True)
+    monkeypatch.setattr(Config, "JOBS_ENABLED", False)
+    return chatgpt_automation
+
+
+@pytest.fixture
+def api():
+    """Send one request to the app in-process (``await api("GET", "/health")``)"""
+    async def request(method, path, **kwargs):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+            return await client.request(method, path, **kwargs)
+
+    return request
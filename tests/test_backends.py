@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from backends import Backend, BackendConfigError, load_backends
+
+
+def write(tmp_path, data) -> str:
+    path = tmp_path / "backends.json"
+    path.write_text(data if isinstance(data, str) else json.dumps(data))
+    return str(path)
+
+
+def test_defaults_and_names():
+    backend = Backend.from_dict(3, {"profile_dir": "profiles/a"})
+    assert (backend.name, backend.concurrency, backend.weight, backend.connect_mode) == ("backend-3", 2, 1.0, "cdp")
+
+    attached = Backend.from_dict(0, {"name": "main", "browser_endpoint": "http://localhost:9222", "weight": "2.5"})
+    assert (attached.name, attached.browser_endpoint, attached.weight) == ("main", "http://localhost:9222", 2.5)
+
+
+@pytest.mark.parametrize("data, message", [
+    ("profiles/a", "Backend 0 must be an object"),
+    ({"name": "a"}, "Backend 0 needs a profile_dir, storage_state_path or browser_endpoint"),
+    ({"profile_dir": "p", "connect_mode": "websocket"}, "Backend 0: connect_mode must be cdp or server"),
+    ({"profile_dir": "p", "concurrency": "many"}, "Backend 0: invalid literal"),
+    ({"profile_dir": "p", "concurrency": 0}, "Backend 0: concurrency must be >= 1 and weight > 0"),
+    ({"profile_dir": "p", "weight": -1}, "Backend 0: concurrency must be >= 1 and weight > 0"),
+])
+def test_invalid_backends_are_rejected(data, message):
+    with pytest.raises(BackendConfigError) as error:
+        Backend.from_dict(0, data)
+    assert str(error.value).startswith(message)
+
+
+def test_file_may_be_a_list_or_an_object(tmp_path):
+    backends = [{"name": "a", "profile_dir": "pa"}, {"name": "b", "profile_dir": "pb", "weight": 2}]
+    assert [backend.name for backend in load_backends(write(tmp_path, backends))] == ["a", "b"]
+    assert [backend.weight for backend in load_backends(write(tmp_path, {"backends": backends}))] == [1.0, 2.0]
+
+
+@pytest.mark.parametrize("data, message", [
+    ([], "must list at least one backend"),
+    ({"accounts": []}, "must list at least one backend"),
+    ([{"name": "a", "profile_dir": "p1"}, {"name": "a", "profile_dir": "p2"}], "must be unique"),
+    ("[{", "Could not read backends file"),
+])
+def test_invalid_files_are_rejected(tmp_path, data, message):
+    with pytest.raises(BackendConfigError, match=message):
+        load_backends(write(tmp_path, data))
+
+
+def test_missing_file_is_a_config_error(tmp_path):
+    with pytest.raises(BackendConfigError, match="Could not read backends file"):
+        load_backends(str(tmp_path / "missing.json"))
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+from request_queue import RequestQueue
+
+DELAYS = {"slow": 0.05, "medium": 0.02, "fast": 0}
+
+
+@pytest.fixture(autouse=True)
+def answering(monkeypatch, automation):
+    monkeypatch.setattr(main, "request_queue", RequestQueue(concurrency=4, max_depth=10))
+
+    async def get_chat_response(prompt, max_retries=3, session=None, output_format="text"):
+        await asyncio.sleep(DELAYS.get(prompt, 0))
+        return f"answer to {prompt}", True
+
+    monkeypatch.setattr(automation, "get_chat_response", get_chat_response)
+
+
+def ndjson(response):
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_results_stream_in_completion_order_with_their_index(api):
+    response = asyncio.run(api("POST", "/chat/batch", json={"prompts": ["slow", "medium", "fast"], "concurrency": 3}))
+    results = ndjson(response)
+    assert [result["index"] for result in results] == [2, 1, 0]
+    assert all(result["response"] == f"answer to {['slow', 'medium', 'fast'][result['index']]}" for result in results)
+    assert all(result["success"] for result in results)
+
+
+def test_request_objects_keep_their_fields(api):
+    prompts = ["fast", {"prompt": "fast", "format": "markdown"}]
+    results = sorted(ndjson(asyncio.run(api("POST", "/chat/batch", json={"prompts": prompts}))), key=lambda r: r["index"])
+    assert [result["format"] for result in results] == ["text", "markdown"]
+
+
+def test_multipart_jsonl_upload(api):
+    content = b'"slow"\n\n{"prompt": "fast"}\n'
+    response = asyncio.run(api("POST", "/chat/batch", files={"file": ("prompts.jsonl", content)}, data={"concurrency": "2"}))
+    results = ndjson(response)
+    assert [(result["index"], result["response"]) for result in results] == [(1, "answer to fast"), (0, "answer to slow")]
+
+
+@pytest.mark.parametrize("content, concurrency, detail", [
+    (b'"fast"\n', "two", "'concurrency' must be an integer"),
+    (b'"fast"\n[1, 2]\n', "1", "Invalid JSONL on line 2"),
+    (b'"fast"\n{"prompt": \n', "1", "Invalid JSONL on line 2"),
+    (b"\n", "1", "Batch contains no prompts"),
+])
+def test_bad_multipart_uploads_are_rejected(api, content, concurrency, detail):
+    response = asyncio.run(api("POST", "/chat/batch", files={"file": ("prompts.jsonl", content)}, data={"concurrency": concurrency}))
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(detail)
+
+
+def test_multipart_without_a_file_is_rejected(api):
+    response = asyncio.run(api("POST", "/chat/batch", files={"other": ("x.txt", b"")}))
+    assert (response.status_code, response.json()["detail"]) == (400, "Multipart batch requests need a JSONL 'file' field")
+
+
+def test_invalid_json_body_is_rejected(api):
+    response = asyncio.run(api("POST", "/chat/batch", json={"prompts": "not a list"}))
+    assert response.status_code == 422
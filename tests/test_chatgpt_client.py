@@ -0,0 +1,128 @@
+import json
+
+import httpx
+import pytest
+
+from chatgpt_client import ChatAPIError, ChatClient, OverloadedError, SSEParser
+
+STREAM = (
+    b'event: delta\ndata: {"text": "Hel", "reset": false}\n\n'
+    b'event: delta\ndata: {"text": "lo", "reset": false}\n\n'
+    b'event: done\ndata: {"success": true, "response": "Hello", "complete": true}\n\n'
+)
+
+
+def parse(lines):
+    parser = SSEParser()
+    return [event for event in map(parser.feed, lines) if event is not None]
+
+
+def client_for(handler) -> ChatClient:
+    client = ChatClient("http://api", max_retries=2, backoff_base=0.001, backoff_max=0.001)
+    client.http = httpx.Client(base_url="http://api", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_events_end_at_a_blank_line():
+    assert parse(["event: delta", 'data: {"text": "a"}', ""]) == [{"type": "delta", "text": "a"}]
+
+
+def test_event_type_defaults_to_message_and_resets_between_events():
+    events = parse(["event: delta", 'data: {"n": 1}', "", 'data: {"n": 2}', ""])
+    assert [event["type"] for event in events] == ["delta", "message"]
+
+
+def test_multi_line_data_is_joined_and_stray_blank_lines_ignored():
+    events = parse(["", "data: {", 'data: "text": "a"', "data: }", "", ""])
+    assert events == [{"type": "message", "text": "a"}]
+
+
+def test_stream_splits_events_across_network_chunks():
+    def handler(request):
+        chunks = [STREAM[i:i + 7] for i in range(0, len(STREAM), 7)]
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=iter(chunks))
+
+    with client_for(handler) as client:
+        events = list(client.stream("Hi"))
+    assert [event["type"] for event in events] == ["delta", "delta", "done"]
+    assert "".join(event["text"] for event in events if event["type"] == "delta") == "Hello"
+    assert client.metrics.summary()["failures"] == 0
+
+
+def test_overload_is_retried_and_then_raised():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"retry-after": "0"}, json={"detail": "Request queue is full"})
+
+    with client_for(handler) as client:
+        with pytest.raises(OverloadedError) as error:
+            client.chat("Hi")
+    assert len(calls) == 3
+    assert (error.value.status_code, error.value.detail) == (429, "Request queue is full")
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404, json={"detail": "Session 'x' not found"})
+
+    with client_for(handler) as client:
+        with pytest.raises(ChatAPIError) as error:
+            client.chat("Hi", session_id="x")
+    assert len(calls) == 1 and error.value.status_code == 404
+
+
+def test_refused_connections_are_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"response": "Hello", "success": True})
+
+    with client_for(handler) as client:
+        assert client.chat("Hi").response == "Hello"
+    assert len(calls) == 3
+
+
+def test_errors_after_sending_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.RemoteProtocolError("server disconnected", request=request)
+
+    with client_for(handler) as client:
+        with pytest.raises(httpx.RemoteProtocolError):
+            client.chat("Hi")
+    assert len(calls) == 1
+
+
+def answer_or_fail(request):
+    prompt = json.loads(request.content)["prompt"]
+    if prompt == "bad":
+        return httpx.Response(400, json={"detail": "Bad prompt"})
+    return httpx.Response(200, json={"response": prompt.upper(), "success": True})
+
+
+def test_map_keeps_input_order_and_can_return_exceptions():
+    with client_for(answer_or_fail) as client:
+        results = client.map(["a", "bad", "c"], concurrency=3, return_exceptions=True)
+        assert [result.response for result in (results[0], results[2])] == ["A", "C"]
+        assert isinstance(results[1], ChatAPIError) and results[1].status_code == 400
+
+        with pytest.raises(ChatAPIError):
+            client.map(["a", "bad", "c"], concurrency=3)
+
+
+def test_metrics_from_map_threads_are_not_lost():
+    prompts = [f"p{i}" for i in range(200)]
+    with client_for(answer_or_fail) as client:
+        client.map(prompts, concurrency=16)
+        summary = client.metrics.summary()
+    assert (summary["requests"], summary["failures"]) == (200, 0)
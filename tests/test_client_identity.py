@@ -0,0 +1,39 @@
+import pytest
+from starlette.requests import Request
+
+from config import Config
+from main import resolve_client
+from models import ChatRequest
+from request_queue import DEFAULT_CLIENT
+
+
+def http_request(headers: dict) -> Request:
+    raw = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()]
+    return Request({"type": "http", "method": "POST", "path": "/chat", "headers": raw})
+
+
+@pytest.fixture(autouse=True)
+def api_keys(monkeypatch):
+    monkeypatch.setattr(Config, "API_KEYS", {"secret-key": "reports"})
+
+
+def test_api_key_wins_over_caller_supplied_ids():
+    request = http_request({"X-API-Key": "secret-key", "X-Client-Id": "other"})
+    assert resolve_client(request, ChatRequest(prompt="p", client_id="nightly")) == "reports"
+
+
+def test_bearer_token_counts_as_api_key():
+    request = http_request({"Authorization": "Bearer secret-key"})
+    assert resolve_client(request, ChatRequest(prompt="p", client_id="nightly")) == "reports"
+
+
+def test_unknown_keys_get_a_stable_hashed_identity():
+    first = resolve_client(http_request({"X-API-Key": "unlisted"}), ChatRequest(prompt="p", client_id="x"))
+    second = resolve_client(http_request({"X-API-Key": "unlisted"}), ChatRequest(prompt="p"))
+    assert first == second and first.startswith("key-") and "unlisted" not in first
+
+
+def test_without_a_key_header_then_body_then_default():
+    assert resolve_client(http_request({"X-Client-Id": "header"}), ChatRequest(prompt="p", client_id="body")) == "header"
+    assert resolve_client(http_request({}), ChatRequest(prompt="p", client_id="body")) == "body"
+    assert resolve_client(http_request({}), ChatRequest(prompt="p")) == DEFAULT_CLIENT
@@ -0,0 +1,35 @@
+import asyncio
+
+from supervisor import browser_supervisor
+
+
+def stub_connected(monkeypatch, automation, connected):
+    async def is_browser_connected():
+        return connected
+
+    monkeypatch.setattr(automation, "is_browser_connected", is_browser_connected)
+
+
+def test_without_a_supervisor_health_probes_the_browser(monkeypatch, automation, api):
+    assert not browser_supervisor.running
+    stub_connected(monkeypatch, automation, True)
+    health = asyncio.run(api("GET", "/health")).json()
+    assert (health["status"], health["chatgpt_accessible"], health["automation_ready"]) == ("healthy", True, True)
+
+    stub_connected(monkeypatch, automation, False)
+    health = asyncio.run(api("GET", "/health")).json()
+    assert (health["status"], health["chatgpt_accessible"]) == ("unhealthy", False)
+
+
+def test_a_running_supervisor_reports_its_last_check(monkeypatch, automation, api):
+    monkeypatch.setattr(type(browser_supervisor), "running", property(lambda self: True))
+    monkeypatch.setattr(browser_supervisor, "state", dict(browser_supervisor.state, status="degraded", browser_connected=True))
+    stub_connected(monkeypatch, automation, False)  # not consulted
+    health = asyncio.run(api("GET", "/health")).json()
+    assert (health["status"], health["chatgpt_accessible"]) == ("degraded", True)
+
+
+def test_not_ready_automation_is_unhealthy(monkeypatch, automation, api):
+    monkeypatch.setattr(automation, "is_logged_in", False)
+    health = asyncio.run(api("GET", "/health")).json()
+    assert (health["status"], health["chatgpt_accessible"]) == ("unhealthy", False)
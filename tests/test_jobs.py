@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from config import Config
+from jobs import JobDeferredError, JobRunner, JobStore, describe_job
+from models import ChatResponse
+from request_queue import QueueFullError
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def runner(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(Config, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(Config, "JOB_WORKERS", 1)
+    monkeypatch.setattr(Config, "SESSION_ID_PREFIX", "")
+    return JobRunner()
+
+
+async def wait_for_status(runner, job_id, status, timeout=5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await runner.get(job_id)
+        if job["status"] == status or asyncio.get_running_loop().time() > deadline:
+            return job
+        await asyncio.sleep(0.01)
+
+
+def test_claim_takes_the_oldest_queued_job(store):
+    first = store.create({"prompt": "one"})
+    store.create({"prompt": "two"})
+    claimed = store.claim("w0-")
+    assert claimed["job_id"] == first["job_id"]
+    assert (claimed["status"], claimed["owner"], claimed["attempts"]) == ("running", "w0-", 1)
+    assert store.claim("w0-")["request"] == {"prompt": "two"}
+    assert store.claim("w0-") is None
+
+
+def test_running_jobs_are_requeued_after_a_restart(store):
+    job = store.create({"prompt": "one"})
+    store.claim("w0-")
+    assert store.recover("w1-") == 0  # another process's jobs are left alone
+    assert store.recover("w0-") == 1
+    assert store.get(job["job_id"])["status"] == "queued"
+
+    again = store.claim("w0-")
+    assert (again["job_id"], again["attempts"]) == (job["job_id"], 2)
+
+
+def test_session_jobs_only_run_in_their_process(store):
+    store.create({"prompt": "session turn"}, affinity="w1-")
+    assert store.claim("w0-", "w0-") is None
+    assert store.claim("w1-", "w1-")["request"] == {"prompt": "session turn"}
+
+
+def test_deferred_claims_do_not_count_as_attempts(store):
+    job = store.create({"prompt": "one"})
+    store.claim("w0-")
+    store.defer(job["job_id"])
+    deferred = store.get(job["job_id"])
+    assert (deferred["status"], deferred["attempts"], deferred["started_at"]) == ("queued", 0, None)
+
+
+def test_finished_jobs_are_pruned(store):
+    job = store.create({"prompt": "one"}, webhook_url="http://hook")
+    store.claim("w0-")
+    store.finish(job["job_id"], True, "answer")
+    finished = describe_job(store.get(job["job_id"]))
+    assert (finished["status"], finished["success"], finished["response"]) == ("completed", True, "answer")
+    assert finished["webhook_status"] == "pending"
+    assert store.prune(older_than=0) == 0
+    assert store.prune(older_than=finished["finished_at"] + 1) == 1
+    assert store.get(job["job_id"]) is None
+
+
+def test_stopping_the_runner_requeues_the_running_job(runner):
+    async def scenario():
+        started = asyncio.Event()
+
+        async def interrupted(request):
+            started.set()
+            await asyncio.sleep(60)
+
+        async def completed(request):
+            return ChatResponse(response=f"{request['prompt']} done", success=True)
+
+        runner.start(interrupted)
+        job = await runner.submit({"prompt": "slow"})
+        await asyncio.wait_for(started.wait(), 5)
+        await runner.stop()
+
+        runner.start(completed)
+        finished = await wait_for_status(runner, job["job_id"], "completed")
+        await runner.stop()
+        assert (finished["response"], finished["attempts"]) == ("slow done", 2)
+
+    asyncio.run(scenario())
+
+
+def test_jobs_wait_while_the_automation_is_not_ready(runner):
+    async def scenario():
+        ready = asyncio.Event()
+        calls = []
+
+        async def handler(request):
+            calls.append(ready.is_set())
+            if not ready.is_set():
+                raise JobDeferredError("ChatGPT automation not ready")
+            return ChatResponse(response="answer", success=True)
+
+        runner.start(handler)
+        job = await runner.submit({"prompt": "question"})
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        assert (await runner.get(job["job_id"]))["status"] in ("queued", "running")
+
+        ready.set()
+        finished = await wait_for_status(runner, job["job_id"], "completed")
+        await runner.stop()
+        assert (finished["success"], finished["attempts"], runner.failed) == (True, 1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_jobs_turned_away_by_the_queue_do_not_count_attempts(runner):
+    async def scenario():
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            if len(calls) < 3:
+                raise QueueFullError(retry_after=0)
+            return ChatResponse(response="answer", success=True)
+
+        runner.start(handler)
+        job = await runner.submit({"prompt": "question"})
+        finished = await wait_for_status(runner, job["job_id"], "completed")
+        stats = await runner.stats()
+        await runner.stop()
+        assert (len(calls), finished["attempts"]) == (3, 1)
+        assert (stats["completed"], stats["by_status"]) == (1, {"completed": 1})
+
+    asyncio.run(scenario())
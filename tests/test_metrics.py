@@ -0,0 +1,68 @@
+from metrics import Registry, format_labels, format_value, merge_expositions
+
+
+def test_values_and_labels_are_formatted_for_prometheus():
+    assert format_value(3.0) == "3"
+    assert format_value(0.25) == "0.25"
+    assert format_value(float("inf")) == "+Inf"
+    assert format_labels(("path",), ('a"b\\c\nd',)) == '{path="a\\"b\\\\c\\nd"}'
+    assert format_labels((), ()) == ""
+
+
+def test_counters_render_with_headers_and_unlabelled_zero():
+    registry = Registry()
+    retries = registry.counter("retries_total", "Retries", ["reason"])
+    registry.counter("timeouts_total", "Timeouts")
+    retries.labels("send_button").inc()
+    retries.labels("send_button").inc(2)
+    assert registry.render() == (
+        "# HELP retries_total Retries\n"
+        "# TYPE retries_total counter\n"
+        'retries_total{reason="send_button"} 3\n'
+        "# HELP timeouts_total Timeouts\n"
+        "# TYPE timeouts_total counter\n"
+        "timeouts_total 0\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ["phase"], buckets=(1, 0.1))
+    for value in (0.05, 0.1, 0.5, 7):
+        latency.labels("submit").observe(value)
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{phase="submit",le="0.1"} 2',
+        'latency_seconds_bucket{phase="submit",le="1"} 3',
+        'latency_seconds_bucket{phase="submit",le="+Inf"} 4',
+        'latency_seconds_sum{phase="submit"} 7.65',
+        'latency_seconds_count{phase="submit"} 4',
+    ]
+
+
+def test_gauges_read_functions_at_scrape_time():
+    registry = Registry()
+    depth = registry.gauge("queue_depth", "Depth")
+    broken = registry.gauge("broken", "Raises")
+    waiting = []
+    depth.set_function(lambda: len(waiting))
+    broken.set_function(lambda: 1 / 0)
+    waiting.extend(["a", "b"])
+    lines = registry.render().splitlines()
+    assert "queue_depth 2" in lines
+    assert not any(line.startswith("broken ") for line in lines)
+
+
+def test_merged_expositions_keep_one_header_per_family():
+    worker = "# HELP up Up\n# TYPE up gauge\nup 1\n# HELP hits_total Hits\n# TYPE hits_total counter\nhits_total{kind=\"a\"} 2\n"
+    merged = merge_expositions({"0": worker, "1": worker}, "worker").splitlines()
+    assert merged.count("# TYPE up gauge") == 1
+    assert merged == [
+        "# HELP up Up",
+        "# TYPE up gauge",
+        'up{worker="0"} 1',
+        'up{worker="1"} 1',
+        "# HELP hits_total Hits",
+        "# TYPE hits_total counter",
+        'hits_total{worker="0",kind="a"} 2',
+        'hits_total{worker="1",kind="a"} 2',
+    ]
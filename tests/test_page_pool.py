@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from page_pool import PagePool
+
+
+class FakePage:
+    main_frame = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def on(self, event, handler):
+        pass
+
+
+def pool_of(size: int) -> PagePool:
+    pool = PagePool()
+    for index in range(size):
+        pool.add(FakePage(f"page-{index}"))
+    return pool
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_idle_workers_are_leased_and_released():
+    async def scenario():
+        pool = pool_of(2)
+        first = await pool.acquire()
+        second = await pool.acquire()
+        assert {first.index, second.index} == {0, 1}
+        assert (pool.busy_count, pool.stats()["idle"]) == (2, 0)
+
+        pool.release(first)
+        assert (first.busy, first.requests_served, pool.busy_count) == (False, 1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_waiters_are_served_in_arrival_order():
+    async def scenario():
+        pool = pool_of(1)
+        holder = await pool.acquire()
+        served = []
+
+        async def wait(name):
+            worker = await pool.acquire()
+            served.append(name)
+            await asyncio.sleep(0)
+            pool.release(worker)
+
+        tasks = [asyncio.ensure_future(wait(name)) for name in ("first", "second", "third")]
+        await settle()
+        assert pool.waiting == 3
+
+        pool.release(holder)
+        await asyncio.gather(*tasks)
+        assert (served, pool.waiting, pool.busy_count) == (["first", "second", "third"], 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_for_a_busy_preferred_page_does_not_block_others():
+    async def scenario():
+        pool = pool_of(2)
+        pinned = await pool.acquire()
+        other = await pool.acquire()
+
+        session_turn = asyncio.ensure_future(pool.acquire(preferred=pinned))
+        stateless = asyncio.ensure_future(pool.acquire())
+        await settle()
+
+        pool.release(other)  # not the preferred page: goes to the later stateless waiter
+        await settle()
+        assert stateless.done() and stateless.result() is other
+        assert not session_turn.done()
+
+        pool.release(pinned)
+        assert await session_turn is pinned
+
+    asyncio.run(scenario())
+
+
+def test_unbound_pages_are_leased_before_session_pages():
+    async def scenario():
+        pool = pool_of(2)
+        pool.workers[0].session_id = "conversation"
+        worker = await pool.acquire()
+        assert worker is pool.workers[1]
+
+    asyncio.run(scenario())
+
+
+def test_preferred_page_gone_after_a_restart_falls_back_to_any_page():
+    async def scenario():
+        pool = pool_of(1)
+        stale = pool.workers[0]
+        pool.clear()
+        pool.add(FakePage("restarted"))
+        worker = await pool.acquire(preferred=stale)
+        assert worker is not stale and worker.page.name == "restarted"
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    async def scenario():
+        pool = pool_of(1)
+        holder = await pool.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.acquire(timeout=0.01)
+        assert pool.waiting == 0
+
+        pool.release(holder)
+        assert pool.busy_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_a_page():
+    async def scenario():
+        pool = pool_of(1)
+        holder = await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await settle()
+
+        # The page is handed over and the waiter cancelled before it resumes
+        pool.release(holder)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert (pool.waiting, pool.busy_count) == (0, 0)
+        assert holder.requests_served == 1  # the handed-over lease is returned unserved
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_inside_wait_for_leaves_the_queue():
+    async def scenario():
+        pool = pool_of(1)
+        holder = await pool.acquire()
+        waiter = asyncio.ensure_future(asyncio.wait_for(pool.acquire(), 5))
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert pool.waiting == 0
+
+        pool.release(holder)
+        assert pool.busy_count == 0
+
+    asyncio.run(scenario())
+
+
+def test_pages_added_during_a_restart_serve_waiting_requests():
+    async def scenario():
+        pool = pool_of(1)
+        await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await settle()
+
+        pool.clear()
+        assert (pool.size, pool.waiting) == (0, 1)
+        pool.add(FakePage("restarted"))
+        worker = await waiter
+        assert (worker.index, worker.page.name, pool.busy_count) == (0, "restarted", 1)
+
+    asyncio.run(scenario())
+
+
+def test_lease_releases_on_error():
+    async def scenario():
+        pool = pool_of(1)
+        with pytest.raises(RuntimeError):
+            async with pool.lease() as worker:
+                raise RuntimeError("page crashed")
+        assert (worker.busy, pool.busy_count) == (False, 0)
+
+    asyncio.run(scenario())
@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from config import Config
+from prompt_pipeline import chunk_messages, estimate_tokens, plan_prompt, prompt_digest, split_text
+
+CODE = "def handler(event):\n    if event:\n        return event['body']\n\n    return None\n\n"
+
+
+@pytest.fixture(autouse=True)
+def pipeline_config(monkeypatch):
+    monkeypatch.setattr(Config, "PROMPT_DIRECT_MAX_TOKENS", 100)
+    monkeypatch.setattr(Config, "PROMPT_CHUNK_TOKENS", 300)
+    monkeypatch.setattr(Config, "LONG_PROMPT_STRATEGY", "upload")
+
+
+def message_body(message: str) -> str:
+    """The prompt text inside one ``[Part k/N]`` message"""
+    body = message.split("\n\n", 1)[1]
+    return re.sub(r"\n\n\[End of message\. [^\]]*\]$", "", body)
+
+
+def test_token_estimate():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("héllo") == 2  # one token per non-ASCII character
+
+
+def test_digest_ignores_whitespace_rewrites():
+    assert prompt_digest("line one\n\nline  two ") == prompt_digest("line one line two")
+    assert prompt_digest("line one") != prompt_digest("line two")
+
+
+@pytest.mark.parametrize("max_chars", [7, 40, 120])
+def test_split_is_lossless_and_bounded(max_chars):
+    text = CODE * 20
+    pieces = split_text(text, max_chars)
+    assert "".join(pieces) == text
+    assert all(0 < len(piece) <= max_chars for piece in pieces)
+
+
+def test_split_prefers_paragraph_boundaries():
+    text = "a" * 60 + "\n\n" + "b" * 30 + "\n" + "c" * 30
+    assert split_text(text, 100) == ["a" * 60 + "\n\n", "b" * 30 + "\n" + "c" * 30]
+
+
+def test_split_cuts_unbroken_text_at_the_limit():
+    assert split_text("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_chunk_messages_reassemble_to_the_prompt():
+    prompt = CODE * 200
+    messages = chunk_messages(prompt, estimate_tokens(prompt))
+    total = len(messages)
+    assert total > 2
+    for index, message in enumerate(messages, start=1):
+        assert message.startswith(f"[Part {index}/{total}]")
+    assert 'reply only with "OK"' in messages[0]
+    assert messages[-1].rstrip().endswith("respond to it now.]")
+    assert "".join(message_body(message) for message in messages) == prompt
+
+
+def test_plan_picks_the_delivery_by_size(monkeypatch):
+    assert plan_prompt("short question").strategy == "direct"
+
+    long_prompt = CODE * 200
+    upload = plan_prompt(long_prompt)
+    assert (upload.strategy, upload.parts) == ("upload", [long_prompt])
+    assert upload.attachment_name == f"prompt-{prompt_digest(long_prompt)[:8]}.txt"
+    assert upload.attachment_name in upload.instruction
+
+    chunks = plan_prompt(long_prompt, strategy="chunks")
+    assert chunks.strategy == "chunks" and len(chunks.parts) > 1
+
+    monkeypatch.setattr(Config, "LONG_PROMPT_STRATEGY", "chunks")
+    assert plan_prompt(long_prompt).strategy == "chunks"
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from config import Config
+from request_queue import RequestQueue, QueueFullError, QueueTimeoutError
+
+
+@pytest.fixture(autouse=True)
+def queue_config(monkeypatch):
+    monkeypatch.setattr(Config, "PRIORITY_WEIGHTS", {"interactive": 8, "batch": 1})
+    monkeypatch.setattr(Config, "CLIENT_MAX_CONCURRENCY", None)
+    monkeypatch.setattr(Config, "CLIENT_CONCURRENCY_LIMITS", {})
+    monkeypatch.setattr(Config, "RESERVED_INTERACTIVE_SLOTS", 0)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def queue_up(queue, admitted, requests):
+    """Start one waiting acquire per (name, client, priority); ``admitted`` records the admission order"""
+    async def wait(name, client, priority):
+        await queue.acquire(client=client, priority=priority)
+        admitted.append(name)
+
+    return [asyncio.ensure_future(wait(*request)) for request in requests]
+
+
+async def serve_in_turn(queue, admitted, requests, holder):
+    """Release the holder's slot, then each admitted request's slot in turn, one at a time"""
+    clients = {name: client for name, client, _ in requests}
+    queue.release(holder)
+    await settle()
+    while len(admitted) < len(requests):
+        queue.release(clients[admitted[-1]])
+        await settle()
+
+
+def test_admits_up_to_concurrency_then_queues():
+    async def scenario():
+        queue = RequestQueue(concurrency=2, max_depth=4)
+        await queue.acquire(client="a")
+        await queue.acquire(client="b")
+        admitted = []
+        tasks = queue_up(queue, admitted, [("c", "c", "interactive")])
+        await settle()
+        assert (queue.running, queue.depth, admitted) == (2, 1, [])
+
+        queue.release("a")
+        await asyncio.gather(*tasks)
+        assert (queue.running, queue.depth, admitted) == (2, 0, ["c"])
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def scenario():
+        queue = RequestQueue(concurrency=1, max_depth=1)
+        await queue.acquire()
+        tasks = queue_up(queue, [], [("waiting", "a", "interactive")])
+        await settle()
+        with pytest.raises(QueueFullError) as error:
+            await queue.acquire()
+        assert error.value.retry_after >= 1
+        assert queue.rejected == 1
+        queue.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_interactive_is_admitted_ahead_of_queued_batch():
+    async def scenario():
+        queue = RequestQueue(concurrency=1, max_depth=10)
+        await queue.acquire(client="holder")
+        admitted = []
+        requests = [
+            ("batch-1", "bulk", "batch"),
+            ("batch-2", "bulk", "batch"),
+            ("interactive", "user", "interactive"),
+        ]
+        tasks = queue_up(queue, admitted, requests)
+        await settle()
+        await serve_in_turn(queue, admitted, requests, "holder")
+        await asyncio.gather(*tasks)
+        assert admitted == ["interactive", "batch-1", "batch-2"]
+
+    asyncio.run(scenario())
+
+
+def test_clients_of_one_priority_are_interleaved():
+    async def scenario():
+        queue = RequestQueue(concurrency=1, max_depth=10)
+        await queue.acquire(client="holder")
+        admitted = []
+        requests = [
+            ("a-1", "a", "interactive"),
+            ("a-2", "a", "interactive"),
+            ("a-3", "a", "interactive"),
+            ("b-1", "b", "interactive"),
+        ]
+        tasks = queue_up(queue, admitted, requests)
+        await settle()
+        await serve_in_turn(queue, admitted, requests, "holder")
+        await asyncio.gather(*tasks)
+        assert admitted == ["a-1", "b-1", "a-2", "a-3"]
+
+    asyncio.run(scenario())
+
+
+def test_client_cap_skips_capped_client(monkeypatch):
+    monkeypatch.setattr(Config, "CLIENT_MAX_CONCURRENCY", 1)
+
+    async def scenario():
+        queue = RequestQueue(concurrency=3, max_depth=10)
+        await queue.acquire(client="a")
+        admitted = []
+        tasks = queue_up(queue, admitted, [("a-2", "a", "interactive"), ("b-1", "b", "interactive")])
+        await settle()
+        assert admitted == ["b-1"]
+        assert queue.stats()["running_by_client"] == {"a": 1, "b": 1}
+
+        queue.release("a")
+        await asyncio.gather(*tasks)
+        assert admitted == ["b-1", "a-2"]
+
+    asyncio.run(scenario())
+
+
+def test_per_client_limit_overrides_default(monkeypatch):
+    monkeypatch.setattr(Config, "CLIENT_CONCURRENCY_LIMITS", {"nightly": 1})
+
+    async def scenario():
+        queue = RequestQueue(concurrency=3, max_depth=10)
+        assert queue.client_cap("nightly") == 1
+        assert queue.client_cap("other") == 3
+        await queue.acquire(client="nightly")
+        with pytest.raises(QueueTimeoutError):
+            await queue.acquire(timeout=0.05, client="nightly")
+        await queue.acquire(timeout=0.05, client="other")
+        assert queue.running == 2
+
+    asyncio.run(scenario())
+
+
+def test_reserved_slots_are_kept_for_interactive(monkeypatch):
+    monkeypatch.setattr(Config, "RESERVED_INTERACTIVE_SLOTS", 1)
+
+    async def scenario():
+        queue = RequestQueue(concurrency=2, max_depth=10)
+        await queue.acquire(client="bulk", priority="batch")
+        with pytest.raises(QueueTimeoutError):
+            await queue.acquire(timeout=0.05, client="bulk", priority="batch")
+        await queue.acquire(timeout=0.05, client="user", priority="interactive")
+        assert queue.running == 2
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    async def scenario():
+        queue = RequestQueue(concurrency=1, max_depth=10)
+        await queue.acquire()
+        with pytest.raises(QueueTimeoutError):
+            await queue.acquire(timeout=0.05)
+        assert (queue.depth, queue.expired, queue.running) == (0, 1, 1)
+
+        queue.release()
+        await queue.acquire(timeout=0.05)
+        assert queue.running == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import response_cache as cache_module
+from config import Config
+from response_cache import ResponseCache, cache_key, normalize_prompt
+
+
+class Clock:
+    """Stand-in for the ``time`` module with a settable clock"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_ENABLED", True)
+    caches = []
+
+    def make(**settings):
+        settings.setdefault("disk_path", "")
+        cache = ResponseCache(**settings)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def test_equivalent_prompts_share_a_key():
+    assert normalize_prompt("  Hello\n\n  world\t") == "Hello world"
+    assert cache_key("Hello   world") == cache_key(" Hello\nworld ")
+    assert cache_key("Hello world") != cache_key("Hello world", format="markdown")
+
+
+def test_entries_expire_after_ttl(clock, make_cache):
+    async def scenario():
+        cache = make_cache(ttl_seconds=10)
+        await cache.put("k", "answer")
+        clock.now += 9
+        assert await cache.get("k") == "answer"
+        clock.now += 2
+        assert await cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_entry_is_evicted(clock, make_cache):
+    async def scenario():
+        cache = make_cache(max_entries=2, ttl_seconds=60)
+        await cache.put("a", "1")
+        await cache.put("b", "2")
+        assert await cache.get("a") == "1"  # "b" is now the least recently used
+        await cache.put("c", "3")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1"
+        assert await cache.get("c") == "3"
+        assert cache.evictions == 1
+
+    asyncio.run(scenario())
+
+
+def test_disk_entries_survive_a_restart_until_they_expire(clock, make_cache, tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def scenario():
+        first = make_cache(ttl_seconds=10, disk_path=path)
+        await first.put("k", "answer")
+        first.close()
+
+        second = make_cache(ttl_seconds=10, disk_path=path)
+        assert await second.get("k") == "answer"
+        assert second.disk_hits == 1
+
+        third = make_cache(ttl_seconds=10, disk_path=path)
+        clock.now += 11
+        assert await third.get("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_truncated_answers_are_not_cached(monkeypatch, make_cache):
+    import main
+    from models import ChatRequest
+
+    cache = make_cache(ttl_seconds=60)
+    monkeypatch.setattr(main, "response_cache", cache)
+    monkeypatch.setattr(Config, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(main.chatgpt_automation, "is_initialized", True)
+    monkeypatch.setattr(main.chatgpt_automation, "is_logged_in", True)
+    answers = [("half an ans", False), ("a full answer", True)]
+
+    async def get_chat_response(**request):
+        return answers.pop(0)
+
+    monkeypatch.setattr(main.chatgpt_automation, "get_chat_response", get_chat_response)
+
+    async def scenario():
+        partial = await main.process_chat_request(ChatRequest(prompt="question"))
+        assert (partial.success, partial.response) == (False, "half an ans")
+        assert await cache.get(main.request_cache_key(ChatRequest(prompt="question"))) is None
+
+        complete = await main.process_chat_request(ChatRequest(prompt="question"))
+        assert complete.success and not complete.cached
+        cached = await main.process_chat_request(ChatRequest(prompt="question"))
+        assert cached.cached and cached.response == "a full answer"
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from chatgpt_automation import ChatGPTAutomation
+from models import ChatRequest
+from response_extractor import EXTRACT_SCRIPT, OUTPUT_FORMATS, STOP_BUTTON_SELECTOR, extract_response
+from selector_registry import ASSISTANT_MESSAGE_SELECTOR, LOGIN_PROMPT_SELECTOR
+
+
+class FakePage:
+    """Answers the extraction script with canned results, recording each call's arguments"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append((script, arg))
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def extracted(text="Hello", content=None, complete=True, login=False):
+    content = text if content is None else content
+    return {"count": 1, "text": text, "content": content, "length": len(content), "complete": complete, "loginPromptPresent": login}
+
+
+def test_formats_match_the_api():
+    assert OUTPUT_FORMATS == ChatRequest.model_fields["format"].annotation.__args__
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_every_format_is_one_evaluate_call(output_format):
+    page = FakePage(extracted())
+    asyncio.run(extract_response(page, 2, output_format))
+    assert page.calls == [(
+        EXTRACT_SCRIPT,
+        [ASSISTANT_MESSAGE_SELECTOR, STOP_BUTTON_SELECTOR, LOGIN_PROMPT_SELECTOR, 2, output_format]
+    )]
+
+
+def test_unknown_formats_are_rejected_before_the_page_is_touched():
+    page = FakePage(extracted())
+    with pytest.raises(ValueError, match="Unknown output format 'pdf'"):
+        asyncio.run(extract_response(page, 0, "pdf"))
+    assert page.calls == []
+
+
+def test_format_response_returns_the_serialized_content():
+    automation = ChatGPTAutomation()
+    markdown = extracted(text="Use print", content="Use `print`")
+    assert asyncio.run(automation.format_response(FakePage(markdown), 0, "markdown")) == "Use `print`"
+    # Empty content or a failed script means the caller keeps the plain text
+    assert asyncio.run(automation.format_response(FakePage(extracted(content="")), 0, "html")) is None
+    assert asyncio.run(automation.format_response(FakePage(RuntimeError("page closed")), 0, "html")) is None
+
+
+def test_polling_waits_for_completion_and_prefers_the_formatted_content(monkeypatch):
+    async def no_wait(seconds):
+        pass
+
+    monkeypatch.setattr("chatgpt_automation.asyncio.sleep", no_wait)
+    automation = ChatGPTAutomation()
+    page = FakePage(
+        extracted(text="", complete=False),
+        extracted(text="Use pri", content="Use `pri", complete=False),
+        extracted(text="Use print", content="Use `print`"),
+    )
+    assert asyncio.run(automation.poll_for_response(page, 0, 5, "markdown")) == ("Use `print`", True)
+    assert len(page.calls) == 3
+
+    text_only = FakePage(extracted(text="Use print", content=""))
+    assert asyncio.run(automation.poll_for_response(text_only, 0, 5, "markdown")) == ("Use print", True)
+
+
+def test_polling_stops_at_a_login_prompt():
+    automation = ChatGPTAutomation()
+    page = FakePage(extracted(text="", complete=False, login=True))
+    assert asyncio.run(automation.poll_for_response(page, 0, 5)) == (None, False)
+    assert automation.last_block["reason"] == "login"
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from config import Config
+from router import WorkerProcess, app, worker_router
+
+
+@pytest.fixture(autouse=True)
+def cooldowns(monkeypatch):
+    monkeypatch.setattr(Config, "LOGIN_WALL_COOLDOWN", 600)
+    monkeypatch.setattr(Config, "RATE_LIMIT_COOLDOWN", 60)
+
+
+def worker(index, handler=None, weight=1.0, in_flight=0, ready=True):
+    """A WorkerProcess whose HTTP client answers with ``handler`` instead of a unix socket"""
+    backend = type("FakeBackend", (), {"name": f"backend-{index}", "weight": weight, "describe": lambda self: {}})()
+    process = WorkerProcess(index, backend)
+    process.client = httpx.AsyncClient(transport=httpx.MockTransport(handler or answer(index)), base_url="http://worker")
+    process.in_flight, process.ready = in_flight, ready
+    return process
+
+
+def answer(index, status=200, headers=None):
+    """Reply with a streamed JSON body, as a worker's unix socket would"""
+    def handler(request):
+        async def body():
+            yield json.dumps({"worker": index, "path": request.url.path}).encode()
+        return httpx.Response(status, headers=headers, content=body())
+    return handler
+
+
+def route(monkeypatch, workers, method, path, **kwargs):
+    monkeypatch.setattr(worker_router, "workers", workers)
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://router") as client:
+            return await client.request(method, path, **kwargs)
+
+    return asyncio.run(send())
+
+
+def test_requests_go_to_the_least_loaded_worker_per_weight(monkeypatch):
+    workers = [worker(0, in_flight=1), worker(1, weight=3, in_flight=1), worker(2)]
+    monkeypatch.setattr(worker_router, "workers", workers)
+    # loads with the new request: 2/1, 2/3, 1/1
+    assert [candidate.index for candidate in worker_router.candidates()] == [1, 2, 0]
+
+
+def test_unready_and_cooling_down_workers_go_last(monkeypatch):
+    workers = [worker(0), worker(1, ready=False), worker(2, in_flight=5)]
+    workers[0].start_cooldown("rate_limit")
+    monkeypatch.setattr(worker_router, "workers", workers)
+    assert [candidate.index for candidate in worker_router.candidates()] == [2, 1, 0]
+
+
+def test_cooldown_length_depends_on_the_block_and_ignores_repeats():
+    process = worker(0)
+    process.start_cooldown("login", at=1000)
+    assert (process.cooldown_until, process.cooldown_reason, process.cooldowns) == (1600, "login", 1)
+    process.start_cooldown("rate_limit", at=1000)  # the same block reported again
+    assert process.cooldowns == 1
+    process.start_cooldown("rate_limit", at=1100)
+    assert (process.cooldown_until, process.cooldown_reason, process.cooldowns) == (1600, "rate_limit", 2)
+    assert not process.cooling_down
+
+
+def test_health_poll_starts_a_cooldown_from_last_block():
+    def health(request):
+        return httpx.Response(200, json={"automation_ready": True, "last_block": {"reason": "login", "at": time.time()}})
+
+    process = worker(0, health, ready=False)
+    asyncio.run(process.poll())
+    assert process.ready and process.cooling_down and process.cooldown_reason == "login"
+
+
+def test_unreachable_worker_is_not_ready():
+    def refuse(request):
+        raise httpx.ConnectError("no socket", request=request)
+
+    process = worker(0, refuse)
+    asyncio.run(process.poll())
+    assert not process.ready and process.health["status"] == "unreachable"
+
+
+def test_busy_worker_is_skipped_for_the_next_one(monkeypatch):
+    workers = [worker(0, answer(0, 429, {"retry-after": "1"})), worker(1)]
+    response = route(monkeypatch, workers, "POST", "/chat", json={"prompt": "hi"})
+    assert (response.status_code, response.json()["worker"]) == (200, 1)
+    assert [(w.in_flight, w.failures, w.requests_served) for w in workers] == [(0, 1, 0), (0, 0, 1)]
+
+
+def test_blocked_worker_is_cooled_down_and_skipped(monkeypatch):
+    workers = [worker(0, answer(0, 200, {"x-backend-blocked": "rate_limit"})), worker(1)]
+    response = route(monkeypatch, workers, "POST", "/chat", json={"prompt": "hi"})
+    assert response.json()["worker"] == 1
+    assert workers[0].cooling_down and workers[0].cooldown_reason == "rate_limit"
+
+
+def test_last_worker_answer_is_relayed_even_when_busy(monkeypatch):
+    workers = [worker(0, answer(0, 429)), worker(1, answer(1, 429))]
+    response = route(monkeypatch, workers, "POST", "/chat", json={"prompt": "hi"})
+    assert (response.status_code, response.json()["worker"]) == (429, 1)
+    assert [w.in_flight for w in workers] == [0, 0]
+
+
+def test_session_requests_stay_on_their_worker(monkeypatch):
+    workers = [worker(0, answer(0, 429)), worker(1, answer(1, 429))]
+    response = route(monkeypatch, workers, "POST", "/chat", json={"prompt": "hi", "session_id": "w0-abc"})
+    assert (response.status_code, response.json()["worker"]) == (429, 0)  # never retried elsewhere
+
+    assert route(monkeypatch, workers, "GET", "/sessions/w1-abc").json()["worker"] == 1
+    assert route(monkeypatch, workers, "GET", "/sessions/w7-abc").status_code == 404
+    assert route(monkeypatch, workers, "GET", "/sessions/abc").status_code == 404
+
+
+def test_metrics_of_every_reachable_worker_are_merged(monkeypatch):
+    def exposition(index):
+        def handler(request):
+            if index == 2:
+                raise httpx.ConnectError("down", request=request)
+            return httpx.Response(200, text="# HELP up Up\n# TYPE up gauge\nup 1\n")
+        return handler
+
+    lines = route(monkeypatch, [worker(i, exposition(i)) for i in range(3)], "GET", "/metrics").text.splitlines()
+    assert lines == ["# HELP up Up", "# TYPE up gauge", 'up{worker="0"} 1', 'up{worker="1"} 1']
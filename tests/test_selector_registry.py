@@ -0,0 +1,55 @@
+import asyncio
+
+from selector_registry import (
+    ATTACHMENT_COUNT_SCRIPT, ATTACHMENT_READY_SCRIPT, SelectorRegistry, format_controls, is_rate_limit_message
+)
+
+
+class FakeUploadPage:
+    """The composer already shows ``mentions`` chips with the file's name; records each call"""
+
+    def __init__(self, mentions):
+        self.mentions = mentions
+        self.calls = []
+
+    async def query_selector(self, selector):
+        return self
+
+    async def evaluate(self, script, arg=None):
+        self.calls.append(("evaluate", script, arg))
+        return self.mentions
+
+    async def set_input_files(self, files):
+        self.calls.append(("upload", files["name"]))
+
+    async def wait_for_function(self, script, arg=None, timeout=None):
+        self.calls.append(("wait", script, arg))
+
+
+def test_controls_are_summarised_on_one_line():
+    controls = {
+        "textareas": [{"placeholder": "Ask anything", "role": None, "data-id": None, "name": "prompt-textarea"}],
+        "contenteditable": [{"class": "ProseMirror", "id": "prompt-textarea"}],
+        "buttons": [{"aria-label": "Send prompt", "title": None, "data-testid": "send-button", "text": ""}],
+    }
+    assert format_controls(controls) == (
+        'textarea(placeholder="Ask anything", name="prompt-textarea") '
+        'div[contenteditable](class="ProseMirror", id="prompt-textarea") '
+        'button(aria-label="Send prompt", data-testid="send-button")'
+    )
+    assert format_controls({"textareas": [], "contenteditable": [], "buttons": []}) == "none"
+
+
+def test_rate_limit_notices_are_recognised():
+    assert is_rate_limit_message("You've reached our limit of messages per hour. Please try again later.")
+    assert not is_rate_limit_message("Here is a limit of a function as x approaches 0: ...")
+
+
+def test_attachment_readiness_counts_chips_from_before_the_upload():
+    page = FakeUploadPage(mentions=1)  # the same prompt was uploaded earlier in this session
+    assert asyncio.run(SelectorRegistry().attach_file(page, "prompt-abcd.txt", b"text", timeout=5))
+    assert page.calls == [
+        ("evaluate", ATTACHMENT_COUNT_SCRIPT, "prompt-abcd.txt"),
+        ("upload", "prompt-abcd.txt"),
+        ("wait", ATTACHMENT_READY_SCRIPT, ["prompt-abcd.txt", 1]),
+    ]
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from chatgpt_automation import ChatGPTAutomation
+from config import Config
+from page_pool import PageWorker
+from sessions import SessionManager, SessionNotFoundError, session_manager
+
+
+class FakePage:
+    """Records navigations; ``url`` follows goto() like a real page"""
+
+    main_frame = None
+
+    def __init__(self, url="https://chatgpt.com/"):
+        self.url = url
+        self.visited = []
+
+    def on(self, event, handler):
+        pass
+
+    async def goto(self, url, wait_until=None):
+        self.visited.append(url)
+        self.url = url
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        return True
+
+
+@pytest.fixture(autouse=True)
+def session_config(monkeypatch):
+    monkeypatch.setattr(Config, "SESSION_IDLE_TIMEOUT", 60)
+    monkeypatch.setattr(Config, "SESSION_ID_PREFIX", "")
+    monkeypatch.setattr(Config, "CHATGPT_URL", "https://chatgpt.com/")
+    monkeypatch.setattr(Config, "MAX_TURNS_PER_CHAT", 20)
+    monkeypatch.setattr(Config, "MAX_DOM_NODES", 10000)
+
+
+def workers(count):
+    return [PageWorker(index, FakePage()) for index in range(count)]
+
+
+def test_sessions_are_spread_over_the_pages():
+    manager = SessionManager()
+    pages = workers(2)
+    first, second, third = (manager.create(pages) for _ in range(3))
+    assert (first.worker, second.worker, third.worker) == (pages[0], pages[1], pages[0])
+    assert manager.get(second.session_id) is second
+
+
+def test_unknown_and_deleted_sessions_are_not_found():
+    manager = SessionManager()
+    session = manager.create(workers(1))
+    manager.delete(session.session_id)
+    with pytest.raises(SessionNotFoundError):
+        manager.get(session.session_id)
+    with pytest.raises(SessionNotFoundError) as error:
+        manager.delete(session.session_id)
+    assert str(error.value) == f"Session '{session.session_id}' not found"
+
+
+def test_idle_sessions_expire_unless_a_turn_is_running():
+    async def scenario():
+        manager = SessionManager()
+        idle, busy, fresh = (manager.create(workers(1)) for _ in range(3))
+        idle.last_used = busy.last_used = 0
+        async with busy.lock:
+            manager.expire_idle()
+        assert set(manager.sessions) == {busy.session_id, fresh.session_id}
+
+    asyncio.run(scenario())
+
+
+def test_a_page_already_showing_the_conversation_is_reused():
+    async def scenario():
+        automation = ChatGPTAutomation()
+        worker = workers(1)[0]
+        session = SessionManager().create([worker])
+        assert await automation.prepare_conversation(worker, session)
+        assert worker.page.visited == [Config.CHATGPT_URL]  # first turn starts a new chat
+
+        worker.page.url = "https://chatgpt.com/c/abc"
+        automation.record_turn(worker, session)
+        assert (session.conversation_url, worker.session_id) == ("https://chatgpt.com/c/abc", session.session_id)
+        assert await automation.prepare_conversation(worker, session)
+        assert worker.page.visited == [Config.CHATGPT_URL]
+
+    asyncio.run(scenario())
+
+
+def test_a_page_showing_something_else_opens_the_conversation():
+    async def scenario():
+        automation = ChatGPTAutomation()
+        worker = workers(1)[0]
+        session = SessionManager().create([worker])
+        session.conversation_url, session.turns = "https://chatgpt.com/c/abc", 3
+        worker.session_id = "another-session"
+
+        assert await automation.prepare_conversation(worker, session)
+        assert worker.page.visited == ["https://chatgpt.com/c/abc"]
+        assert (worker.session_id, worker.turns) == (session.session_id, 3)
+
+    asyncio.run(scenario())
+
+
+def test_stateless_prompts_leave_a_session_conversation():
+    async def scenario():
+        automation = ChatGPTAutomation()
+        worker = workers(1)[0]
+        assert await automation.prepare_conversation(worker)
+        assert worker.page.visited == []  # scratch chat is reused
+
+        worker.session_id, worker.turns = "some-session", 4
+        assert await automation.prepare_conversation(worker)
+        assert worker.page.visited == [Config.CHATGPT_URL]
+        assert (worker.session_id, worker.turns) == (None, 0)
+
+    asyncio.run(scenario())
+
+
+def test_long_scratch_chats_are_recycled():
+    async def scenario():
+        automation = ChatGPTAutomation()
+        worker = workers(1)[0]
+        worker.turns = Config.MAX_TURNS_PER_CHAT
+        assert await automation.prepare_conversation(worker)
+        assert worker.page.visited == [Config.CHATGPT_URL]
+
+    asyncio.run(scenario())
+
+
+def test_unknown_session_is_a_404(monkeypatch, automation, api):
+    monkeypatch.setattr(session_manager, "sessions", {})
+    assert asyncio.run(api("GET", "/sessions/missing")).status_code == 404
+    assert asyncio.run(api("DELETE", "/sessions/missing")).status_code == 404
+    response = asyncio.run(api("POST", "/chat", json={"prompt": "hi", "session_id": "missing"}))
+    assert (response.status_code, response.json()["detail"]) == (404, "Session 'missing' not found")
@@ -0,0 +1,71 @@
+import asyncio
+
+from main import flight_key
+from models import ChatRequest
+from singleflight import SingleFlight
+
+
+def test_identical_calls_share_one_execution():
+    async def scenario():
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(3)))
+        assert (results, len(calls)) == (["answer"] * 3, 1)
+        assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 2}
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_the_leaders_caller_does_not_cancel_followers():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        assert leader.cancelled() and not follower.done()
+
+        release.set()
+        assert await follower == "answer"
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0)
+            raise RuntimeError("page crashed")
+
+        results = await asyncio.gather(flights.do("key", work), flights.do("key", work), return_exceptions=True)
+        assert [str(result) for result in results] == ["page crashed", "page crashed"]
+
+    asyncio.run(scenario())
+
+
+def test_flights_are_split_by_client_and_priority():
+    def key(**fields):
+        return flight_key(ChatRequest(prompt="same prompt", client_id="a", **fields))
+
+    assert key() == flight_key(ChatRequest(prompt="same  prompt", client_id="a"))
+    assert key() != flight_key(ChatRequest(prompt="same prompt", client_id="b"))
+    assert key() != key(priority="batch")
+    assert key() != key(queue_timeout=5)
+    assert key() != key(max_retries=1)
+    assert key() != key(format="markdown")
@@ -0,0 +1,116 @@
+import asyncio
+import os
+
+import pytest
+
+from config import Config
+from tracing import Trace, Tracer, current_span, span, traced
+
+
+@pytest.fixture(autouse=True)
+def trace_config(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "TRACE_ENABLED", False)
+    monkeypatch.setattr(Config, "TRACE_DIR", str(tmp_path / "traces"))
+    monkeypatch.setattr(Config, "TRACE_RETENTION", 2)
+    monkeypatch.setattr(Config, "TRACE_FORMAT", "chrome")
+
+
+def test_only_requested_traces_are_started():
+    async def start(headers):
+        return Tracer().start("chat", headers)
+
+    assert asyncio.run(start({})) is None
+    assert asyncio.run(start({"X-Trace": "1"})) is not None
+
+
+def test_spans_nest_through_the_context():
+    @traced()
+    async def submit():
+        with span("click", selector="send") as click:
+            await asyncio.sleep(0)
+        return click
+
+    async def scenario():
+        trace = Tracer().start("chat", {"X-Trace": "yes"}, client="a")
+        with span("queue_wait"):
+            pass
+        # Concurrent children each see their own parent through the task's copied context
+        clicks = await asyncio.gather(submit(), submit())
+        assert current_span.get() is trace.root
+        return trace, clicks
+
+    trace, clicks = asyncio.run(scenario())
+    by_id = {item.span_id: item for item in trace.spans}
+    assert sorted(item.name for item in trace.spans) == ["chat", "click", "click", "queue_wait", "submit", "submit"]
+    assert by_id[trace.spans[1].parent_id] is trace.root
+    for click in clicks:
+        assert by_id[click.parent_id].name == "submit"
+        assert by_id[by_id[click.parent_id].parent_id] is trace.root
+        assert click.attributes == {"selector": "send"} and click.end_ns is not None
+    assert len({click.parent_id for click in clicks}) == 2
+
+
+def test_spans_do_nothing_without_a_trace():
+    @traced("work")
+    async def work():
+        with span("inner") as inner:
+            return inner
+
+    assert asyncio.run(work()) is None
+
+
+def finished_trace() -> Trace:
+    trace = Trace("chat", {"client": "a", "cached": False, "prompt_chars": 5, "ratio": 0.5})
+    child = trace.open("submit", trace.root)
+    child.close()
+    trace.root.close()
+    return trace
+
+
+def test_chrome_trace_events():
+    trace = finished_trace()
+    data = trace.to_chrome()
+    assert data["otherData"] == {"trace_id": trace.trace_id}
+    root, child = data["traceEvents"]
+    assert (root["name"], root["ph"], child["name"]) == ("chat", "X", "submit")
+    assert root["ts"] <= child["ts"] and root["dur"] >= child["dur"] >= 0
+    assert child["args"]["parent_id"] == root["args"]["span_id"]
+    assert root["args"]["client"] == "a" and "loop_cpu_ms" in root["args"]
+
+
+def test_otlp_spans():
+    trace = finished_trace()
+    scope = trace.to_otlp()["resourceSpans"][0]["scopeSpans"][0]
+    root, child = scope["spans"]
+    assert (root["traceId"], root["kind"], child["kind"]) == (trace.trace_id, 2, 1)
+    assert "parentSpanId" not in root and child["parentSpanId"] == root["spanId"]
+    assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    attributes = {item["key"]: item["value"] for item in root["attributes"]}
+    assert attributes["client"] == {"stringValue": "a"}
+    assert attributes["cached"] == {"boolValue": False}
+    assert attributes["prompt_chars"] == {"intValue": "5"}
+    assert attributes["ratio"] == {"doubleValue": 0.5}
+    assert "doubleValue" in attributes["loop_cpu_ms"]
+
+
+def test_written_traces_are_loaded_and_pruned(monkeypatch):
+    tracer = Tracer()
+    traces = [finished_trace() for _ in range(3)]
+    for age, trace in enumerate(traces):
+        tracer.write(trace)
+        os.utime(tracer.path(trace.trace_id), (1000 + age, 1000 + age))
+    tracer.prune()
+    assert tracer.load(traces[0].trace_id) is None  # oldest beyond TRACE_RETENTION
+    assert tracer.load(traces[2].trace_id)["otherData"]["trace_id"] == traces[2].trace_id
+
+    monkeypatch.setattr(Config, "TRACE_FORMAT", "otlp")
+    otlp = finished_trace()
+    tracer.write(otlp)
+    assert "resourceSpans" in tracer.load(otlp.trace_id)
+    assert tracer.exported == 4
+
+
+def test_load_rejects_ids_that_are_not_trace_ids():
+    tracer = Tracer()
+    assert tracer.load("../config") is None
+    assert tracer.load("0" * 32) is None
@@ -0,0 +1,214 @@
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace"
+TRACE_ID_HEADER = "X-Trace-Id"
+TRACE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Innermost open span of the request the current task is serving (None when not tracing)
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed step.
+
+    ``loop_cpu_ns`` is the CPU time of the event-loop thread while the span was
+    open. That includes every other coroutine the loop ran meanwhile, so it only
+    describes this span alone when a single request is in flight.
+    """
+
+    def __init__(self, trace, name: str, parent=None, attributes: dict = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._cpu_start = time.thread_time_ns()
+        self.loop_cpu_ns = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def close(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.loop_cpu_ns = time.thread_time_ns() - self._cpu_start
+
+
+class Trace:
+    """The span tree of one request"""
+
+    def __init__(self, name: str, attributes: dict = None):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(self, name, attributes=attributes)
+        self.spans = [self.root]
+
+    def open(self, name: str, parent: Span, attributes: dict = None) -> Span:
+        child = Span(self, name, parent, attributes)
+        self.spans.append(child)
+        return child
+
+    def to_chrome(self) -> dict:
+        """Chrome trace event format (chrome://tracing, Perfetto, speedscope)"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            end_ns = span.end_ns or time.time_ns()
+            args = dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id)
+            if span.loop_cpu_ns is not None:
+                args["loop_cpu_ms"] = round(span.loop_cpu_ns / 1e6, 3)
+            events.append({
+                "name": span.name,
+                "cat": "chatapi",
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": (end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": 1,
+                "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": self.trace_id}}
+
+    def to_otlp(self) -> dict:
+        """OpenTelemetry OTLP/JSON (ExportTraceServiceRequest), e.g. for an OTLP HTTP collector"""
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        spans = []
+        for span in self.spans:
+            attributes = dict(span.attributes)
+            if span.loop_cpu_ns is not None:
+                attributes["loop_cpu_ms"] = round(span.loop_cpu_ns / 1e6, 3)
+            entry = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 2 if span is self.root else 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or time.time_ns()),
+                "attributes": [attribute(key, value) for key, value in attributes.items()]
+            }
+            if span.parent_id:
+                entry["parentSpanId"] = span.parent_id
+            spans.append(entry)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", "chatgpt-api"), attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "chatgpt-api"}, "spans": spans}]
+        }]}
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record ``name`` as a child of the current span; does nothing unless the request is traced"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.trace.open(name, parent, attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.close()
+        try:
+            current_span.reset(token)
+        except ValueError:
+            # An abandoned async generator can be finalized from another context
+            pass
+
+
+def traced(name: str = None):
+    """Decorator: run the coroutine function inside a span (named after it by default)"""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name or func.__name__):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Tracer:
+    """Starts per-request traces (TRACE_ENABLED or an ``X-Trace: 1`` header) and writes them to TRACE_DIR"""
+
+    def __init__(self):
+        self.exported = 0
+
+    def wanted(self, headers) -> bool:
+        return Config.TRACE_ENABLED or headers.get(TRACE_HEADER, "").lower() in ("1", "true", "yes")
+
+    def start(self, name: str, headers=None, **attributes):
+        """Begin a trace for the current task if tracing is on for this request, else return None"""
+        if not self.wanted(headers or {}):
+            return None
+        trace = Trace(name, attributes)
+        current_span.set(trace.root)
+        return trace
+
+    def finish(self, trace):
+        """Close the trace and write it in the background"""
+        if trace is None:
+            return
+        trace.root.close()
+        current_span.set(None)
+        asyncio.get_running_loop().run_in_executor(None, self.write, trace)
+
+    def path(self, trace_id: str) -> str:
+        return os.path.join(Config.TRACE_DIR, f"{trace_id}.json")
+
+    def write(self, trace):
+        try:
+            os.makedirs(Config.TRACE_DIR, exist_ok=True)
+            data = trace.to_otlp() if Config.TRACE_FORMAT == "otlp" else trace.to_chrome()
+            with open(self.path(trace.trace_id), "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            self.exported += 1
+            self.prune()
+        except Exception as e:
+            logger.warning(f"Could not write trace {trace.trace_id}: {e}")
+
+    def prune(self):
+        """Keep only the newest TRACE_RETENTION request traces"""
+        names = [
+            name for name in os.listdir(Config.TRACE_DIR)
+            if name.endswith(".json") and TRACE_ID_PATTERN.fullmatch(name[:-5])
+        ]
+        if len(names) <= Config.TRACE_RETENTION:
+            return
+        paths = sorted((os.path.join(Config.TRACE_DIR, name) for name in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - Config.TRACE_RETENTION]:
+            os.remove(path)
+
+    def load(self, trace_id: str):
+        """The exported trace with this id, or None"""
+        if not TRACE_ID_PATTERN.fullmatch(trace_id):
+            return None
+        try:
+            with open(self.path(trace_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+# Global instance
+tracer = Tracer()